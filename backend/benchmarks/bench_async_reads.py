@@ -0,0 +1,124 @@
+"""Throughput of the hot read endpoints, sync handlers vs. DB_ASYNC handlers.
+
+Runs two apps in-process against the same throwaway SQLite database (or
+DATABASE_URL, if set): one with the sync routers only and the app from main.py
+with DB_ASYNC on, where routers/async_reads.py serves the same paths. For
+each --concurrency level, that many clients call --path for --seconds and
+the requests/sec and latency percentiles are reported.
+
+Quotes are seeded as stale so every /portfolio/summary goes to the database
+instead of the in-memory quote cache. SQLite answers in microseconds, so
+this mostly measures framework overhead; against Postgres the sync handlers
+also wait for threadpool slots (~40 per worker) once concurrency exceeds it.
+
+    python -m benchmarks.bench_async_reads --concurrency 10,50,200 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+# config.Settings needs these; nothing is sent upstream
+for name in ("EMAIL_ADDRESS", "EMAIL_PASSWORD", "ALPHA_VANTAGE_API_KEY"):
+    os.environ.setdefault(name, "bench@example.com" if name == "EMAIL_ADDRESS" else "bench")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_async_reads.db")
+os.environ["DB_ASYNC"] = "true"
+
+import httpx
+from fastapi import FastAPI
+import migrations
+from database import engine
+migrations.upgrade(engine)  # before main starts the scheduler and outbox threads
+import main
+from database import SessionLocal
+from models import PortfoliosTable, StockQuoteCache, StocksTable, UsersTable
+from routers import email, portfolio, stock_search, user
+from utils.jwt import create_access_token
+
+USERS = 50
+HOLDINGS = 10
+
+def _seed() -> list[str]:
+    emails = [f"reader{i}@example.com" for i in range(USERS)]
+    symbols = [f"BR{i:03d}" for i in range(HOLDINGS * 5)]
+    stale = datetime.now(timezone.utc) - timedelta(days=1)
+    db = SessionLocal()
+    try:
+        if db.query(UsersTable).filter(UsersTable.email == emails[0]).first():
+            return emails
+        db.add_all(StocksTable(stock_symbol=symbol, stock_company_name=f"{symbol} Corp", is_listed=True) for symbol in symbols)
+        db.add_all(
+            StockQuoteCache(stock_symbol=symbol, open_price=1, high_price=2, low_price=0.5, current_price=1.5, volume=100,
+                            latest_trading_day="2025-01-02", previous_close=1, change=0.5, change_percent="50%",
+                            last_updated=stale)
+            for symbol in symbols
+        )
+        users = [UsersTable(email=email, hashed_password="x", is_verified=True, alpha_vantage_api_key="bench") for email in emails]
+        db.add_all(users)
+        db.flush()
+        db.add_all(
+            PortfoliosTable(user_id=db_user.id, stock_symbol=symbols[(i + j) % len(symbols)])
+            for i, db_user in enumerate(users) for j in range(HOLDINGS)
+        )
+        db.commit()
+    finally:
+        db.close()
+    return emails
+
+def _sync_app() -> FastAPI:
+    app = FastAPI()
+    for module in (portfolio, stock_search, user, email):
+        app.include_router(module.router)
+    return app
+
+async def _load(app: FastAPI, path: str, tokens: list[str], concurrency: int, seconds: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=None)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120, limits=limits) as client:
+        async def worker(i: int):
+            nonlocal errors
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000,
+        "errors": errors,
+    }
+
+async def _main(args):
+    tokens = [create_access_token(email) for email in _seed()]
+    apps = (("sync", _sync_app()), ("async", main.app))
+    print(f"GET {args.path}, {args.seconds:.0f}s per run, database {main.engine.url.get_backend_name()}\n")
+    print(f"{'clients':>8}{'mode':>7}{'req/sec':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for concurrency in args.concurrency:
+        for label, app in apps:
+            result = await _load(app, args.path, tokens, concurrency, args.seconds)
+            print(f"{concurrency:>8}{label:>7}{result['rps']:>10.0f}{result['p50_ms']:>9.1f}"
+                  f"{result['p99_ms']:>9.1f}{result['errors']:>8}")
+    await main.async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/portfolio/summary")
+    parser.add_argument("--concurrency", type=lambda value: [int(n) for n in value.split(",")], default=[10, 50, 200])
+    parser.add_argument("--seconds", type=float, default=5)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,124 @@
+"""Daily digest render time: string concatenation vs. the compiled template with row cache.
+
+Builds a synthetic tick - N recipients, each holding a handful of symbols drawn
+from a shared universe - and renders every digest three ways:
+
+  concatenation   the original send_daily_summary_email body (html += f"...")
+  template        utils.email.render_daily_summary_email (compiled, one join)
+  template+cache  utils.email.DigestRenderer, rows shared across recipients
+
+All three must produce identical HTML.
+
+    python -m benchmarks.bench_digest_render --digests 10000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+# config.Settings needs these; nothing here sends email
+for name in ("EMAIL_ADDRESS", "EMAIL_PASSWORD", "ALPHA_VANTAGE_API_KEY", "JWT_SECRET"):
+    os.environ.setdefault(name, "bench@example.com" if name == "EMAIL_ADDRESS" else "bench")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+from utils.email import DigestRenderer, build_summary_row, render_daily_summary_email
+
+def render_by_concatenation(portfolio_summary: list) -> str:
+    """The digest body as it was built before the compiled template"""
+    html = "<h3>📈 Daily Stock Portfolio Summary</h3>"
+    html += "<p>Here's your comprehensive daily portfolio update:</p>"
+    html += "<table border='1' cellpadding='8' cellspacing='0' style='border-collapse: collapse; width: 100%; font-size: 14px;'>"
+    html += """
+    <tr style='background-color: #f2f2f2;'>
+        <th>Ticker</th>
+        <th>Company</th>
+        <th>Current Price</th>
+        <th>Change ($)</th>
+        <th>Change (%)</th>
+        <th>Open</th>
+        <th>High</th>
+        <th>Low</th>
+        <th>Volume</th>
+        <th>Previous Close</th>
+        <th>Trading Day</th>
+    </tr>
+    """
+
+    for stock in portfolio_summary:
+        change_color = "green"
+        if stock.get('change_percent', 'N/A') != 'N/A' and stock.get('change_percent').startswith('-'):
+            change_color = "red"
+        elif stock.get('change_percent') == 'N/A':
+            change_color = "gray"
+
+        html += f"""
+        <tr>
+            <td><strong>{stock.get('ticker', 'N/A')}</strong></td>
+            <td>{stock.get('name', 'N/A')}</td>
+            <td><strong>{stock.get('price', 'N/A')}</strong></td>
+            <td style='color: {change_color}; font-weight: bold;'>{stock.get('change', 'N/A')}</td>
+            <td style='color: {change_color}; font-weight: bold;'>{stock.get('change_percent', 'N/A')}</td>
+            <td>{stock.get('open', 'N/A')}</td>
+            <td>{stock.get('high', 'N/A')}</td>
+            <td>{stock.get('low', 'N/A')}</td>
+            <td>{stock.get('volume', 'N/A')}</td>
+            <td>{stock.get('previous_close', 'N/A')}</td>
+            <td>{stock.get('latest_trading_day', 'N/A')}</td>
+        </tr>
+        """
+
+    html += "</table>"
+    html += "<br><p><small>📅 Data may be delayed. For real-time quotes, please visit your portfolio dashboard.</small></p>"
+    html += "<br><p style='color: #666;'><small>This is an automated daily summary email. You can modify your email preferences in your account settings.</small></p>"
+    return html
+
+def _universe(size: int, rng: random.Random) -> list:
+    now = datetime.now(timezone.utc)
+    stocks = []
+    for i in range(size):
+        price = rng.uniform(5, 500)
+        change = rng.uniform(-0.05, 0.05) * price
+        quote = None if i % 25 == 0 else {
+            "price": price, "change": change, "change_percent": f"{change / price * 100:.4f}%",
+            "open": price - change / 2, "high": price * 1.01, "low": price * 0.99, "volume": rng.randint(10_000, 90_000_000),
+            "latest_trading_day": "2025-07-18", "previous_close": price - change, "last_updated": now,
+        }
+        stocks.append((f"SYM{i}", f"Company {i} Inc", quote))
+    return stocks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--digests", type=int, default=10_000)
+    parser.add_argument("--symbols", type=int, default=500, help="size of the shared symbol universe")
+    parser.add_argument("--holdings", type=int, default=12, help="average holdings per recipient")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    universe = _universe(args.symbols, rng)
+    portfolios = [rng.sample(universe, max(1, int(rng.gauss(args.holdings, 4)))) for _ in range(args.digests)]
+    rows = sum(len(holdings) for holdings in portfolios)
+    print(f"{args.digests} digests, {rows} rows, {args.symbols} distinct symbols\n")
+
+    start = time.perf_counter()
+    before = [render_by_concatenation([build_summary_row(*holding) for holding in holdings]) for holdings in portfolios]
+    concatenation = time.perf_counter() - start
+
+    start = time.perf_counter()
+    template = [render_daily_summary_email([build_summary_row(*holding) for holding in holdings]) for holdings in portfolios]
+    compiled = time.perf_counter() - start
+
+    start = time.perf_counter()
+    renderer = DigestRenderer()
+    cached = [renderer.render(holdings) for holdings in portfolios]
+    with_cache = time.perf_counter() - start
+
+    assert before == template == cached, "renderers disagree"
+
+    print(f"{'renderer':<18}{'total ms':>10}{'us/digest':>12}{'speedup':>10}")
+    for label, elapsed in (("concatenation", concatenation), ("template", compiled), ("template+cache", with_cache)):
+        print(f"{label:<18}{elapsed * 1000:>10.1f}{elapsed / args.digests * 1e6:>12.1f}{concatenation / elapsed:>9.1f}x")
+    print(f"\nrow fragments rendered with cache: {len(renderer)} (vs {rows} without)")
+
+if __name__ == "__main__":
+    main()
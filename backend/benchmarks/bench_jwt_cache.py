@@ -0,0 +1,70 @@
+"""Auth dependency overhead with and without the verified-token cache.
+
+Calls dependencies.get_current_user_email the way FastAPI does for each
+request, for a pool of active sessions (distinct bearer tokens) picked at
+random, first with a full jose signature check every time and then through
+utils.jwt.decode_token_cached. Reports per-call cost and calls/sec, single
+threaded and across several threads (as under a threadpool of sync handlers).
+
+    python -m benchmarks.bench_jwt_cache --calls 200000 --sessions 500
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# config.Settings needs these; nothing here talks to the database
+for name in ("EMAIL_ADDRESS", "EMAIL_PASSWORD", "ALPHA_VANTAGE_API_KEY"):
+    os.environ.setdefault(name, "bench")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.security import HTTPAuthorizationCredentials
+import dependencies
+from utils import jwt as jwt_utils
+
+def _run(credentials: list, calls: int, threads: int) -> float:
+    rng = random.Random(7)
+    picks = [rng.choice(credentials) for _ in range(calls)]
+    start = time.perf_counter()
+    if threads == 1:
+        for item in picks:
+            dependencies.get_current_user_email(item)
+    else:
+        chunk = len(picks) // threads
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(
+                lambda part: [dependencies.get_current_user_email(item) for item in part],
+                [picks[i * chunk:(i + 1) * chunk] for i in range(threads)]
+            ))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, default=500, help="distinct tokens in use")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    credentials = [
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=jwt_utils.create_access_token(f"user{i}@example.com"))
+        for i in range(args.sessions)
+    ]
+
+    print(f"{args.calls} authenticated calls over {args.sessions} tokens\n")
+    print(f"{'mode':<24}{'threads':>8}{'us/call':>10}{'calls/sec':>12}")
+    for threads in (1, args.threads):
+        dependencies.decode_token_cached = jwt_utils.decode_token
+        uncached = _run(credentials, args.calls, threads)
+
+        jwt_utils.clear_verified_tokens()
+        dependencies.decode_token_cached = jwt_utils.decode_token_cached
+        cached = _run(credentials, args.calls, threads)
+
+        for label, elapsed in (("verify every call", uncached), ("verified-token cache", cached)):
+            print(f"{label:<24}{threads:>8}{elapsed / args.calls * 1e6:>10.2f}{args.calls / elapsed:>12.0f}")
+
+if __name__ == "__main__":
+    main()
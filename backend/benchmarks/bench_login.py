@@ -0,0 +1,116 @@
+"""Login throughput and the latency of a cheap endpoint during a login storm.
+
+Runs the app in-process against a throwaway SQLite database, keeps
+--concurrency clients logging in for --seconds, and meanwhile probes
+GET /email/settings (a cached, sync endpoint) every 10 ms. It does this twice:
+
+  inline bcrypt   a sync login that calls bcrypt.checkpw itself, as /auth/login
+                  used to - the hashes occupy FastAPI's shared threadpool
+  executor        the real /auth/login, hashing on utils.passwords' executor
+
+    python -m benchmarks.bench_login --concurrency 16 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# config.Settings needs these; emails are only queued, never sent
+for name in ("EMAIL_ADDRESS", "EMAIL_PASSWORD", "ALPHA_VANTAGE_API_KEY"):
+    os.environ.setdefault(name, "bench@example.com" if name == "EMAIL_ADDRESS" else "bench")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_login.db")
+
+import bcrypt
+import httpx
+from fastapi import Depends, HTTPException
+from sqlalchemy.orm import Session
+import migrations
+from database import engine
+migrations.upgrade(engine)  # before main starts the scheduler and outbox threads
+import main
+from cruds import users as user_crud
+from database import SessionLocal, get_db
+from models import UsersTable
+from utils import passwords
+from utils.jwt import create_access_token
+
+PASSWORD = "Passw0rd!"
+
+@main.app.post("/bench/inline-login")
+def inline_login(body: dict, db: Session = Depends(get_db)):
+    db_user = user_crud.get_user_by_email(db, body["email"])
+    if not db_user or not bcrypt.checkpw(body["password"].encode("utf-8"), db_user.hashed_password.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    return {"access_token": create_access_token(db_user.email), "token_type": "bearer"}
+
+def _create_users(count: int) -> list[str]:
+    hashed = passwords.hash_password(PASSWORD)
+    emails = [f"login{i}@example.com" for i in range(count)]
+    db = SessionLocal()
+    try:
+        existing = {email for (email,) in db.query(UsersTable.email).filter(UsersTable.email.in_(emails))}
+        db.add_all(
+            UsersTable(email=email, hashed_password=hashed, is_verified=True, alpha_vantage_api_key="bench")
+            for email in emails if email not in existing
+        )
+        db.commit()
+    finally:
+        db.close()
+    return emails
+
+async def _storm(client: httpx.AsyncClient, path: str, emails: list[str], concurrency: int, seconds: float):
+    deadline = time.perf_counter() + seconds
+    outcomes = {"ok": 0, "rejected": 0}
+    probe_latencies = []
+    headers = {"Authorization": f"Bearer {create_access_token(emails[0])}"}
+
+    async def login_loop(worker: int):
+        i = worker
+        while time.perf_counter() < deadline:
+            response = await client.post(path, json={"email": emails[i % len(emails)], "password": PASSWORD})
+            outcomes["ok" if response.status_code == 200 else "rejected"] += 1
+            i += concurrency
+
+    async def probe_loop():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await client.get("/email/settings", headers=headers)
+            probe_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    await asyncio.gather(probe_loop(), *(login_loop(worker) for worker in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    probe_latencies.sort()
+    return {
+        "logins_per_sec": outcomes["ok"] / elapsed,
+        "rejected": outcomes["rejected"],
+        "p50_ms": statistics.median(probe_latencies) * 1000,
+        "p99_ms": probe_latencies[int(len(probe_latencies) * 0.99) - 1] * 1000,
+        "probes": len(probe_latencies),
+    }
+
+async def _main(args):
+    emails = _create_users(max(args.concurrency, 16))
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        idle = await _storm(client, "/bench/inline-login", emails, 0, 1)
+        print(f"bcrypt cost {main.settings.BCRYPT_ROUNDS}, {args.concurrency} concurrent logins for {args.seconds:.0f}s, "
+              f"{main.settings.PASSWORD_HASH_WORKERS} {main.settings.PASSWORD_HASH_EXECUTOR} hash workers")
+        print(f"idle /email/settings: p50 {idle['p50_ms']:.1f} ms, p99 {idle['p99_ms']:.1f} ms\n")
+        print(f"{'login path':<16}{'logins/sec':>12}{'rejected':>10}{'probe p50 ms':>14}{'probe p99 ms':>14}")
+        for label, path in (("inline bcrypt", "/bench/inline-login"), ("executor", "/auth/login")):
+            result = await _storm(client, path, emails, args.concurrency, args.seconds)
+            print(f"{label:<16}{result['logins_per_sec']:>12.1f}{result['rejected']:>10}"
+                  f"{result['p50_ms']:>14.1f}{result['p99_ms']:>14.1f}")
+    passwords.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    asyncio.run(_main(parser.parse_args()))
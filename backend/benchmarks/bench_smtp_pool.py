@@ -0,0 +1,69 @@
+"""Digest delivery throughput: one SMTP session per message vs. the pooled mailer.
+
+Starts benchmarks.smtp_standin in-process with a per-reply latency (a stand-in
+for the round trip to a real provider) and sends the same batch of daily
+summary emails first the old way - connect, log in, send, quit, one message at
+a time - and then through utils.mailer.send_all at each pool size.
+
+    python -m benchmarks.bench_smtp_pool --messages 400 --pool-sizes 1,2,4,8
+"""
+import argparse
+import os
+import smtplib
+import time
+
+# config.Settings needs these; nothing here talks to Gmail or Alpha Vantage
+for name in ("EMAIL_ADDRESS", "EMAIL_PASSWORD", "ALPHA_VANTAGE_API_KEY", "JWT_SECRET"):
+    os.environ.setdefault(name, "bench@example.com" if name == "EMAIL_ADDRESS" else "bench")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+from benchmarks.smtp_standin import SMTPStandin
+from utils import mailer
+from utils.email import DAILY_SUMMARY_SUBJECT, render_daily_summary_email, build_summary_row
+
+def _sample_digest() -> str:
+    quote = {
+        "price": 189.25, "change_percent": "-0.42%", "change": -0.8, "open": 190.1, "high": 191.0,
+        "low": 188.7, "volume": 51234567, "latest_trading_day": "2025-07-18", "previous_close": 190.05,
+    }
+    return render_daily_summary_email([build_summary_row(f"SYM{i}", f"Company {i}", quote) for i in range(10)])
+
+def send_one_session_per_message(server: SMTPStandin, messages: list) -> None:
+    for subject, recipient, html in messages:
+        with smtplib.SMTP("127.0.0.1", server.port) as smtp:
+            smtp.login("bench", "bench")
+            smtp.sendmail("bench@example.com", recipient, mailer.build_message(subject, recipient, html))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=400)
+    parser.add_argument("--pool-sizes", default="1,2,4,8")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds the stand-in waits before each reply")
+    parser.add_argument("--connect-delay", type=float, default=0.05, help="extra seconds per new connection (TLS handshake)")
+    args = parser.parse_args()
+
+    server = SMTPStandin(latency=args.latency, connect_delay=args.connect_delay).start()
+    html = _sample_digest()
+    messages = [(DAILY_SUMMARY_SUBJECT, f"user{i}@example.com", html) for i in range(args.messages)]
+
+    print(f"{args.messages} digests, {args.latency * 1000:.0f} ms per reply, {args.connect_delay * 1000:.0f} ms per connect\n")
+    print(f"{'mode':<26}{'seconds':>10}{'msgs/sec':>12}{'connections':>14}")
+
+    start = time.perf_counter()
+    send_one_session_per_message(server, messages)
+    elapsed = time.perf_counter() - start
+    print(f"{'session per message':<26}{elapsed:>10.2f}{args.messages / elapsed:>12.1f}{args.messages:>14}")
+
+    for size in (int(value) for value in args.pool_sizes.split(",")):
+        pool = mailer.SMTPConnectionPool("127.0.0.1", server.port, False, "bench", "bench", size=size)
+        start = time.perf_counter()
+        errors = [error for error in mailer.send_all(messages, pool) if error is not None]
+        elapsed = time.perf_counter() - start
+        pool.close()
+        label = f"pool size {size}" + (f" ({len(errors)} failed)" if errors else "")
+        print(f"{label:<26}{elapsed:>10.2f}{args.messages / elapsed:>12.1f}{pool.connections_opened:>14}")
+
+    server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Latency of /stocks keyword searches against the in-memory index.
+
+Builds utils.stock_search_index.StockSearchIndex from the bundled
+listing_status.csv (about 12k active symbols) and times index.search() for
+a set of keywords: exact tickers, short and common fragments, rare ones
+and misses. Reports the median and p99 over --repeat runs of each.
+
+    python -m benchmarks.bench_stock_search --repeat 2000 --limit 50
+"""
+import argparse
+import csv
+import os
+import statistics
+import time
+
+# config.Settings needs these; nothing here talks to the database
+for name in ("EMAIL_ADDRESS", "EMAIL_PASSWORD", "ALPHA_VANTAGE_API_KEY"):
+    os.environ.setdefault(name, "bench")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from utils.stock_search_index import StockSearchIndex
+
+LISTING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "listing_status.csv")
+KEYWORDS = ["AAPL", "a", "ab", "zq", "inc", "corp", "tech", "apple", "bank of", "holdings", "xyzzy"]
+
+def _load() -> list[tuple[str, str]]:
+    with open(LISTING, newline="", encoding="utf-8") as listing:
+        return [(row["symbol"], row["name"]) for row in csv.DictReader(listing) if row["status"] == "Active"]
+
+def main(args):
+    stocks = _load()
+    start = time.perf_counter()
+    index = StockSearchIndex(stocks)
+    print(f"Index of {len(index)} symbols built in {(time.perf_counter() - start) * 1000:.0f} ms\n")
+    print(f"{'keywords':>10}{'hits':>6}{'p50 ms':>9}{'p99 ms':>9}")
+    for keywords in args.keywords:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            hits = index.search(keywords, limit=args.limit)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{keywords:>10}{len(hits):>6}{statistics.median(timings) * 1000:>9.3f}"
+              f"{timings[max(0, int(len(timings) * 0.99) - 1)] * 1000:>9.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--keywords", type=lambda value: value.split(","), default=KEYWORDS)
+    main(parser.parse_args())
@@ -0,0 +1,115 @@
+"""Minimal local SMTP server for benchmarks and manual testing.
+
+Speaks just enough SMTP for smtplib (EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT,
+DATA, RSET, NOOP, QUIT), accepts every login and discards messages. Each reply
+can be delayed to mimic a remote server's round trip, and a connection can be
+given an extra setup delay to stand in for the TLS handshake. Tests can script
+error replies with fail_next(); a 421 reply also closes the connection.
+
+    python -m benchmarks.smtp_standin --port 2525 --latency 0.02
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        if self.server.connect_delay:
+            time.sleep(self.server.connect_delay)
+        self._reply("220 standin ESMTP ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            scripted = self.server.scripted_reply(verb)
+            if scripted:
+                self._reply(scripted)
+                if scripted.startswith("421"):
+                    return
+            elif verb == "EHLO":
+                self.wfile.write(b"250-standin\r\n250-AUTH PLAIN LOGIN\r\n")
+                self._reply("250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 standin")
+            elif verb == "AUTH":
+                parts = command.split()
+                if len(parts) >= 2 and parts[1].upper() == "LOGIN":
+                    # Username and password prompts; the values are not checked
+                    if len(parts) == 2:
+                        self._reply("334 VXNlcm5hbWU6")
+                        self.rfile.readline()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with self.server.lock:
+                    self.server.messages_received += 1
+                self._reply("250 OK queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+class SMTPStandin(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, connect_delay: float = 0.0):
+        super().__init__((host, port), _SMTPHandler)
+        self.latency = latency
+        self.connect_delay = connect_delay
+        self.messages_received = 0
+        self.lock = threading.Lock()
+        self._scripted: dict[str, list[str]] = {}
+
+    def fail_next(self, verb: str, *replies: str):
+        """Answer the next len(replies) `verb` commands (e.g. "DATA", "RCPT") with these replies"""
+        with self.lock:
+            self._scripted.setdefault(verb.upper(), []).extend(replies)
+
+    def scripted_reply(self, verb: str) -> str | None:
+        with self.lock:
+            replies = self._scripted.get(verb)
+            return replies.pop(0) if replies else None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "SMTPStandin":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added before every reply")
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="seconds added when a connection opens")
+    args = parser.parse_args()
+
+    server = SMTPStandin(args.host, args.port, args.latency, args.connect_delay)
+    print(f"📮 SMTP stand-in listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
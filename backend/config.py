@@ -20,6 +20,70 @@ class Settings(BaseSettings):
         f"{os.environ.get('POSTGRES_PORT', '5432')}/"
         f"{os.environ.get('POSTGRES_DB', 'stocks')}"
     )
+    # Database connection pool, per worker: keep workers x (size + overflow) below Postgres' max_connections
+    DB_POOL_SIZE: int = int(os.environ.get("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    # Connections older than this are replaced (-1 never); pre-ping tests each connection before handing it out
+    DB_POOL_RECYCLE: int = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    # Serve the hot read endpoints from an async engine (asyncpg / aiosqlite); the URL defaults to DATABASE_URL's
+    DB_ASYNC: bool = os.environ.get("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+    ASYNC_DATABASE_URL: str = os.environ.get("ASYNC_DATABASE_URL", "")
+    # SQL statements per request: debug headers (X-DB-Queries, X-DB-Time-ms) and the repeat count that logs an N+1 warning
+    QUERY_COUNT_HEADERS: bool = os.environ.get("QUERY_COUNT_HEADERS", "false").lower() in ("1", "true", "yes")
+    N_PLUS_ONE_THRESHOLD: int = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5"))
+    # Slow-query log: statements slower than the threshold (0 disables) go to a rotating JSON-lines file with their EXPLAIN plan
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "200"))
+    SLOW_QUERY_EXPLAIN: bool = os.environ.get("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+    SLOW_QUERY_LOG_FILE: str = os.environ.get("SLOW_QUERY_LOG_FILE", "slow_queries.log")
+    SLOW_QUERY_LOG_MAX_BYTES: int = int(os.environ.get("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    SLOW_QUERY_LOG_BACKUPS: int = int(os.environ.get("SLOW_QUERY_LOG_BACKUPS", "5"))
+    # Pooled keep-alive connections to Alpha Vantage, per worker
+    ALPHA_VANTAGE_MAX_CONNECTIONS: int = int(os.environ.get("ALPHA_VANTAGE_MAX_CONNECTIONS", "20"))
+    ALPHA_VANTAGE_MAX_KEEPALIVE: int = int(os.environ.get("ALPHA_VANTAGE_MAX_KEEPALIVE", "10"))
+    ALPHA_VANTAGE_KEEPALIVE_EXPIRY: float = float(os.environ.get("ALPHA_VANTAGE_KEEPALIVE_EXPIRY", "30"))
+    # Budgets for a single Alpha Vantage key (free tier: 5 per minute, 25 per day)
+    ALPHA_VANTAGE_CALLS_PER_MINUTE: int = int(os.environ.get("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5"))
+    ALPHA_VANTAGE_CALLS_PER_DAY: int = int(os.environ.get("ALPHA_VANTAGE_CALLS_PER_DAY", "25"))
+    # Longest a call may wait for the next minute window before we answer 429
+    ALPHA_VANTAGE_MAX_QUEUE_SECONDS: float = float(os.environ.get("ALPHA_VANTAGE_MAX_QUEUE_SECONDS", "60"))
+    # A weekly/monthly series whose newest bar predates the current period is refetched at most this often
+    PRICE_HISTORY_RECHECK_SECONDS: int = int(os.environ.get("PRICE_HISTORY_RECHECK_SECONDS", "21600"))
+    # A reminder more than this late (e.g. the app was down) is skipped until the next day
+    REMINDER_GRACE_MINUTES: int = int(os.environ.get("REMINDER_GRACE_MINUTES", "15"))
+    # Comma-separated list of accounts allowed to call the /admin endpoints
+    ADMIN_EMAILS: str = os.environ.get("ADMIN_EMAILS", "")
+    # Shared quote cache: how long a GLOBAL_QUOTE stays fresh and how many symbols stay in memory
+    QUOTE_CACHE_TTL_SECONDS: int = int(os.environ.get("QUOTE_CACHE_TTL_SECONDS", "300"))
+    QUOTE_CACHE_MAX_ENTRIES: int = int(os.environ.get("QUOTE_CACHE_MAX_ENTRIES", "5000"))
+    # Outgoing mail: implicit TLS on 465 by default; set SMTP_USE_SSL=false for a plain local server
+    SMTP_HOST: str = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+    SMTP_PORT: int = int(os.environ.get("SMTP_PORT", "465"))
+    SMTP_USE_SSL: bool = os.environ.get("SMTP_USE_SSL", "true").lower() in ("1", "true", "yes")
+    SMTP_TIMEOUT: float = float(os.environ.get("SMTP_TIMEOUT", "30"))
+    # Logged-in SMTP connections kept open (and parallel senders) per worker
+    SMTP_POOL_SIZE: int = int(os.environ.get("SMTP_POOL_SIZE", "4"))
+    # Password hashing: bcrypt cost (existing hashes are upgraded on login) and the executor it runs on
+    BCRYPT_ROUNDS: int = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_EXECUTOR: str = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "64"))
+    # Already-verified access tokens kept per worker (each until its exp)
+    JWT_CACHE_MAX_ENTRIES: int = int(os.environ.get("JWT_CACHE_MAX_ENTRIES", "10000"))
+    # Authenticated users are cached per worker for this long (changes made on other workers show up after it)
+    USER_CACHE_TTL_SECONDS: float = float(os.environ.get("USER_CACHE_TTL_SECONDS", "30"))
+    USER_CACHE_MAX_ENTRIES: int = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "10000"))
+    # How often each worker checks whether import_stocks.py published a new stock universe
+    UNIVERSE_POLL_SECONDS: float = float(os.environ.get("UNIVERSE_POLL_SECONDS", "30"))
+    # Email outbox: how often it is polled, how many emails one pass sends, and the retry schedule
+    OUTBOX_POLL_SECONDS: float = float(os.environ.get("OUTBOX_POLL_SECONDS", "5"))
+    OUTBOX_BATCH_SIZE: int = int(os.environ.get("OUTBOX_BATCH_SIZE", "50"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+    OUTBOX_BACKOFF_SECONDS: float = float(os.environ.get("OUTBOX_BACKOFF_SECONDS", "30"))
+    OUTBOX_MAX_BACKOFF_SECONDS: float = float(os.environ.get("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+    # Sent and dead-lettered emails are deleted this many days after they were queued (0 keeps them)
+    OUTBOX_RETENTION_DAYS: int = int(os.environ.get("OUTBOX_RETENTION_DAYS", "30"))
 
 @lru_cache
 def get_settings():
@@ -0,0 +1,98 @@
+import random
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import EmailOutbox
+
+# How long a claimed email is hidden from other dispatchers; if the process dies mid-send it is retried after this
+CLAIM_LEASE = timedelta(minutes=5)
+
+def enqueue(db: Session, recipient: str, subject: str, html_body: str) -> EmailOutbox:
+    """Queue an email in the caller's transaction (caller commits) - nothing is sent unless that commit succeeds"""
+    entry = EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        html_body=html_body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.now(timezone.utc)
+    )
+    db.add(entry)
+    return entry
+
+def claim_due(db: Session, now: datetime, limit: int) -> list[tuple[int, str, str, str]]:
+    """Lease up to `limit` due emails to this dispatcher and commit; rows locked by another dispatcher are skipped
+
+    Returns plain (id, recipient, subject, html_body) tuples - the commit expires the ORM objects.
+    """
+    entries = (
+        db.query(EmailOutbox)
+        .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    claimed = []
+    for entry in entries:
+        entry.attempts += 1
+        entry.next_attempt_at = now + CLAIM_LEASE
+        claimed.append((entry.id, entry.recipient, entry.subject, entry.html_body))
+    db.commit()
+    return claimed
+
+def get_entries(db: Session, entry_ids: list[int]) -> dict[int, EmailOutbox]:
+    return {entry.id: entry for entry in db.query(EmailOutbox).filter(EmailOutbox.id.in_(entry_ids)).all()}
+
+def backoff(attempts: int, base: float, cap: float) -> timedelta:
+    """Exponential backoff with full jitter: up to base * 2^(attempts-1) seconds, never more than cap"""
+    return timedelta(seconds=random.uniform(0, min(cap, base * 2 ** (attempts - 1))))
+
+def mark_sent(entry: EmailOutbox, now: datetime):
+    entry.status = "sent"
+    entry.sent_at = now
+    entry.last_error = None
+    # Verification and reset links are bearer tokens - don't keep them once delivered
+    entry.html_body = None
+
+def mark_failed(entry: EmailOutbox, error: Exception, now: datetime, max_attempts: int, base: float, cap: float,
+                permanent: bool = False):
+    entry.last_error = str(error)[:512]
+    if permanent or entry.attempts >= max_attempts:
+        # Dead letter - kept for inspection, never retried automatically
+        entry.status = "dead"
+    else:
+        entry.next_attempt_at = now + backoff(entry.attempts, base, cap)
+
+def prune(db: Session, created_before: datetime) -> int:
+    """Delete sent and dead-lettered emails queued before `created_before`; returns how many went"""
+    deleted = (
+        db.query(EmailOutbox)
+        .filter(EmailOutbox.status.in_(("sent", "dead")), EmailOutbox.created_at < created_before)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+def get_stats(db: Session) -> dict:
+    counts = dict(db.query(EmailOutbox.status, func.count()).group_by(EmailOutbox.status).all())
+    return {status: counts.get(status, 0) for status in ("pending", "sent", "dead")}
+
+def get_dead_letters(db: Session, limit: int = 50) -> list[EmailOutbox]:
+    return (
+        db.query(EmailOutbox)
+        .filter(EmailOutbox.status == "dead")
+        .order_by(EmailOutbox.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+def requeue(db: Session, entry_id: int) -> EmailOutbox | None:
+    """Give a dead-lettered email a fresh set of attempts"""
+    entry = db.get(EmailOutbox, entry_id)
+    if entry and entry.status == "dead":
+        entry.status = "pending"
+        entry.attempts = 0
+        entry.next_attempt_at = datetime.now(timezone.utc)
+        db.commit()
+    return entry
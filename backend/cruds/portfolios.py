@@ -1,5 +1,10 @@
+from collections import defaultdict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session 
-from models import PortfoliosTable, UsersTable, StocksTable
+from models import PortfoliosTable, UsersTable, StocksTable, StockQuoteCache
+from utils.quote_cache import quote_from_row
+from database import insert_for
 
 def get_user_portfolio(db: Session, user_email: str):
     user = db.query(UsersTable).filter(UsersTable.email == user_email).first()
@@ -20,21 +25,18 @@ def add_stock_to_portfolio(db: Session, user_email: str, ticker: str):
     if not stock:
         return None  # or raise error
 
-    existing = db.query(PortfoliosTable).filter(
+    insert_holding(db, user.id, stock.stock_symbol)
+    return db.query(PortfoliosTable).filter(
         PortfoliosTable.user_id == user.id,
         PortfoliosTable.stock_symbol == stock.stock_symbol
     ).first()
-    if existing:
-        return existing
 
-    new_entry = PortfoliosTable(user_id=user.id, stock_symbol=stock.stock_symbol)
-    db.add(new_entry)
+def insert_holding(db: Session, user_id: int, symbol: str) -> bool:
+    """Add symbol to the user's portfolio; False if it was already there (one statement, no race)"""
+    statement = insert_for(db)(PortfoliosTable).values(user_id=user_id, stock_symbol=symbol)
+    result = db.execute(statement.on_conflict_do_nothing(index_elements=[PortfoliosTable.user_id, PortfoliosTable.stock_symbol]))
     db.commit()
-    db.refresh(new_entry)
-    
-    
-
-    return new_entry
+    return result.rowcount == 1
 
 def remove_stock_from_portfolio(db: Session, user_email: str, ticker: str):
     user = db.query(UsersTable).filter(UsersTable.email == user_email).first()
@@ -55,3 +57,61 @@ def remove_stock_from_portfolio(db: Session, user_email: str, ticker: str):
         db.commit()
         return True
     return False
+
+def _holdings_query(user_id: int):
+    return (
+        select(StocksTable.stock_symbol, StocksTable.stock_company_name)
+        .join(PortfoliosTable, PortfoliosTable.stock_symbol == StocksTable.stock_symbol)
+        .where(PortfoliosTable.user_id == user_id)
+        .order_by(PortfoliosTable.added_at, PortfoliosTable.id)
+    )
+
+def get_holdings(db: Session, user_id: int):
+    """(symbol, company name) pairs for a user's portfolio, in the order they were added"""
+    return db.execute(_holdings_query(user_id)).all()
+
+async def get_holdings_async(db: AsyncSession, user_id: int):
+    return (await db.execute(_holdings_query(user_id))).all()
+
+def summary_row(symbol: str, name: str, cached_data: dict | None) -> dict:
+    """One /portfolio/summary entry, shared by the sync and async (DB_ASYNC) handlers"""
+    if not cached_data:
+        # Return data without price info (will show N/A in frontend)
+        return {
+            "symbol": symbol,
+            "name": name
+        }
+    return {
+        "symbol": symbol,
+        "name": name,
+        "open": cached_data["open"],
+        "high": cached_data["high"],
+        "low": cached_data["low"],
+        "price": cached_data["price"],
+        "volume": cached_data["volume"],
+        "latest_trading_day": cached_data["latest_trading_day"],
+        "previous_close": cached_data["previous_close"],
+        "change": cached_data["change"],
+        "change_percent": cached_data["change_percent"]
+    }
+
+def owned_symbols_query(user_id: int):
+    return select(PortfoliosTable.stock_symbol).where(PortfoliosTable.user_id == user_id)
+
+def get_holdings_with_quotes(db: Session, user_ids: list[int]) -> dict:
+    """{user_id: [(symbol, company name, cached quote or None), ...]} for many users in one query"""
+    if not user_ids:
+        return {}
+    rows = (
+        db.query(PortfoliosTable.user_id, StocksTable.stock_symbol, StocksTable.stock_company_name, StockQuoteCache)
+        .join(StocksTable, StocksTable.stock_symbol == PortfoliosTable.stock_symbol)
+        .outerjoin(StockQuoteCache, StockQuoteCache.stock_symbol == PortfoliosTable.stock_symbol)
+        .filter(PortfoliosTable.user_id.in_(user_ids))
+        .order_by(PortfoliosTable.user_id, PortfoliosTable.added_at, PortfoliosTable.id)
+        .all()
+    )
+
+    holdings = defaultdict(list)
+    for user_id, symbol, name, quote_row in rows:
+        holdings[user_id].append((symbol, name, quote_from_row(quote_row) if quote_row else None))
+    return holdings
@@ -0,0 +1,127 @@
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import PriceHistory, PriceHistorySync
+from database import insert_for
+
+# Bars per INSERT, well below the bind-parameter limits of SQLite and PostgreSQL
+UPSERT_BATCH_SIZE = 1000
+
+def get_bars(db: Session, symbol: str, interval: str, limit: int | None = None):
+    """Stored bars for a series, newest first"""
+    query = (
+        db.query(PriceHistory)
+        .filter(PriceHistory.stock_symbol == symbol, PriceHistory.interval == interval)
+        .order_by(PriceHistory.bar_date.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+def get_newest_bar_date(db: Session, symbol: str, interval: str):
+    return (
+        db.query(func.max(PriceHistory.bar_date))
+        .filter(PriceHistory.stock_symbol == symbol, PriceHistory.interval == interval)
+        .scalar()
+    )
+
+def get_sync(db: Session, symbol: str, interval: str):
+    return db.get(PriceHistorySync, (symbol, interval))
+
+def period_start(interval: str, today: date) -> date:
+    """First day of the week/month that today falls in"""
+    if interval == "weekly":
+        return today - timedelta(days=today.weekday())
+    return today.replace(day=1)
+
+def needs_refresh(newest: date | None, sync: PriceHistorySync | None, interval: str, recheck_seconds: int) -> bool:
+    if newest is None:
+        return True
+    now = datetime.now(timezone.utc)
+    if newest >= period_start(interval, now.date()):
+        return False
+
+    # Upstream may simply not have a bar for this period yet (e.g. Monday morning) -
+    # don't ask again on every request
+    if sync is not None:
+        last_fetched = sync.last_fetched_at
+        if last_fetched.tzinfo is None:
+            last_fetched = last_fetched.replace(tzinfo=timezone.utc)
+        if (now - last_fetched).total_seconds() < recheck_seconds:
+            return False
+    return True
+
+def _bar_values(symbol: str, interval: str, row: dict) -> dict:
+    return {
+        "stock_symbol": symbol,
+        "interval": interval,
+        "bar_date": date.fromisoformat(row["date"]),
+        "open_price": row["open"],
+        "high_price": row["high"],
+        "low_price": row["low"],
+        "close_price": row["close"],
+        "adjusted_close": row["adjusted_close"],
+        "volume": row["volume"],
+        "dividend_amount": row["dividend_amount"]
+    }
+
+def merge_bars(db: Session, symbol: str, interval: str, rows: list[dict], metadata: dict, newest: date | None):
+    """Append bars newer than `newest` and replace the period `newest` falls in; older history is left alone
+
+    Alpha Vantage dates the bar of the week/month in progress by its latest trading day, so that date moves
+    forward as the period goes on. Every stored bar from the start of `newest`'s period on is deleted and
+    written again from `rows`, so a partial bar never stays behind next to the one that replaced it. The
+    writes are INSERT ... ON CONFLICT DO UPDATE, so a worker storing the same series at the same time can't
+    make this fail.
+    """
+    if not rows:
+        # Nothing was parsed - leave last_fetched_at alone so the series isn't taken as checked
+        return 0
+    cutoff = period_start(interval, newest) if newest is not None else None
+    bars = [_bar_values(symbol, interval, row) for row in rows]
+    bars = [bar for bar in bars if cutoff is None or bar["bar_date"] >= cutoff]
+    if bars and cutoff is not None:
+        db.query(PriceHistory).filter(
+            PriceHistory.stock_symbol == symbol,
+            PriceHistory.interval == interval,
+            PriceHistory.bar_date >= cutoff
+        ).delete(synchronize_session=False)
+
+    insert = insert_for(db)
+    for start in range(0, len(bars), UPSERT_BATCH_SIZE):
+        statement = insert(PriceHistory).values(bars[start:start + UPSERT_BATCH_SIZE])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[PriceHistory.stock_symbol, PriceHistory.interval, PriceHistory.bar_date],
+            set_={column: statement.excluded[column] for column in bars[0] if column not in ("stock_symbol", "interval", "bar_date")}
+        ))
+
+    statement = insert(PriceHistorySync).values(
+        stock_symbol=symbol, interval=interval, last_fetched_at=datetime.now(timezone.utc), series_metadata=metadata
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[PriceHistorySync.stock_symbol, PriceHistorySync.interval],
+        set_={"last_fetched_at": statement.excluded.last_fetched_at, "series_metadata": statement.excluded.series_metadata}
+    ))
+    db.commit()
+    return sum(1 for bar in bars if newest is None or bar["bar_date"] > newest)
+
+def bar_to_dict(bar: PriceHistory) -> dict:
+    return {
+        "date": bar.bar_date.isoformat(),
+        "open": bar.open_price,
+        "high": bar.high_price,
+        "low": bar.low_price,
+        "close": bar.close_price,
+        "adjusted_close": bar.adjusted_close,
+        "volume": bar.volume,
+        "dividend_amount": bar.dividend_amount
+    }
+
+def get_close_series(db: Session, symbol: str, interval: str):
+    """(bar_date, adjusted_close) pairs, oldest first - the input for utils.indicators"""
+    return (
+        db.query(PriceHistory.bar_date, PriceHistory.adjusted_close)
+        .filter(PriceHistory.stock_symbol == symbol, PriceHistory.interval == interval)
+        .order_by(PriceHistory.bar_date)
+        .all()
+    )
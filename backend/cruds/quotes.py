@@ -0,0 +1,48 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import StockQuoteCache
+from database import insert_for
+
+def get_quote_row(db: Session, symbol: str):
+    return db.query(StockQuoteCache).filter(StockQuoteCache.stock_symbol == symbol.upper()).first()
+
+def get_quote_rows(db: Session, symbols: list[str]):
+    if not symbols:
+        return []
+    return db.query(StockQuoteCache).filter(StockQuoteCache.stock_symbol.in_(symbols)).all()
+
+async def get_quote_rows_async(db: AsyncSession, symbols: list[str]):
+    if not symbols:
+        return []
+    return (await db.scalars(select(StockQuoteCache).where(StockQuoteCache.stock_symbol.in_(symbols)))).all()
+
+def _quote_values(symbol: str, quote: dict) -> dict:
+    return {
+        "stock_symbol": symbol,
+        "open_price": quote["open"],
+        "high_price": quote["high"],
+        "low_price": quote["low"],
+        "current_price": quote["price"],
+        "volume": quote["volume"],
+        "latest_trading_day": quote["latest_trading_day"],
+        "previous_close": quote["previous_close"],
+        "change": quote["change"],
+        "change_percent": quote["change_percent"],
+        "last_updated": quote["last_updated"],
+    }
+
+def upsert_quote(db: Session, symbol: str, quote: dict):
+    upsert_quotes(db, {symbol.upper(): quote})
+
+def upsert_quotes(db: Session, quotes: dict):
+    """Write many {symbol: quote} entries with one INSERT ... ON CONFLICT (stock_symbol) DO UPDATE"""
+    if not quotes:
+        return
+    rows = [_quote_values(symbol, quote) for symbol, quote in quotes.items()]
+    statement = insert_for(db)(StockQuoteCache).values(rows)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[StockQuoteCache.stock_symbol],
+        set_={column: statement.excluded[column] for column in rows[0] if column != "stock_symbol"}
+    ))
+    db.commit()
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from models import UsersTable, EmailReminderSchedule
+import pytz
+
+def next_send_time(reminder_time: str, timezone_name: str, after: datetime) -> datetime:
+    """First UTC instant strictly after `after` at which the user's local clock reads reminder_time"""
+    tz = pytz.timezone(timezone_name or "UTC")
+    hour, minute = (int(part) for part in reminder_time.split(":"))
+    local_day = after.astimezone(tz).date()
+
+    for days_ahead in range(3):
+        day = local_day + timedelta(days=days_ahead)
+        wall_clock = datetime(day.year, day.month, day.day, hour, minute)
+        try:
+            local = tz.localize(wall_clock, is_dst=None)
+        except pytz.NonExistentTimeError:
+            # Clocks jumped over this time (spring forward) - send just after the gap
+            local = tz.normalize(tz.localize(wall_clock, is_dst=False))
+        except pytz.AmbiguousTimeError:
+            # Time happens twice (fall back) - send on the first one only
+            local = tz.localize(wall_clock, is_dst=True)
+
+        candidate = local.astimezone(timezone.utc)
+        if candidate > after:
+            return candidate
+    raise ValueError(f"No send time found for {reminder_time} {timezone_name}")
+
+def schedule_user(db: Session, user: UsersTable, now: datetime | None = None):
+    """Keep the user's row in email_reminder_schedule in line with their settings (caller commits)"""
+    if not user.email_reminder_enabled or not user.email_reminder_time:
+        if user.reminder_schedule is not None:
+            user.reminder_schedule = None
+        return
+
+    next_send_at = next_send_time(user.email_reminder_time, user.timezone, now or datetime.now(timezone.utc))
+    if user.reminder_schedule is None:
+        user.reminder_schedule = EmailReminderSchedule(next_send_at=next_send_at)
+    else:
+        user.reminder_schedule.next_send_at = next_send_at
+
+def get_due(db: Session, now: datetime):
+    """Claim every (schedule, user) that is due; rows locked by another worker's tick are skipped"""
+    return (
+        db.query(EmailReminderSchedule, UsersTable)
+        .join(UsersTable, UsersTable.id == EmailReminderSchedule.user_id)
+        .filter(EmailReminderSchedule.next_send_at <= now)
+        .with_for_update(skip_locked=True, of=EmailReminderSchedule)
+        .all()
+    )
+
+def backfill_schedules(db: Session) -> int:
+    """Create missing schedule rows, e.g. for users who enabled reminders before the index existed"""
+    users = (
+        db.query(UsersTable)
+        .outerjoin(EmailReminderSchedule, EmailReminderSchedule.user_id == UsersTable.id)
+        .filter(
+            UsersTable.email_reminder_enabled == True,
+            UsersTable.email_reminder_time.isnot(None),
+            EmailReminderSchedule.user_id.is_(None)
+        )
+        .all()
+    )
+    for user in users:
+        try:
+            schedule_user(db, user)
+        except (pytz.exceptions.UnknownTimeZoneError, ValueError):
+            print(f"❌ Invalid reminder settings for user {user.email} - not scheduled")
+    db.commit()
+    return len(users)
@@ -0,0 +1,21 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from models import StocksTable, StockUniverseChange, StockUniverseVersion
+
+UNIVERSE_ROW_ID = 1
+
+def get_version(db: Session) -> int:
+    return db.execute(
+        select(StockUniverseVersion.version).where(StockUniverseVersion.id == UNIVERSE_ROW_ID)
+    ).scalar() or 0
+
+def get_oldest_logged_version(db: Session) -> int | None:
+    return db.execute(select(func.min(StockUniverseChange.version))).scalar()
+
+def get_changed_stocks(db: Session, since_version: int):
+    """Current (symbol, name, is_listed) of every symbol changed after since_version"""
+    changed = select(StockUniverseChange.stock_symbol).where(StockUniverseChange.version > since_version)
+    return db.execute(
+        select(StocksTable.stock_symbol, StocksTable.stock_company_name, StocksTable.is_listed)
+        .where(StocksTable.stock_symbol.in_(changed))
+    ).all()
@@ -1,17 +1,23 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models import UsersTable
 from schemas import UserSignup
-import bcrypt
+from utils import passwords
 
-def create_user(db: Session, user: UserSignup):
-    hashed_pw = bcrypt.hashpw(user.password.encode("utf-8"), bcrypt.gensalt())
+def create_user(db: Session, user: UserSignup, commit: bool = True, hashed_password: str | None = None):
+    # Request handlers hash on the password executor and pass the result in
     db_user = UsersTable(
         email=user.email,
-        hashed_password=hashed_pw.decode("utf-8"),
+        hashed_password=hashed_password or passwords.hash_password(user.password),
         is_verified=False,
         alpha_vantage_api_key=user.alpha_vantage_api_key
     )
     db.add(db_user)
+    if not commit:
+        # Caller commits, e.g. together with the verification email in the outbox
+        db.flush()
+        return db_user
     db.commit()
     db.refresh(db_user)
     
@@ -20,6 +26,9 @@ def create_user(db: Session, user: UserSignup):
 def get_user_by_email(db: Session, email: str):
     return db.query(UsersTable).filter(UsersTable.email == email).first()
 
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    return await db.scalar(select(UsersTable).where(UsersTable.email == email).limit(1))
+
 def verify_user(db: Session, email: str):
     user = get_user_by_email(db, email)
     if user:
@@ -30,7 +39,6 @@ def verify_user(db: Session, email: str):
 def update_password(db: Session, email: str, new_password: str):
     user = get_user_by_email(db, email)
     if user:
-        hashed_pw = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt())
-        user.hashed_password = hashed_pw.decode("utf-8")
+        user.hashed_password = passwords.hash_password(new_password)
         db.commit()
     return user
@@ -1,14 +1,34 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from config import get_settings
+from utils.db_pool import TimedQueuePool, pool_stats
 
 settings = get_settings()
 
+def pool_options(url: str) -> dict:
+    """Pool sizing from Settings; an in-memory SQLite database keeps SQLAlchemy's single-connection pool"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
 # ✅ No need for check_same_thread anymore
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=False  # optional: prints SQL statements to console
+    echo=False,  # optional: prints SQL statements to console
+    **pool_options(settings.DATABASE_URL)
 )
+pool_stats.attach(engine)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -16,8 +36,28 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Async drivers for the same databases; only needed with DB_ASYNC
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+    # Same sizing as the sync pool, on SQLAlchemy's asyncio-aware queue pool
+    async_pool_options = {key: value for key, value in pool_options(async_url).items() if key != "poolclass"}
+    async_engine = create_async_engine(async_url, echo=False, **async_pool_options)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+def insert_for(db: Session):
+    """The session's dialect INSERT, which has on_conflict_do_nothing / on_conflict_do_update"""
+    return {"postgresql": postgresql.insert, "sqlite": sqlite.insert}[db.get_bind().dialect.name]
+
 # ✅ Dependency to get a DB session
 def get_db():
     db: Session = SessionLocal()
@@ -25,3 +65,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency for the endpoints in routers/async_reads.py (DB_ASYNC only)
+async def get_async_db():
+    db: AsyncSession = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
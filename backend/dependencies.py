@@ -1,17 +1,54 @@
 from fastapi import Depends, HTTPException 
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials 
 from jose import JWTError
-from utils.jwt import decode_token
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from utils.jwt import decode_token_cached
+from utils import user_cache
+from utils.user_cache import CurrentUser
+from cruds import users as user_crud
+from database import get_db, get_async_db
+from config import get_settings
+
+settings = get_settings()
 
 security = HTTPBearer()
 
 def get_current_user_email(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     token = credentials.credentials  # Extract token string from "Bearer <token>"
     try:
-        payload = decode_token(token)
+        payload = decode_token_cached(token)
         email = payload.get("sub")
         if not isinstance(email, str):
             raise HTTPException(status_code=401, detail="Invalid token")
         return email
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+
+def get_current_user(current_user_email: str = Depends(get_current_user_email), db: Session = Depends(get_db)) -> CurrentUser:
+    """The authenticated user - resolved once per request and served from user_cache while fresh"""
+    user = user_cache.get(current_user_email)
+    if user is None:
+        row = user_crud.get_user_by_email(db, current_user_email)
+        if not row:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = user_cache.remember(row)
+    return user
+
+async def get_current_user_async(
+    current_user_email: str = Depends(get_current_user_email), db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
+    """get_current_user for the async endpoints - a cache miss is read through the async session"""
+    user = user_cache.get(current_user_email)
+    if user is None:
+        row = await user_crud.get_user_by_email_async(db, current_user_email)
+        if not row:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = user_cache.remember(row)
+    return user
+
+def get_current_admin_email(current_user_email: str = Depends(get_current_user_email)) -> str:
+    admins = {email.strip().lower() for email in settings.ADMIN_EMAILS.split(",") if email.strip()}
+    if current_user_email.lower() not in admins:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user_email
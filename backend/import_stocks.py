@@ -1,9 +1,37 @@
-import requests
+"""Sync stocks_table with Alpha Vantage's LISTING_STATUS universe.
+
+The CSV is streamed straight from the response (or from a local file with
+--file) into a temporary staging table - PostgreSQL COPY when running on
+psycopg2, batched INSERTs otherwise (SQLite) - and stocks_table is then brought
+in line with a few set-based statements:
+
+  insert   symbols that are new
+  update   symbols whose company name changed, or that came back after a delisting
+  delist   symbols no longer in the listing are marked is_listed=False, never deleted,
+           so portfolios that hold them are left alone
+
+Staging and the diff run in one transaction, so readers see either the old
+universe or the new one, never a partial table. The commit also bumps the
+universe version (stock_universe_version) and logs the touched symbols;
+running workers poll the version and patch their search index from the log.
+Row counts and timings are printed per phase.
+
+    python import_stocks.py                 # download and import
+    python import_stocks.py --file listing_status.csv
+"""
+import argparse
 import csv
 import os
-from sqlalchemy.orm import Session
-from models import StocksTable
-from database import SessionLocal
+import time
+import requests
+from sqlalchemy import (
+    Column, MetaData, String, Table, Connection,
+    and_, case, delete, exists, false, func, insert, literal, select, true, update
+)
+from models import StocksTable, StockUniverseChange, StockUniverseVersion
+from cruds.universe import UNIVERSE_ROW_ID
+from database import engine
+from utils import metrics
 
 ALPHA_VANTAGE_API_KEY = os.environ["ALPHA_VANTAGE_API_KEY"]
 URL = f"https://www.alphavantage.co/query?function=LISTING_STATUS&apikey={ALPHA_VANTAGE_API_KEY}"
@@ -12,36 +40,231 @@ URL = f"https://www.alphavantage.co/query?function=LISTING_STATUS&apikey={ALPHA_
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_FILE = os.path.join(BASE_DIR, "listing_status.csv")
 
-def download_csv():
-    response = requests.get(URL)
-    if response.status_code == 200:
-        with open(CSV_FILE, "w", newline="") as f:
-            f.write(response.text)
-        print("✅ CSV downloaded.")
+INSERT_BATCH_SIZE = 1000
+# Refuse to delist more than this share of the listed universe unless --force (a truncated or error response)
+MAX_DELIST_FRACTION = 0.5
+# Universe versions whose change log is kept for incremental index updates
+CHANGE_LOG_VERSIONS = 20
+
+staging = Table(
+    "stocks_staging",
+    MetaData(),
+    Column("stock_symbol", String(20), primary_key=True),
+    Column("stock_company_name", String(256), nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+def download_lines():
+    """Yield the LISTING_STATUS CSV line by line without holding the whole response"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with requests.get(URL, stream=True, timeout=60) as response:
+            if response.status_code != 200:
+                outcome = "http_error"
+            response.raise_for_status()
+            response.encoding = response.encoding or "utf-8"
+            yield from response.iter_lines(decode_unicode=True)
+            outcome = "ok"
+    except requests.Timeout:
+        outcome = "timeout"
+        raise
+    finally:
+        # Only reaches /metrics when PROMETHEUS_MULTIPROC_DIR is shared with the app workers
+        metrics.record_upstream("LISTING_STATUS", outcome, time.perf_counter() - started)
+
+def file_lines(path: str):
+    with open(path, newline="") as csvfile:
+        yield from csvfile
+
+def active_rows(lines):
+    """(symbol, name) for each active listing, first occurrence of a symbol wins"""
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or not {"symbol", "name", "status"} <= set(reader.fieldnames):
+        # Alpha Vantage answers a throttled or bad request with a JSON/text body instead of the CSV
+        raise ValueError(f"Unexpected LISTING_STATUS header: {reader.fieldnames}")
+    seen = set()
+    for row in reader:
+        symbol = (row["symbol"] or "").strip()
+        if row["status"].lower() != "active" or not symbol or symbol in seen:
+            continue
+        seen.add(symbol)
+        yield symbol, (row["name"] or "").strip()
+
+class _CopyBuffer:
+    """Read-only file over a row iterator, CSV-encoded on demand for psycopg2's copy_expert"""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._pending = ""
+        self.count = 0
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = "".join(('"', row[0].replace('"', '""'), '","', row[1].replace('"', '""'), '"\n'))
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+        data = "".join(chunks)
+        if size < 0:
+            self._pending = ""
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+def stage_rows(conn: Connection, rows) -> int:
+    """Load (symbol, name) rows into the staging table; returns how many were staged"""
+    staging.create(conn)
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        buffer = _CopyBuffer(rows)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert("COPY stocks_staging (stock_symbol, stock_company_name) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+        return buffer.count
+
+    count = 0
+    batch = []
+    for symbol, name in rows:
+        batch.append({"stock_symbol": symbol, "stock_company_name": name})
+        if len(batch) >= INSERT_BATCH_SIZE:
+            conn.execute(insert(staging), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.execute(insert(staging), batch)
+        count += len(batch)
+    return count
+
+def _log_changes(conn: Connection, version: int, query) -> int:
+    """Record (symbol, change) rows selected by `query` under `version`"""
+    return conn.execute(
+        insert(StockUniverseChange).from_select(["version", "stock_symbol", "change"], query)
+    ).rowcount
+
+def apply_diff(conn: Connection, force: bool = False, timings: dict | None = None) -> dict:
+    """Bring stocks_table in line with the staging table and publish it as a new universe version
+
+    Each phase first logs the symbols it is about to touch in stock_universe_changes, so
+    every worker can patch its search index with just those rows (see utils.stock_search_index).
+    """
+    timings = timings if timings is not None else {}
+    in_staging = exists().where(staging.c.stock_symbol == StocksTable.stock_symbol)
+    staged_name = (
+        select(staging.c.stock_company_name)
+        .where(staging.c.stock_symbol == StocksTable.stock_symbol)
+        .scalar_subquery()
+    )
+
+    started = time.perf_counter()
+    # Locking the version row serializes concurrent imports
+    current = conn.execute(
+        select(StockUniverseVersion.version).where(StockUniverseVersion.id == UNIVERSE_ROW_ID).with_for_update()
+    ).scalar()
+    if current is None:
+        conn.execute(insert(StockUniverseVersion).values(id=UNIVERSE_ROW_ID, version=0))
+        current = 0
+    version = current + 1
+
+    to_delist = conn.execute(
+        select(func.count()).select_from(StocksTable).where(StocksTable.is_listed == true(), ~in_staging)
+    ).scalar()
+    listed = conn.execute(select(func.count()).select_from(StocksTable).where(StocksTable.is_listed == true())).scalar()
+    if listed and to_delist > listed * MAX_DELIST_FRACTION and not force:
+        raise RuntimeError(
+            f"Import would delist {to_delist} of {listed} listed symbols - the download looks incomplete "
+            f"(rerun with --force if this is intended)"
+        )
+
+    counts = {}
+    new_symbols = ~exists().where(StocksTable.stock_symbol == staging.c.stock_symbol)
+    counts["inserted"] = _log_changes(
+        conn, version, select(literal(version), staging.c.stock_symbol, literal("listed")).where(new_symbols)
+    )
+    conn.execute(
+        insert(StocksTable).from_select(
+            ["stock_symbol", "stock_company_name", "is_listed"],
+            select(staging.c.stock_symbol, staging.c.stock_company_name, true()).where(new_symbols),
+        )
+    )
+    timings["insert"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    changed = exists().where(
+        staging.c.stock_symbol == StocksTable.stock_symbol,
+        (staging.c.stock_company_name != StocksTable.stock_company_name) | (StocksTable.is_listed == false()),
+    )
+    counts["updated"] = _log_changes(
+        conn, version,
+        select(
+            literal(version),
+            StocksTable.stock_symbol,
+            case((StocksTable.is_listed == false(), "listed"), else_="renamed"),
+        ).where(changed)
+    )
+    conn.execute(update(StocksTable).where(changed).values(stock_company_name=staged_name, is_listed=True))
+    timings["update"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    delisted = and_(StocksTable.is_listed == true(), ~in_staging)
+    counts["delisted"] = _log_changes(
+        conn, version, select(literal(version), StocksTable.stock_symbol, literal("delisted")).where(delisted)
+    )
+    conn.execute(update(StocksTable).where(delisted).values(is_listed=False))
+    timings["delist"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if any(counts.values()):
+        conn.execute(
+            update(StockUniverseVersion)
+            .where(StockUniverseVersion.id == UNIVERSE_ROW_ID)
+            .values(version=version, published_at=func.now())
+        )
+        # Workers further behind than this simply rebuild their index from scratch
+        conn.execute(delete(StockUniverseChange).where(StockUniverseChange.version <= version - CHANGE_LOG_VERSIONS))
     else:
-        print("❌ Failed to download CSV.")
-
-def import_csvfile_to_db():
-    db: Session = SessionLocal()
-    db.query(StocksTable).delete()  # Clear old records
-
-    with open(CSV_FILE, newline="") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row["status"].lower() == "active":
-                stock = StocksTable(
-                    stock_symbol=row["symbol"],
-                    stock_company_name=row["name"],
-                    is_listed=True
-                )
-                db.add(stock)
-
-    db.commit()
-    db.close()
-    print("✅ Database updated.")
+        version = current
+    counts["version"] = version
+    timings["publish"] = time.perf_counter() - started
+    return counts
+
+def import_listing(lines, force: bool = False) -> dict:
+    """Stage and publish in one transaction - readers see the old universe until the commit, then the new one"""
+    timings = {}
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        staged = stage_rows(conn, active_rows(lines))
+        timings["stage"] = time.perf_counter() - started
+        counts = apply_diff(conn, force, timings)
+        staging.drop(conn)
+    return {"counts": {"staged": staged, **counts}, "timings": timings}
+
+def print_report(report: dict):
+    counts, timings = report["counts"], report["timings"]
+    rows = [("stage", counts["staged"]), ("insert", counts["inserted"]), ("update", counts["updated"]),
+            ("delist", counts["delisted"]), ("publish", None)]
+    print(f"{'phase':<10}{'rows':>8}{'ms':>10}")
+    for phase, count in rows:
+        print(f"{phase:<10}{'' if count is None else count:>8}{timings[phase] * 1000:>10.1f}")
+    print(f"{'total':<10}{'':>8}{sum(timings.values()) * 1000:>10.1f}")
+    print(f"🌐 Stock universe version {counts['version']} - running workers pick it up within their next poll")
 
 if __name__ == "__main__":
-    if os.path.exists(CSV_FILE):
-        os.remove(CSV_FILE)
-    download_csv()
-    import_csvfile_to_db()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help=f"import a LISTING_STATUS CSV from disk instead of downloading (e.g. {CSV_FILE})")
+    parser.add_argument("--force", action="store_true", help="apply even if most listed symbols would be delisted")
+    args = parser.parse_args()
+
+    try:
+        report = import_listing(file_lines(args.file) if args.file else download_lines(), force=args.force)
+    except (requests.RequestException, ValueError, RuntimeError) as e:
+        print(f"❌ Import failed, stocks_table unchanged: {e}")
+        raise SystemExit(1)
+    print_report(report)
+    print("✅ Database updated.")
@@ -1,17 +1,42 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine
-from models import Base
-from routers import auth, portfolio, stock_search, email, user
+from database import engine, async_engine, SessionLocal
+import migrations
+from routers import auth, portfolio, stock_search, email, user, admin, async_reads
 from scheduler import start_scheduler
+from outbox import start_outbox_dispatcher
+from utils import alpha_vantage, stock_search_index, passwords, metrics, slow_queries  # noqa: F401 (slow_queries registers its engine hooks)
+from utils.query_counter import QueryCounterMiddleware
 from config import get_settings
 
 settings = get_settings()
 
-# create the databasu
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is changed by `python migrate.py` (run before deploying), never by the app itself
+    behind = migrations.pending(engine)
+    if behind:
+        names = ", ".join(f"v{version:04d}_{name}" for version, name, _ in behind)
+        raise RuntimeError(f"Database schema is behind ({names}) - run `python migrate.py` first")
+    # One pooled, keep-alive Alpha Vantage client per worker
+    await alpha_vantage.start_client()
+    db = SessionLocal()
+    try:
+        stock_search_index.rebuild(db)
+    finally:
+        db.close()
+    # Pick up stock universes published by import_stocks.py while we run
+    universe_watcher = asyncio.create_task(stock_search_index.watch(settings.UNIVERSE_POLL_SECONDS))
+    yield
+    universe_watcher.cancel()
+    await alpha_vantage.close_client()
+    if async_engine is not None:
+        await async_engine.dispose()
+    passwords.shutdown()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -20,22 +45,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Queries", "X-DB-Time-ms"],  # /stocks browse pagination, query counts
 )
 
+# SQL statements per request: N+1 warnings, and X-DB-Queries / X-DB-Time-ms with QUERY_COUNT_HEADERS
+app.add_middleware(QueryCounterMiddleware)
+
+# Latency per route template for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
+if settings.DB_ASYNC:
+    # Registered first so these async handlers take the hot read paths
+    app.include_router(async_reads.router)
 app.include_router(auth.router)
 app.include_router(email.router)
 app.include_router(portfolio.router)
 app.include_router(stock_search.router)
 app.include_router(user.router)
+app.include_router(admin.router)
 
 # Start the email scheduler
 start_scheduler()
 
+# Deliver queued emails (verification, password reset, account deletion)
+start_outbox_dispatcher()
+
 @app.get("/")
 def root():
     return {"message": "FastAPI is working!"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus scrape endpoint (all workers' samples when PROMETHEUS_MULTIPROC_DIR is set)"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
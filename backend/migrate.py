@@ -0,0 +1,34 @@
+"""Apply schema migrations (see migrations/__init__.py).
+
+Run this before starting a new version of the app - the app refuses to start
+on a database that is behind.
+
+    python migrate.py                # apply pending migrations
+    python migrate.py status         # list applied and pending migrations
+"""
+import argparse
+import migrations
+from database import engine
+
+def status():
+    applied = migrations.applied_versions(engine)
+    for version, name, module in migrations.available():
+        mark = "✅" if version in applied else "⏳"
+        summary = (module.__doc__ or "").strip().splitlines()[0] if module.__doc__ else ""
+        print(f"{mark} v{version:04d}_{name:<32} {summary}")
+
+def upgrade():
+    ran = migrations.upgrade(engine)
+    for version, name in ran:
+        print(f"✅ Applied v{version:04d}_{name}")
+    print("✅ Database schema is up to date" if ran else "✅ Nothing to apply - database schema is up to date")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status"])
+    args = parser.parse_args()
+
+    if args.command == "status":
+        status()
+    else:
+        upgrade()
@@ -0,0 +1,66 @@
+"""Versioned schema migrations.
+
+Each module in this package named vNNNN_<name>.py is one migration: a
+docstring saying what it does and an upgrade(conn) function. migrate.py
+applies the pending ones in order, each in its own transaction, and records
+it in schema_migrations. The app never changes the schema itself: startup
+refuses to serve a database that is behind (see main.py).
+
+Migrations are frozen DDL and never import models: a fresh database goes
+through the same steps as an existing one. v0001 is the schema main.py used
+to build with create_all on every boot; databases from that time may already
+have some of it (or more), so migrations use IF NOT EXISTS or check first.
+Only upgrade() creates schema_migrations; reading the applied versions on a
+database that has never been migrated changes nothing.
+"""
+import importlib
+import pkgutil
+import re
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, inspect, select, text
+from sqlalchemy.engine import Engine
+
+_VERSION_MODULE = re.compile(r"^v(\d{4})_(\w+)$")
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(128), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+def available() -> list[tuple[int, str, object]]:
+    """(version, name, module) for every migration in this package, oldest first"""
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _VERSION_MODULE.match(info.name)
+        if match:
+            found.append((int(match.group(1)), match.group(2), importlib.import_module(f"{__name__}.{info.name}")))
+    return sorted(found, key=lambda migration: migration[0])
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(schema_migrations.name):
+            return set()
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+def pending(engine: Engine) -> list[tuple[int, str, object]]:
+    done = applied_versions(engine)
+    return [migration for migration in available() if migration[0] not in done]
+
+def upgrade(engine: Engine) -> list[tuple[int, str]]:
+    """Apply every pending migration; returns (version, name) of the ones that ran"""
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+    ran = []
+    for version, name, module in pending(engine):
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Two deploys migrating at once: the second waits, then skips what the first applied
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))"))
+                if conn.execute(select(schema_migrations.c.version).where(schema_migrations.c.version == version)).first():
+                    continue
+            module.upgrade(conn)
+            conn.execute(insert(schema_migrations).values(version=version, name=name))
+        ran.append((version, name))
+    return ran
@@ -0,0 +1,149 @@
+"""Create the tables the app had before versioned migrations
+
+Frozen DDL, not the current models: later migrations change this schema, and a
+fresh database has to go through the same steps as an existing one. Before
+migrations main.py ran create_all on every boot, so on those databases some or
+all of these already exist - hence IF NOT EXISTS throughout.
+"""
+from sqlalchemy import Connection, text
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS api_key_usage (
+        api_key_hash VARCHAR(64) NOT NULL,
+        usage_date DATE NOT NULL,
+        calls INTEGER NOT NULL,
+        PRIMARY KEY (api_key_hash, usage_date)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS email_outbox (
+        id {serial} NOT NULL,
+        recipient VARCHAR(256) NOT NULL,
+        subject VARCHAR(256) NOT NULL,
+        html_body TEXT NOT NULL,
+        status VARCHAR(10) NOT NULL,
+        attempts INTEGER NOT NULL,
+        next_attempt_at {timestamp} DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        last_error VARCHAR(512),
+        created_at {timestamp} DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        sent_at {timestamp},
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_email_outbox_status_next_attempt_at ON email_outbox (status, next_attempt_at)",
+    """
+    CREATE TABLE IF NOT EXISTS price_history (
+        stock_symbol VARCHAR(20) NOT NULL,
+        interval VARCHAR(10) NOT NULL,
+        bar_date DATE NOT NULL,
+        open_price FLOAT NOT NULL,
+        high_price FLOAT NOT NULL,
+        low_price FLOAT NOT NULL,
+        close_price FLOAT NOT NULL,
+        adjusted_close FLOAT NOT NULL,
+        volume BIGINT NOT NULL,
+        dividend_amount FLOAT NOT NULL,
+        PRIMARY KEY (stock_symbol, interval, bar_date)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS price_history_sync (
+        stock_symbol VARCHAR(20) NOT NULL,
+        interval VARCHAR(10) NOT NULL,
+        last_fetched_at {timestamp} NOT NULL,
+        series_metadata JSON,
+        PRIMARY KEY (stock_symbol, interval)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_quote_cache (
+        stock_symbol VARCHAR(20) NOT NULL,
+        open_price FLOAT,
+        high_price FLOAT,
+        low_price FLOAT,
+        current_price FLOAT,
+        volume INTEGER,
+        latest_trading_day VARCHAR(20),
+        previous_close FLOAT,
+        change FLOAT,
+        change_percent VARCHAR(20),
+        last_updated {timestamp} DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        PRIMARY KEY (stock_symbol)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_stock_quote_cache_stock_symbol ON stock_quote_cache (stock_symbol)",
+    """
+    CREATE TABLE IF NOT EXISTS stock_universe_changes (
+        version INTEGER NOT NULL,
+        stock_symbol VARCHAR(20) NOT NULL,
+        change VARCHAR(10) NOT NULL,
+        PRIMARY KEY (version, stock_symbol)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_universe_version (
+        id {serial} NOT NULL,
+        version INTEGER NOT NULL,
+        published_at {timestamp} DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stocks_table (
+        stock_symbol VARCHAR(20) NOT NULL,
+        stock_company_name VARCHAR(256) NOT NULL,
+        is_listed BOOLEAN NOT NULL,
+        PRIMARY KEY (stock_symbol)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_stocks_table_stock_symbol ON stocks_table (stock_symbol)",
+    """
+    CREATE TABLE IF NOT EXISTS users_table (
+        id {serial} NOT NULL,
+        email VARCHAR(256) NOT NULL,
+        hashed_password VARCHAR NOT NULL,
+        is_verified BOOLEAN NOT NULL,
+        alpha_vantage_api_key VARCHAR(128) NOT NULL,
+        email_reminder_time VARCHAR(10),
+        email_reminder_enabled BOOLEAN NOT NULL,
+        timezone VARCHAR(50),
+        last_api_key_update {timestamp},
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_table_email ON users_table (email)",
+    "CREATE INDEX IF NOT EXISTS ix_users_table_id ON users_table (id)",
+    """
+    CREATE TABLE IF NOT EXISTS email_reminder_schedule (
+        user_id INTEGER NOT NULL,
+        next_send_at {timestamp} NOT NULL,
+        PRIMARY KEY (user_id),
+        FOREIGN KEY (user_id) REFERENCES users_table (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_email_reminder_schedule_next_send_at ON email_reminder_schedule (next_send_at)",
+    """
+    CREATE TABLE IF NOT EXISTS portfolios_table (
+        id {serial} NOT NULL,
+        user_id INTEGER NOT NULL,
+        stock_symbol VARCHAR(20) NOT NULL,
+        added_at {timestamp} DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY (user_id) REFERENCES users_table (id),
+        FOREIGN KEY (stock_symbol) REFERENCES stocks_table (stock_symbol)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_portfolios_table_id ON portfolios_table (id)",
+]
+
+# SQLite: an INTEGER primary key is the rowid, so it autoincrements without SERIAL
+TYPES = {
+    "postgresql": {"serial": "SERIAL", "timestamp": "TIMESTAMP WITH TIME ZONE"},
+    "sqlite": {"serial": "INTEGER", "timestamp": "DATETIME"},
+}
+
+def upgrade(conn: Connection):
+    types = TYPES[conn.dialect.name]
+    for statement in STATEMENTS:
+        conn.execute(text(statement.format(**types)))
@@ -0,0 +1,19 @@
+"""One row per (user, symbol) in portfolios_table
+
+The unique index replaces the check-then-insert in /portfolio/add (a race that
+could store the same holding twice) with INSERT ... ON CONFLICT DO NOTHING,
+and serves every per-user portfolio lookup: user_id alone uses its prefix,
+(user_id, stock_symbol) is a single index probe that never touches the table.
+Duplicates left behind by the old race are removed first, keeping the oldest.
+"""
+from sqlalchemy import Connection, text
+
+def upgrade(conn: Connection):
+    conn.execute(text(
+        "DELETE FROM portfolios_table WHERE id NOT IN "
+        "(SELECT MIN(id) FROM portfolios_table GROUP BY user_id, stock_symbol)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_portfolios_table_user_id_stock_symbol "
+        "ON portfolios_table (user_id, stock_symbol)"
+    ))
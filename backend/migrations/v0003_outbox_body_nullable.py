@@ -0,0 +1,41 @@
+"""Let email_outbox.html_body be NULL, so delivered emails don't keep their body
+
+Verification and password-reset emails carry live bearer tokens. mark_sent now
+clears the body once an email is delivered, and the dispatcher deletes sent and
+dead-lettered rows after OUTBOX_RETENTION_DAYS. PostgreSQL drops the constraint
+in place; SQLite can't alter a column, so the table is rebuilt.
+"""
+from sqlalchemy import Connection, text
+
+SQLITE_TABLE = """
+CREATE TABLE email_outbox_new (
+    id INTEGER NOT NULL,
+    recipient VARCHAR(256) NOT NULL,
+    subject VARCHAR(256) NOT NULL,
+    html_body TEXT,
+    status VARCHAR(10) NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    last_error VARCHAR(512),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    sent_at DATETIME,
+    PRIMARY KEY (id)
+)
+"""
+COLUMNS = "id, recipient, subject, html_body, status, attempts, next_attempt_at, last_error, created_at, sent_at"
+
+def upgrade(conn: Connection):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE email_outbox ALTER COLUMN html_body DROP NOT NULL"))
+        return
+
+    not_null = {row[1]: row[3] for row in conn.execute(text("PRAGMA table_info(email_outbox)"))}
+    if not not_null["html_body"]:
+        return
+    conn.execute(text(SQLITE_TABLE))
+    conn.execute(text(f"INSERT INTO email_outbox_new ({COLUMNS}) SELECT {COLUMNS} FROM email_outbox"))
+    conn.execute(text("DROP TABLE email_outbox"))
+    conn.execute(text("ALTER TABLE email_outbox_new RENAME TO email_outbox"))
+    conn.execute(text(
+        "CREATE INDEX ix_email_outbox_status_next_attempt_at ON email_outbox (status, next_attempt_at)"
+    ))
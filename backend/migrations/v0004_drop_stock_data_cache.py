@@ -0,0 +1,11 @@
+"""Drop stock_data_cache, the per-user quote cache
+
+Quotes have been cached once per symbol in stock_quote_cache since the
+shared quote cache replaced it, and nothing reads or writes stock_data_cache
+any more. Databases created by create_all before then still have the table
+(v0001 never created it), hence IF EXISTS.
+"""
+from sqlalchemy import Connection, text
+
+def upgrade(conn: Connection):
+    conn.execute(text("DROP TABLE IF EXISTS stock_data_cache"))
@@ -1,5 +1,5 @@
-from datetime import datetime
-from sqlalchemy import Boolean, DateTime, ForeignKey, String, Float, Integer, func
+from datetime import date, datetime
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, ForeignKey, Index, String, Float, Integer, JSON, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import Optional
 from database import Base
@@ -18,6 +18,8 @@ class UsersTable(Base): # Use capital letter for class name
     last_api_key_update: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
 #RELATIONSHIP BETWEEN TABLES
     user_saved_stocks: Mapped[list["PortfoliosTable"]] = relationship("PortfoliosTable", back_populates="user", cascade="all, delete-orphan")
+    reminder_schedule: Mapped[Optional["EmailReminderSchedule"]] = relationship(
+        "EmailReminderSchedule", back_populates="user", uselist=False, cascade="all, delete-orphan")
 
 class StocksTable(Base):
     __tablename__ = "stocks_table"
@@ -40,12 +42,13 @@ class PortfoliosTable(Base):
     user: Mapped["UsersTable"] = relationship("UsersTable", back_populates="user_saved_stocks")
     stock: Mapped["StocksTable"] = relationship("StocksTable", back_populates="stock_appearance_in_portfolios")
 
-class StockDataCache(Base):
-    __tablename__ = "stock_data_cache"
+    # one row per holding; lets /portfolio/add insert with ON CONFLICT DO NOTHING (migrations/v0002)
+    __table_args__ = (Index("uq_portfolios_table_user_id_stock_symbol", "user_id", "stock_symbol", unique=True),)
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users_table.id"), nullable=False)
-    stock_symbol: Mapped[str] = mapped_column(String(20), nullable=False)
+class StockQuoteCache(Base):
+    __tablename__ = "stock_quote_cache"
+# one row per symbol, shared by every user who holds it
+    stock_symbol: Mapped[str] = mapped_column(String(20), primary_key=True, index=True, nullable=False)
     open_price: Mapped[float] = mapped_column(Float, nullable=True)
     high_price: Mapped[float] = mapped_column(Float, nullable=True)
     low_price: Mapped[float] = mapped_column(Float, nullable=True)
@@ -56,5 +59,70 @@ class StockDataCache(Base):
     change: Mapped[float] = mapped_column(Float, nullable=True)
     change_percent: Mapped[str] = mapped_column(String(20), nullable=True)
     last_updated: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class ApiKeyUsage(Base):
+    __tablename__ = "api_key_usage"
+# daily Alpha Vantage call counter per key, shared by every worker
+    api_key_hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256 of the key, never the key itself
+    usage_date: Mapped[date] = mapped_column(Date, primary_key=True)  # UTC day
+    calls: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+class PriceHistory(Base):
+    __tablename__ = "price_history"
+# one adjusted weekly/monthly bar per symbol, shared by every user
+    stock_symbol: Mapped[str] = mapped_column(String(20), primary_key=True)
+    interval: Mapped[str] = mapped_column(String(10), primary_key=True)  # "weekly" or "monthly"
+    bar_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    open_price: Mapped[float] = mapped_column(Float, nullable=False)
+    high_price: Mapped[float] = mapped_column(Float, nullable=False)
+    low_price: Mapped[float] = mapped_column(Float, nullable=False)
+    close_price: Mapped[float] = mapped_column(Float, nullable=False)
+    adjusted_close: Mapped[float] = mapped_column(Float, nullable=False)
+    volume: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    dividend_amount: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+
+class PriceHistorySync(Base):
+    __tablename__ = "price_history_sync"
+# when each (symbol, interval) series was last pulled from Alpha Vantage
+    stock_symbol: Mapped[str] = mapped_column(String(20), primary_key=True)
+    interval: Mapped[str] = mapped_column(String(10), primary_key=True)
+    last_fetched_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    series_metadata: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # upstream "Meta Data"
+
+class EmailReminderSchedule(Base):
+    __tablename__ = "email_reminder_schedule"
+# next UTC instant each user with reminders enabled is due; the scheduler only reads rows that are due
+    user_id: Mapped[int] = mapped_column(ForeignKey("users_table.id", ondelete="CASCADE"), primary_key=True)
+    next_send_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True, nullable=False)
 #RELATIONSHIP BETWEEN TABLES
-    user: Mapped["UsersTable"] = relationship("UsersTable")
\ No newline at end of file
+    user: Mapped["UsersTable"] = relationship("UsersTable", back_populates="reminder_schedule")
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+# emails written in the same transaction as the change that triggers them; outbox.py delivers them
+    id: Mapped[int] = mapped_column(primary_key=True)
+    recipient: Mapped[str] = mapped_column(String(256), nullable=False)
+    subject: Mapped[str] = mapped_column(String(256), nullable=False)
+    html_body: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # cleared once sent: it may hold a live token
+    status: Mapped[str] = mapped_column(String(10), nullable=False, default="pending")  # "pending", "sent" or "dead"
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),)
+
+class StockUniverseVersion(Base):
+    __tablename__ = "stock_universe_version"
+# a single row (id=1) bumped every time import_stocks.py publishes a changed universe
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    published_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class StockUniverseChange(Base):
+    __tablename__ = "stock_universe_changes"
+# the symbols each version listed, renamed or delisted, so workers can patch their indexes instead of reloading
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    stock_symbol: Mapped[str] = mapped_column(String(20), primary_key=True)
+    change: Mapped[str] = mapped_column(String(10), nullable=False)  # "listed", "renamed" or "delisted"
@@ -0,0 +1,108 @@
+"""Background delivery of the email outbox (see cruds.outbox).
+
+Request handlers only insert into email_outbox inside their own transaction;
+this thread leases due rows, sends them over the pooled SMTP connections and
+records the result. Failures are retried with exponential backoff until
+OUTBOX_MAX_ATTEMPTS, after which the email is dead-lettered; a permanent (5xx)
+refusal is dead-lettered straight away. Once an email is sent its body (which
+may hold a verification or reset token) is cleared, and sent or dead rows are
+deleted after OUTBOX_RETENTION_DAYS. Delivery is at-least-once: a worker that
+dies mid-send leaves its lease to expire and the email is picked up again.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from cruds import outbox as outbox_crud
+from utils import mailer, metrics
+from utils.query_counter import track_job
+from config import get_settings
+
+settings = get_settings()
+
+# Retention is in days; checking hourly is plenty
+PRUNE_INTERVAL_SECONDS = 3600
+
+_wake = threading.Event()
+
+def wake():
+    """Start the next pass now instead of at the next poll (this worker only)"""
+    _wake.set()
+
+@track_job("outbox")
+def dispatch_outbox() -> int:
+    """Send one batch of due emails; returns how many were claimed"""
+    db: Session = SessionLocal()
+    try:
+        claimed = outbox_crud.claim_due(db, datetime.now(timezone.utc), settings.OUTBOX_BATCH_SIZE)
+        if not claimed:
+            return 0
+
+        results = mailer.send_all([(subject, recipient, html_body) for _, recipient, subject, html_body in claimed])
+
+        now = datetime.now(timezone.utc)
+        entries = outbox_crud.get_entries(db, [entry_id for entry_id, *_ in claimed])
+        for (entry_id, recipient, subject, _), error in zip(claimed, results):
+            entry = entries.get(entry_id)
+            if entry is None:
+                continue
+            metrics.emails_sent.labels("outbox", "sent" if error is None else "failed").inc()
+            if error is None:
+                outbox_crud.mark_sent(entry, now)
+                print(f"📧 Sent '{subject}' to {recipient}")
+                continue
+            outbox_crud.mark_failed(
+                entry, error, now,
+                settings.OUTBOX_MAX_ATTEMPTS, settings.OUTBOX_BACKOFF_SECONDS, settings.OUTBOX_MAX_BACKOFF_SECONDS,
+                permanent=mailer.is_permanent(error)
+            )
+            if entry.status == "dead":
+                print(f"💀 Giving up on '{subject}' to {recipient} after {entry.attempts} attempts: {error}")
+            else:
+                print(f"⚠️ Failed to send '{subject}' to {recipient} (attempt {entry.attempts}), retrying at {entry.next_attempt_at:%H:%M:%S} UTC: {error}")
+        db.commit()
+        return len(claimed)
+    finally:
+        db.close()
+
+@track_job("outbox-prune")
+def prune_outbox() -> int:
+    """Delete sent and dead-lettered emails older than OUTBOX_RETENTION_DAYS"""
+    db: Session = SessionLocal()
+    try:
+        deleted = outbox_crud.prune(db, datetime.now(timezone.utc) - timedelta(days=settings.OUTBOX_RETENTION_DAYS))
+        if deleted:
+            print(f"🧹 Pruned {deleted} delivered or dead-lettered emails from the outbox")
+        return deleted
+    finally:
+        db.close()
+
+def run_outbox_dispatcher():
+    print("📤 Email outbox dispatcher running")
+    next_prune = time.monotonic()
+    while True:
+        if settings.OUTBOX_RETENTION_DAYS > 0 and time.monotonic() >= next_prune:
+            next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+            try:
+                prune_outbox()
+            except Exception as e:
+                print(f"❌ Outbox prune error: {str(e)}")
+        try:
+            claimed = dispatch_outbox()
+        except Exception as e:
+            print(f"❌ Outbox dispatcher error: {str(e)}")
+            claimed = 0
+        # A full batch means more may be waiting - go again right away
+        if claimed < settings.OUTBOX_BATCH_SIZE:
+            _wake.wait(settings.OUTBOX_POLL_SECONDS)
+            _wake.clear()
+
+def start_outbox_dispatcher():
+    """Start the outbox dispatcher in a background daemon thread"""
+    try:
+        threading.Thread(target=run_outbox_dispatcher, daemon=True).start()
+        return True
+    except Exception as e:
+        print(f"❌ Failed to start outbox dispatcher: {str(e)}")
+        return False
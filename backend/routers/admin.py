@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from database import get_db, engine
+from dependencies import get_current_admin_email
+from utils.singleflight import alpha_vantage_flight
+from utils import stock_search_index, slow_queries
+from utils.db_pool import pool_stats
+from cruds import outbox as outbox_crud
+import outbox
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/singleflight")
+def get_singleflight_stats(current_admin_email: str = Depends(get_current_admin_email)):
+    """How many Alpha Vantage calls were started vs. served by joining an in-flight call"""
+    return alpha_vantage_flight.stats()
+
+@router.get("/db-pool")
+def get_db_pool_stats(current_admin_email: str = Depends(get_current_admin_email)):
+    """This worker's database pool: connections in use, overflow, and time spent waiting for a checkout"""
+    return pool_stats.snapshot(engine.pool)
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    order: str = Query("total", pattern="^(total|max|mean)$"),
+    current_admin_email: str = Depends(get_current_admin_email)
+):
+    """This worker's slowest normalized statements, with the routes/jobs that ran them and their last captured plan"""
+    return slow_queries.top(limit, order)
+
+@router.post("/stocks/reindex")
+def rebuild_stock_search_index(db: Session = Depends(get_db), current_admin_email: str = Depends(get_current_admin_email)):
+    """Rebuild this worker's search index from scratch (new universes are normally picked up by polling)"""
+    index = stock_search_index.rebuild(db)
+    return {"message": "Stock search index rebuilt", "symbols": len(index)}
+
+@router.get("/outbox")
+def get_outbox(db: Session = Depends(get_db), current_admin_email: str = Depends(get_current_admin_email)):
+    """Outbox counts by status and the most recent dead-lettered emails"""
+    return {
+        "counts": outbox_crud.get_stats(db),
+        "dead_letters": [
+            {
+                "id": entry.id,
+                "recipient": entry.recipient,
+                "subject": entry.subject,
+                "attempts": entry.attempts,
+                "last_error": entry.last_error,
+                "created_at": entry.created_at
+            }
+            for entry in outbox_crud.get_dead_letters(db)
+        ]
+    }
+
+@router.post("/outbox/{entry_id}/retry")
+def retry_outbox_entry(entry_id: int, db: Session = Depends(get_db), current_admin_email: str = Depends(get_current_admin_email)):
+    """Put a dead-lettered email back in the queue"""
+    entry = outbox_crud.requeue(db, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Outbox entry not found")
+    outbox.wake()
+    return {"message": "Email queued for delivery", "status": entry.status}
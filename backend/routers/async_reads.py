@@ -0,0 +1,63 @@
+"""Async versions of the hottest read endpoints, served when DB_ASYNC is on.
+
+The sync handlers each hold one of FastAPI's ~40 threadpool slots while they
+wait on the database, which caps a worker's concurrent requests. These run on
+the event loop against the async engine instead. main.py includes this router
+ahead of the others, so for these paths it takes precedence over the sync
+handlers; responses are identical.
+"""
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from dependencies import get_current_user_async
+from utils.user_cache import CurrentUser
+from utils import quote_cache, rate_limiter
+from cruds import portfolios as portfolio_crud
+from routers.stock_search import browse_query, browse_page, search_page
+
+router = APIRouter(tags=["async reads"])
+
+@router.get("/portfolio/summary")
+async def get_portfolio_summary(db: AsyncSession = Depends(get_async_db), user: CurrentUser = Depends(get_current_user_async)):
+    holdings = await portfolio_crud.get_holdings_async(db, user.id)
+    if not holdings:
+        return []
+
+    quotes = await quote_cache.get_quotes_async(db, [symbol for symbol, _ in holdings])
+    return [portfolio_crud.summary_row(symbol, name, quotes.get(symbol)) for symbol, name in holdings]
+
+@router.get("/stocks")
+async def get_stocks(
+    response: Response,
+    keywords: str = Query(None, min_length=1),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    after: str = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+    user: CurrentUser = Depends(get_current_user_async)
+):
+    if keywords:
+        owned_tickers = set(await db.scalars(portfolio_crud.owned_symbols_query(user.id)))
+        return search_page(keywords, owned_tickers, offset, limit)
+
+    results = (await db.execute(browse_query(user.id, after, offset, limit))).all()
+    return browse_page(response, results, limit)
+
+@router.get("/user/profile")
+async def get_profile(db: AsyncSession = Depends(get_async_db), user: CurrentUser = Depends(get_current_user_async)):
+    return {
+        "email": user.email,
+        "alpha_vantage_api_key": user.alpha_vantage_api_key,
+        "email_reminder_time": user.email_reminder_time,
+        "email_reminder_enabled": user.email_reminder_enabled,
+        "api_budget": await rate_limiter.get_budget_async(db, user.alpha_vantage_api_key)
+    }
+
+@router.get("/email/settings")
+async def get_email_settings(user: CurrentUser = Depends(get_current_user_async)):
+    """Get current email reminder settings for the user"""
+    return {
+        "email_reminder_enabled": user.email_reminder_enabled or False,
+        "email_reminder_time": user.email_reminder_time,
+        "timezone": user.timezone or "UTC"
+    }
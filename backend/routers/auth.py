@@ -1,45 +1,93 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from schemas import UserSignup, UserLogin, PasswordResetRequest, EmailSchema
 from cruds import users as user_crud
+from cruds import outbox as outbox_crud
 from database import get_db
 from utils.jwt import create_access_token, create_verification_token, create_password_reset_token, decode_token
-from utils.email import send_verification_email, send_password_reset_email
+from utils.email import build_verification_email, build_password_reset_email
+from utils import user_cache
+import outbox
 from jose import JWTError
-import bcrypt
+from utils import passwords
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+# The async handlers below keep every Session call in a worker thread (asyncio.to_thread),
+# end the transaction before hashing so no pooled connection is held meanwhile, and
+# reread the user afterwards instead of touching an instance from the rolled-back transaction
+
+def _user_exists(db: Session, email: str) -> bool:
+    taken = user_crud.get_user_by_email(db, email) is not None
+    db.rollback()
+    return taken
+
+def _create_unverified_user(db: Session, user: UserSignup, hashed_password: str):
+    try:
+        db_user = user_crud.create_user(db, user, commit=False, hashed_password=hashed_password)
+        token = create_verification_token(db_user.email)
+        # Queued in the same transaction as the new user - delivered by the outbox dispatcher
+        outbox_crud.enqueue(db, db_user.email, *build_verification_email(db_user.email, token))
+        db.commit()
+    except IntegrityError:
+        # Same email signed up while this one was hashing
+        db.rollback()
+        raise HTTPException(status_code=400, detail="User already exists")
+
+def _login_credentials(db: Session, email: str) -> tuple[str, bool] | None:
+    db_user = user_crud.get_user_by_email(db, email)
+    credentials = (db_user.hashed_password, db_user.is_verified) if db_user else None
+    # Hand the connection back to the pool for as long as the hash takes
+    db.rollback()
+    return credentials
+
+def _store_password_hash(db: Session, email: str, hashed_password: str) -> bool:
+    db_user = user_crud.get_user_by_email(db, email)
+    if not db_user:
+        db.rollback()
+        return False
+    db_user.hashed_password = hashed_password
+    db.commit()
+    return True
+
+
 @router.post("/signup")
-def signup(user: UserSignup, db: Session = Depends(get_db)):
+async def signup(user: UserSignup, db: Session = Depends(get_db)):
 
     if user.password != user.confirm_password:
         raise HTTPException(status_code=400, detail="Passwords do not match")
     
-    if user_crud.get_user_by_email(db, user.email):
+    if await asyncio.to_thread(_user_exists, db, user.email):
         raise HTTPException(status_code=400, detail="User already exists")
 
-    db_user = user_crud.create_user(db, user)
-    
-    token = create_verification_token(db_user.email)
-    
-    send_verification_email(db_user.email, token)
+    hashed_password = await passwords.hash_password_async(user.password)
+    await asyncio.to_thread(_create_unverified_user, db, user, hashed_password)
+    outbox.wake()
     
     return {"message": "User created successfully. Please check your email to verify your account."}
 
 
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = user_crud.get_user_by_email(db, user.email)
-    if not db_user:
+async def login(user: UserLogin, db: Session = Depends(get_db)):
+    credentials = await asyncio.to_thread(_login_credentials, db, user.email)
+    if not credentials:
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    if not bcrypt.checkpw(user.password.encode("utf-8"), db_user.hashed_password.encode("utf-8")):
+    hashed_password, is_verified = credentials
+    # bcrypt runs on the password executor, not on the threadpool shared with every sync endpoint
+    if not await passwords.verify_password_async(user.password, hashed_password):
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    if not db_user.is_verified:
+    if not is_verified:
         raise HTTPException(status_code=403, detail="Email not verified")
 
-    access_token = create_access_token(db_user.email)    
+    # BCRYPT_ROUNDS changed since this hash was made - upgrade it while we have the plain password
+    if passwords.needs_rehash(hashed_password):
+        new_hash = await passwords.hash_password_async(user.password)
+        await asyncio.to_thread(_store_password_hash, db, user.email, new_hash)
+
+    access_token = create_access_token(user.email)    
     return {"access_token": access_token, "token_type": "bearer"}
         
 @router.get("/verify-email")
@@ -59,6 +107,7 @@ def verify_email(token: str, db: Session = Depends(get_db)):
 
         user.is_verified = True
         db.commit()
+        user_cache.invalidate(email)
         return {"message": "Email verified successfully"}
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
@@ -69,7 +118,9 @@ def forgot_password(email_data: EmailSchema, db: Session = Depends(get_db)):
     user = user_crud.get_user_by_email(db, email_data.email)
     if user and user.is_verified:
         token = create_password_reset_token(user.email)
-        send_password_reset_email(user.email, token)
+        outbox_crud.enqueue(db, user.email, *build_password_reset_email(user.email, token))
+        db.commit()
+        outbox.wake()
 
     # Always return generic response to avoid leaking user info
     return {
@@ -78,7 +129,7 @@ def forgot_password(email_data: EmailSchema, db: Session = Depends(get_db)):
 
 
 @router.post("/reset-password")
-def reset_password(data: dict, db: Session = Depends(get_db)):
+async def reset_password(data: dict, db: Session = Depends(get_db)):
     try:
         # Extract data from the request
         token = data.get("token")
@@ -104,13 +155,12 @@ def reset_password(data: dict, db: Session = Depends(get_db)):
         if not email:
             raise HTTPException(status_code=400, detail="Invalid token")
 
-        user = user_crud.get_user_by_email(db, email)
-        if not user:
+        if not await asyncio.to_thread(_user_exists, db, email):
             raise HTTPException(status_code=404, detail="User not found")
 
-        hashed_pw = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-        user.hashed_password = hashed_pw
-        db.commit()
+        hashed_password = await passwords.hash_password_async(new_password)
+        if not await asyncio.to_thread(_store_password_hash, db, email, hashed_password):
+            raise HTTPException(status_code=404, detail="User not found")
         return {"message": "Password reset successfully"}
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
@@ -132,6 +182,7 @@ def confirm_account_deletion(token: str, db: Session = Depends(get_db)):
         # Delete user and all related data
         db.delete(user)
         db.commit()
+        user_cache.invalidate(email)
         
         return {"message": "Account deleted successfully"}
         
@@ -1,27 +1,173 @@
-from models import StocksTable, PortfoliosTable , UsersTable, StockDataCache
-from fastapi import APIRouter, Depends, HTTPException, status
+from models import StocksTable, PortfoliosTable
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from schemas import StockSymbol, StockSummary, WeeklyStockData
-from cruds import users as user_crud
-from database import get_db
-from dependencies import get_current_user_email
+from schemas import StockSymbol, StockSummary, WeeklyStockData, IndicatorSeries
+from cruds import portfolios as portfolio_crud
+from cruds import price_history as history_crud
+from database import get_db, SessionLocal
+from dependencies import get_current_user
+from utils.user_cache import CurrentUser
+from utils import quote_cache, alpha_vantage, rate_limiter
+from utils.singleflight import alpha_vantage_flight
+from utils import indicators as indicator_math
+from config import get_settings
+import asyncio
 import httpx
-from sqlalchemy import func
+import numpy as np
+
+settings = get_settings()
 
 router = APIRouter(prefix="/portfolio", tags=["portfolio"])
 
-@router.get("/weekly-data/{symbol}", response_model=WeeklyStockData)
-def get_weekly_stock_data(symbol: str, db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email)):
-    user = user_crud.get_user_by_email(db, current_user_email)
-    if not user or not user.alpha_vantage_api_key:
-        raise HTTPException(status_code=400, detail="Alpha Vantage API key not set")
+# How a call made with someone's API key fails upstream (throttled, budget used up, timeout, bad response);
+# a request that joined another user's call retries with its own key on these (SingleFlight.do_own)
+UPSTREAM_ERRORS = (HTTPException, httpx.HTTPError)
 
+def _json_body(response: httpx.Response) -> dict:
+    """The JSON object of a 200 response; anything else (a 5xx, an HTML error page) is a 502"""
+    if response.status_code != 200:
+        raise HTTPException(status_code=502, detail="Stock API error")
+    try:
+        payload = response.json()
+    except ValueError:
+        raise HTTPException(status_code=502, detail="Stock API error")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=502, detail="Stock API error")
+    return payload
+
+async def _fetch_time_series(function: str, series_key: str, label: str, symbol: str, api_key: str):
+    """Download and parse an adjusted time series; returns (metadata, rows sorted newest first)"""
+    response = await alpha_vantage.query(function, api_key, timeout=15, symbol=symbol)
+    data = _json_body(response)
+
+    # Check for API error messages
+    if "Error Message" in data:
+        raise HTTPException(status_code=400, detail="Invalid stock symbol")
+
+    # Throttling comes back as "Note" or "Information" (which also carries premium-endpoint refusals)
+    if "Note" in data or "Information" in data:
+        rate_limiter.penalize(api_key)
+        raise HTTPException(status_code=429, detail="API call frequency limit reached")
+
+    # Extract the time series data
+    series = data.get(series_key, {})
+    if not series:
+        raise HTTPException(status_code=404, detail=f"No {label} data available for this stock")
+
+    # Format the response data
+    formatted_data = []
+    for date, values in series.items():
+        formatted_data.append({
+            "date": date,
+            "open": float(values["1. open"]),
+            "high": float(values["2. high"]),
+            "low": float(values["3. low"]),
+            "close": float(values["4. close"]),
+            "adjusted_close": float(values["5. adjusted close"]),
+            "volume": int(values["6. volume"]),
+            "dividend_amount": float(values["7. dividend amount"])
+        })
+
+    # Sort by date (most recent first)
+    formatted_data.sort(key=lambda x: x["date"], reverse=True)
+
+    return data.get("Meta Data", {}), formatted_data
+
+TIME_SERIES = {
+    "weekly": ("TIME_SERIES_WEEKLY_ADJUSTED", "Weekly Adjusted Time Series"),
+    "monthly": ("TIME_SERIES_MONTHLY_ADJUSTED", "Monthly Adjusted Time Series"),
+}
+
+def _upstream_error(e: Exception, what: str) -> HTTPException:
+    """The response for a failed upstream refresh - the same on every endpoint that calls Alpha Vantage"""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, httpx.TimeoutException):
+        return HTTPException(status_code=504, detail="Request timeout - API service unavailable")
+    if isinstance(e, httpx.HTTPError):
+        return HTTPException(status_code=502, detail="Stock API error")
+    print(f"❌ Failed to fetch {what}: {e}")
+    return HTTPException(status_code=500, detail="Internal server error")
+
+async def _release_connection(db: Session):
+    """Give the request's connection back to the pool before queueing for the rate limiter and waiting
+    on upstream (the session checks one out again for its next query)"""
+    await asyncio.to_thread(db.close)
+
+def _in_own_session(fn, *args):
+    """fn(session, *args) with a session of its own - coalesced calls outlive the request that started them"""
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+async def _sync_time_series(symbol: str, interval: str, api_key: str, newest):
+    """Pull a series from Alpha Vantage and store only the bars we don't have yet"""
+    function, series_key = TIME_SERIES[interval]
+    metadata, rows = await _fetch_time_series(function, series_key, interval, symbol, api_key)
+    await asyncio.to_thread(_in_own_session, history_crud.merge_bars, symbol, interval, rows, metadata, newest)
+
+def _series_state(db: Session, symbol: str, interval: str):
+    return history_crud.get_newest_bar_date(db, symbol, interval), history_crud.get_sync(db, symbol, interval)
+
+async def _ensure_time_series(db: Session, symbol: str, interval: str, api_key: str):
+    """Top up price_history from upstream once a new period has started; returns the sync row"""
+    newest, sync = await asyncio.to_thread(_series_state, db, symbol, interval)
+
+    if history_crud.needs_refresh(newest, sync, interval, settings.PRICE_HISTORY_RECHECK_SECONDS):
+        await _release_connection(db)
+        try:
+            # Concurrent requests for the same symbol share one upstream call and one write
+            await alpha_vantage_flight.do_own(
+                (TIME_SERIES[interval][0], symbol),
+                lambda: _sync_time_series(symbol, interval, api_key, newest),
+                retry_on=UPSTREAM_ERRORS
+            )
+            sync = await asyncio.to_thread(history_crud.get_sync, db, symbol, interval)
+        except UPSTREAM_ERRORS as e:
+            if newest is None:
+                raise
+            # Upstream throttled or down - what we already stored is still worth serving
+            print(f"⚠️ Serving stored {interval} data for {symbol}, refresh failed: {e}")
+    return sync
+
+def _stored_bars(db: Session, symbol: str, interval: str, limit: int | None) -> list[dict]:
+    return [history_crud.bar_to_dict(bar) for bar in history_crud.get_bars(db, symbol, interval, limit)]
+
+async def _load_time_series(db: Session, symbol: str, interval: str, api_key: str, limit: int | None = None):
+    """Serve a series from price_history, topping it up from upstream first if needed"""
+    sync = await _ensure_time_series(db, symbol, interval, api_key)
+    bars = await asyncio.to_thread(_stored_bars, db, symbol, interval, limit)
+    metadata = (sync.series_metadata if sync else None) or {}
+    return metadata, bars
+
+async def _fetch_quote(symbol: str, api_key: str) -> dict:
+    """Fetch and parse GLOBAL_QUOTE for a symbol"""
+    response = await alpha_vantage.query("GLOBAL_QUOTE", api_key, timeout=10, symbol=symbol)
+    payload = _json_body(response)
+    if "Note" in payload or "Information" in payload:
+        rate_limiter.penalize(api_key)
+        raise HTTPException(status_code=429, detail="API call frequency limit reached")
+    if "Global Quote" not in payload:
+        raise HTTPException(status_code=502, detail="Stock API error")
+
+    return quote_cache.parse_global_quote(payload["Global Quote"])
+
+async def _refresh_quote(symbol: str, api_key: str) -> dict:
+    """Fetch GLOBAL_QUOTE for a symbol and store it in the shared quote cache"""
+    quote = await _fetch_quote(symbol, api_key)
+    await asyncio.to_thread(_in_own_session, quote_cache.store_quote, symbol, quote)
+    return quote
+
+def _portfolio_stock(db: Session, user_id: int, symbol: str) -> tuple[str, str]:
+    """(symbol, company name) of a stock in the user's portfolio; 404 if it isn't there"""
     # Check if stock exists in user's portfolio
     portfolio_entry = db.query(PortfoliosTable).filter(
-        PortfoliosTable.user_id == user.id,
+        PortfoliosTable.user_id == user_id,
         PortfoliosTable.stock_symbol == symbol.upper()
     ).first()
-    
+
     if not portfolio_entry:
         raise HTTPException(status_code=404, detail="Stock not found in your portfolio")
 
@@ -29,279 +175,224 @@ def get_weekly_stock_data(symbol: str, db: Session = Depends(get_db), current_us
     stock = db.query(StocksTable).filter(StocksTable.stock_symbol == symbol.upper()).first()
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
+    return stock.stock_symbol, stock.stock_company_name
+
+@router.get("/weekly-data/{symbol}", response_model=WeeklyStockData)
+async def get_weekly_stock_data(symbol: str, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
+    if not user.alpha_vantage_api_key:
+        raise HTTPException(status_code=400, detail="Alpha Vantage API key not set")
 
-    url = f"https://www.alphavantage.co/query?function=TIME_SERIES_WEEKLY_ADJUSTED&symbol={stock.stock_symbol}&apikey={user.alpha_vantage_api_key}"
+    stock_symbol, company_name = await asyncio.to_thread(_portfolio_stock, db, user.id, symbol)
 
     try:
-        response = httpx.get(url, timeout=15)
-        data = response.json()
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail="Stock API error")
-        
-        # Check for API error messages
-        if "Error Message" in data:
-            raise HTTPException(status_code=400, detail="Invalid stock symbol")
-        
-        if "Note" in data:
-            raise HTTPException(status_code=429, detail="API call frequency limit reached")
-        
-        # Extract weekly time series data
-        weekly_data = data.get("Weekly Adjusted Time Series", {})
-        if not weekly_data:
-            raise HTTPException(status_code=404, detail="No weekly data available for this stock")
-
-        # Format the response data
-        formatted_data = []
-        for date, values in weekly_data.items():
-            formatted_data.append({
-                "date": date,
-                "open": float(values["1. open"]),
-                "high": float(values["2. high"]),
-                "low": float(values["3. low"]),
-                "close": float(values["4. close"]),
-                "adjusted_close": float(values["5. adjusted close"]),
-                "volume": int(values["6. volume"]),
-                "dividend_amount": float(values["7. dividend amount"])
-            })
-
-        # Sort by date (most recent first)
-        formatted_data.sort(key=lambda x: x["date"], reverse=True)
+        metadata, formatted_data = await _load_time_series(
+            db, stock_symbol, "weekly", user.alpha_vantage_api_key, limit=52
+        )
 
         return {
-            "symbol": stock.stock_symbol,
-            "name": stock.stock_company_name,
-            "metadata": data.get("Meta Data", {}),
-            "weekly_data": formatted_data[:52]  # Return last 52 weeks (1 year)
+            "symbol": stock_symbol,
+            "name": company_name,
+            "metadata": metadata,
+            "weekly_data": formatted_data  # Last 52 weeks (1 year)
         }
 
-    except httpx.TimeoutException:
-        raise HTTPException(status_code=504, detail="Request timeout - API service unavailable")
     except Exception as e:
-        print(f"❌ Failed to fetch weekly data for {stock.stock_symbol}: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+        raise _upstream_error(e, f"weekly data for {stock_symbol}")
 
 @router.get("/monthly-data/{symbol}", response_model=WeeklyStockData)
-def get_monthly_stock_data(symbol: str, db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email)):
-    user = user_crud.get_user_by_email(db, current_user_email)
-    if not user or not user.alpha_vantage_api_key:
+async def get_monthly_stock_data(symbol: str, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
+    if not user.alpha_vantage_api_key:
         raise HTTPException(status_code=400, detail="Alpha Vantage API key not set")
 
-    # Check if stock exists in user's portfolio
-    portfolio_entry = db.query(PortfoliosTable).filter(
-        PortfoliosTable.user_id == user.id,
-        PortfoliosTable.stock_symbol == symbol.upper()
-    ).first()
-    
-    if not portfolio_entry:
-        raise HTTPException(status_code=404, detail="Stock not found in your portfolio")
-
-    # Check if stock exists in our database
-    stock = db.query(StocksTable).filter(StocksTable.stock_symbol == symbol.upper()).first()
-    if not stock:
-        raise HTTPException(status_code=404, detail="Stock not found")
-
-    url = f"https://www.alphavantage.co/query?function=TIME_SERIES_MONTHLY_ADJUSTED&symbol={stock.stock_symbol}&apikey={user.alpha_vantage_api_key}"
+    stock_symbol, company_name = await asyncio.to_thread(_portfolio_stock, db, user.id, symbol)
 
     try:
-        response = httpx.get(url, timeout=15)
-        data = response.json()
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail="Stock API error")
-        
-        # Check for API error messages
-        if "Error Message" in data:
-            raise HTTPException(status_code=400, detail="Invalid stock symbol")
-        
-        if "Note" in data:
-            raise HTTPException(status_code=429, detail="API call frequency limit reached")
-        
-        # Extract monthly time series data
-        monthly_data = data.get("Monthly Adjusted Time Series", {})
-        if not monthly_data:
-            raise HTTPException(status_code=404, detail="No monthly data available for this stock")
-
-        # Format the response data
-        formatted_data = []
-        for date, values in monthly_data.items():
-            formatted_data.append({
-                "date": date,
-                "open": float(values["1. open"]),
-                "high": float(values["2. high"]),
-                "low": float(values["3. low"]),
-                "close": float(values["4. close"]),
-                "adjusted_close": float(values["5. adjusted close"]),
-                "volume": int(values["6. volume"]),
-                "dividend_amount": float(values["7. dividend amount"])
-            })
-
-        # Sort by date (most recent first)
-        formatted_data.sort(key=lambda x: x["date"], reverse=True)
+        metadata, formatted_data = await _load_time_series(
+            db, stock_symbol, "monthly", user.alpha_vantage_api_key, limit=None
+        )
 
         return {
-            "symbol": stock.stock_symbol,
-            "name": stock.stock_company_name,
-            "metadata": data.get("Meta Data", {}),
+            "symbol": stock_symbol,
+            "name": company_name,
+            "metadata": metadata,
             "weekly_data": formatted_data  # Return all available historical data
         }
 
-    except httpx.TimeoutException:
-        raise HTTPException(status_code=504, detail="Request timeout - API service unavailable")
     except Exception as e:
-        print(f"❌ Failed to fetch monthly data for {stock.stock_symbol}: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
-
-@router.get("/summary/{symbol}", response_model = StockSummary)
-def get_stock_summary(symbol: str, db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email),):
-    user = user_crud.get_user_by_email(db, current_user_email)
-    if not user or not user.alpha_vantage_api_key:
+        raise _upstream_error(e, f"monthly data for {stock_symbol}")
+
+@router.get("/indicators/{symbol}", response_model=IndicatorSeries)
+async def get_stock_indicators(
+    symbol: str,
+    interval: str = Query("weekly", pattern="^(weekly|monthly)$"),
+    indicators: str = Query(",".join(indicator_math.AVAILABLE)),
+    window: int = Query(14, ge=2, le=260),
+    limit: int | None = Query(None, ge=1),
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_user)
+):
+    """Moving average, RSI, rolling volatility and drawdown over the stored weekly/monthly history"""
+    if not user.alpha_vantage_api_key:
         raise HTTPException(status_code=400, detail="Alpha Vantage API key not set")
 
-    stock = db.query(StocksTable).filter(StocksTable.stock_symbol == symbol.upper()).first()
-    if not stock:
-        raise HTTPException(status_code=404, detail="Stock not found")
+    names = tuple(dict.fromkeys(name.strip().lower() for name in indicators.split(",") if name.strip()))
+    unknown = [name for name in names if name not in indicator_math.AVAILABLE]
+    if not names or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown indicators {unknown}; choose from {', '.join(indicator_math.AVAILABLE)}")
 
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={stock.stock_symbol}&apikey={user.alpha_vantage_api_key}"
+    stock_symbol, _ = await asyncio.to_thread(_portfolio_stock, db, user.id, symbol)
 
     try:
-        response = httpx.get(url, timeout=10)
-        data = response.json().get("Global Quote", {})
-        if response.status_code != 200 or "Global Quote" not in response.json():
-            raise HTTPException(status_code=502, detail="Stock API error")
-
-        response_data = {
-            "symbol": stock.stock_symbol,
-            "name": stock.stock_company_name,
-            "open": data["02. open"],
-            "high": data["03. high"],
-            "low": data["04. low"],
-            "price": data["05. price"],
-            "volume": data["06. volume"],
-            "latest_trading_day": data["07. latest trading day"],
-            "previous_close": data["08. previous close"],
-            "change": data["09. change"],
-            "change_percent": data["10. change percent"]
+        await _ensure_time_series(db, stock_symbol, interval, user.alpha_vantage_api_key)
+    except Exception as e:
+        raise _upstream_error(e, f"{interval} data for {stock_symbol}")
+
+    # The series only changes when a bar is added, so its last date keys the memo
+    last_bar_date = await asyncio.to_thread(history_crud.get_newest_bar_date, db, stock_symbol, interval)
+    if last_bar_date is None:
+        raise HTTPException(status_code=404, detail=f"No {interval} data available for this stock")
+
+    key = (stock_symbol, interval, last_bar_date, names, window)
+    result = indicator_math.get_memoized(key)
+    if result is None:
+        series = await asyncio.to_thread(history_crud.get_close_series, db, stock_symbol, interval)
+        dates = [bar_date.isoformat() for bar_date, _ in series]
+        closes = np.fromiter((close for _, close in series), dtype=float, count=len(series))
+        values = indicator_math.compute(closes, interval, names, window)
+
+        # Newest first, like the weekly/monthly endpoints
+        result = {
+            "dates": dates[::-1],
+            "indicators": {name: indicator_math.to_json_list(array[::-1]) for name, array in values.items()},
         }
+        indicator_math.memoize(key, result)
+
+    return {
+        "symbol": stock_symbol,
+        "interval": interval,
+        "window": window,
+        "last_bar_date": last_bar_date.isoformat(),
+        "dates": result["dates"][:limit],
+        "indicators": {name: series[:limit] for name, series in result["indicators"].items()},
+    }
+
+def _stock_with_quote(db: Session, symbol: str) -> tuple[str, str, dict | None]:
+    stock = db.query(StocksTable).filter(StocksTable.stock_symbol == symbol.upper()).first()
+    if not stock:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    return stock.stock_symbol, stock.stock_company_name, quote_cache.get_quote(db, stock.stock_symbol)
 
-        # Cache the data for this user
-        existing_cache = db.query(StockDataCache).filter(
-            StockDataCache.user_id == user.id,
-            StockDataCache.stock_symbol == stock.stock_symbol
-        ).first()
-
-        if existing_cache:
-            # Update existing cache
-            existing_cache.open_price = float(data["02. open"])
-            existing_cache.high_price = float(data["03. high"])
-            existing_cache.low_price = float(data["04. low"])
-            existing_cache.current_price = float(data["05. price"])
-            existing_cache.volume = int(data["06. volume"])
-            existing_cache.latest_trading_day = data["07. latest trading day"]
-            existing_cache.previous_close = float(data["08. previous close"])
-            existing_cache.change = float(data["09. change"])
-            existing_cache.change_percent = data["10. change percent"]
-            existing_cache.last_updated = func.now()
-        else:
-            # Create new cache entry
-            new_cache = StockDataCache(
-                user_id=user.id,
-                stock_symbol=stock.stock_symbol,
-                open_price=float(data["02. open"]),
-                high_price=float(data["03. high"]),
-                low_price=float(data["04. low"]),
-                current_price=float(data["05. price"]),
-                volume=int(data["06. volume"]),
-                latest_trading_day=data["07. latest trading day"],
-                previous_close=float(data["08. previous close"]),
-                change=float(data["09. change"]),
-                change_percent=data["10. change percent"]
-            )
-            db.add(new_cache)
+@router.get("/summary/{symbol}", response_model = StockSummary)
+async def get_stock_summary(symbol: str, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user),):
+    if not user.alpha_vantage_api_key:
+        raise HTTPException(status_code=400, detail="Alpha Vantage API key not set")
 
-        db.commit()
+    stock_symbol, company_name, quote = await asyncio.to_thread(_stock_with_quote, db, symbol)
 
-        return response_data
+    # Quotes are shared across users - only go upstream when the cached one is stale
+    if quote is not None and quote_cache.is_fresh(quote):
+        return {"symbol": stock_symbol, "name": company_name, **quote}
+
+    await _release_connection(db)
+    try:
+        # Concurrent requests for the same symbol share one fetch and one cache upsert
+        quote = await alpha_vantage_flight.do_own(
+            ("GLOBAL_QUOTE", stock_symbol),
+            lambda: _refresh_quote(stock_symbol, user.alpha_vantage_api_key),
+            retry_on=UPSTREAM_ERRORS
+        )
+
+        return {"symbol": stock_symbol, "name": company_name, **quote}
     except Exception as e:
-        print(f"❌ Failed to fetch data for {stock.stock_symbol}: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+        raise _upstream_error(e, f"data for {stock_symbol}")
 
 @router.get("/summary")
-def get_portfolio_summary(db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email)):
-    user = user_crud.get_user_by_email(db, current_user_email)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+def get_portfolio_summary(db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
 
     # Get user's portfolio
-    portfolio = db.query(PortfoliosTable).filter(PortfoliosTable.user_id == user.id).all()
-    if not portfolio:
+    holdings = portfolio_crud.get_holdings(db, user.id)
+    if not holdings:
         return []
 
-    summaries = []
-    for entry in portfolio:
-        stock = db.query(StocksTable).filter(StocksTable.stock_symbol == entry.stock_symbol).first()
-        if stock:
-            # Check if we have cached data for this stock
-            cached_data = db.query(StockDataCache).filter(
-                StockDataCache.user_id == user.id,
-                StockDataCache.stock_symbol == stock.stock_symbol
-            ).first()
-
-            if cached_data:
-                # Return data with cached values
-                summaries.append({
-                    "symbol": stock.stock_symbol,
-                    "name": stock.stock_company_name,
-                    "open": cached_data.open_price,
-                    "high": cached_data.high_price,
-                    "low": cached_data.low_price,
-                    "price": cached_data.current_price,
-                    "volume": cached_data.volume,
-                    "latest_trading_day": cached_data.latest_trading_day,
-                    "previous_close": cached_data.previous_close,
-                    "change": cached_data.change,
-                    "change_percent": cached_data.change_percent
-                })
-            else:
-                # Return data without price info (will show N/A in frontend)
-                summaries.append({
-                    "symbol": stock.stock_symbol,
-                    "name": stock.stock_company_name
-                })
-
-    return summaries
+    quotes = quote_cache.get_quotes(db, [symbol for symbol, _ in holdings])
+
+    return [portfolio_crud.summary_row(symbol, name, quotes.get(symbol)) for symbol, name in holdings]
+
+def _holdings_with_quotes(db: Session, user_id: int) -> tuple[list, dict]:
+    holdings = portfolio_crud.get_holdings(db, user_id)
+    if not holdings:
+        return holdings, {}
+    return holdings, quote_cache.get_quotes(db, [symbol for symbol, _ in holdings])
+
+@router.post("/refresh")
+async def refresh_portfolio(db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
+    """Refresh every stale quote in the user's portfolio in one call and return the updated summary"""
+    if not user.alpha_vantage_api_key:
+        raise HTTPException(status_code=400, detail="Alpha Vantage API key not set")
+
+    holdings, quotes = await asyncio.to_thread(_holdings_with_quotes, db, user.id)
+    if not holdings:
+        return {"refreshed": 0, "cached": 0, "summary": [], "failures": []}
+
+    stale = [symbol for symbol, _ in holdings if symbol not in quotes or not quote_cache.is_fresh(quotes[symbol])]
+
+    # Calls queue for the key's budget like every other endpoint; the limiter refuses (429) those that
+    # would wait longer than ALPHA_VANTAGE_MAX_QUEUE_SECONDS and they are reported as throttled
+    semaphore = asyncio.Semaphore(settings.ALPHA_VANTAGE_CALLS_PER_MINUTE)
+
+    async def fetch(symbol: str):
+        async with semaphore:
+            return await alpha_vantage_flight.do_own(
+                ("GLOBAL_QUOTE", symbol),
+                lambda: _fetch_quote(symbol, user.alpha_vantage_api_key),
+                retry_on=UPSTREAM_ERRORS
+            )
+
+    await _release_connection(db)
+    results = await asyncio.gather(*(fetch(symbol) for symbol in stale), return_exceptions=True)
+
+    failures = []
+    fetched = {}
+    for symbol, result in zip(stale, results):
+        if isinstance(result, HTTPException) and result.status_code == 429:
+            failures.append({"symbol": symbol, "status": "throttled", "detail": result.detail})
+        elif isinstance(result, HTTPException):
+            failures.append({"symbol": symbol, "status": "failed", "detail": result.detail})
+        elif isinstance(result, Exception):
+            print(f"❌ Failed to refresh {symbol}: {result}")
+            failures.append({"symbol": symbol, "status": "failed", "detail": "Stock API error"})
+        else:
+            fetched[symbol] = result
+
+    # One transaction for every refreshed quote
+    if fetched:
+        await asyncio.to_thread(quote_cache.store_quotes, db, fetched)
+        quotes.update(fetched)
+
+    return {
+        "refreshed": len(fetched),
+        "cached": len(holdings) - len(stale),
+        "summary": [portfolio_crud.summary_row(symbol, name, quotes.get(symbol)) for symbol, name in holdings],
+        "failures": failures
+    }
 
 @router.post("/add", status_code=status.HTTP_201_CREATED)
-def add_stock_to_portfolio(ticker: StockSymbol, db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email)):
-    # Get user by email
-    user = db.query(UsersTable).filter(UsersTable.email == current_user_email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+def add_stock_to_portfolio(ticker: StockSymbol, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
     # Get stock by symbol (uppercase to be safe)
     stock = db.query(StocksTable).filter(StocksTable.stock_symbol == ticker.stock_symbol.upper()).first()
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
-    # Check if stock already in user's portfolio
-    existing = db.query(PortfoliosTable).filter(
-        PortfoliosTable.user_id == user.id,
-        PortfoliosTable.stock_symbol == stock.stock_symbol
-    ).first()
-    if existing:
+    if not stock.is_listed:
+        # Delisted symbols stay in stocks_table for existing portfolios but can't be added
+        raise HTTPException(status_code=400, detail="Stock is no longer listed")
+    # Add to portfolio; the unique (user_id, stock_symbol) index turns a duplicate into a no-op
+    if not portfolio_crud.insert_holding(db, user.id, stock.stock_symbol):
         raise HTTPException(status_code=400, detail="Stock already in portfolio")
 
-    # Add to portfolio
-    new_entry = PortfoliosTable(user_id=user.id, stock_symbol = stock.stock_symbol)
-    db.add(new_entry)
-    db.commit()
-    db.refresh(new_entry)
-
     return {"message": f"Stock {stock.stock_symbol} added to portfolio"}
 
 @router.delete("/remove/{symbol}", status_code=status.HTTP_200_OK)
-def remove_stock_from_portfolio(symbol: str, db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email)):
-    user = db.query(UsersTable).filter(UsersTable.email == current_user_email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+def remove_stock_from_portfolio(symbol: str, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
 
     # Check if stock exists in portfolio
     portfolio_entry = db.query(PortfoliosTable).filter(
@@ -1,48 +1,69 @@
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, Query, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
-from models import StocksTable, PortfoliosTable , UsersTable
+from sqlalchemy import exists, select
+from models import StocksTable, PortfoliosTable
+from cruds.portfolios import owned_symbols_query
 from database import get_db
-from dependencies import get_current_user_email
+from dependencies import get_current_user
+from utils.user_cache import CurrentUser
+from utils import stock_search_index
+import base64
 
 router = APIRouter(prefix="/stocks", tags=["stocks"])
 
+def encode_cursor(symbol: str) -> str:
+    return base64.urlsafe_b64encode(symbol.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def browse_query(user_id: int, after: str | None, offset: int, limit: int):
+    # browsing: exclude owned stocks inside the query instead of shipping a NOT IN list
+    owned_by_user = exists().where(
+        PortfoliosTable.user_id == user_id,
+        PortfoliosTable.stock_symbol == StocksTable.stock_symbol
+    )
+    query = (
+        select(StocksTable.stock_symbol, StocksTable.stock_company_name)
+        .where(StocksTable.is_listed == True, ~owned_by_user)
+        .order_by(StocksTable.stock_symbol)
+    )
+
+    # keyset pagination: every page is an index range scan starting after the cursor,
+    # so deep pages cost the same as the first one (offset is kept for older clients)
+    if after:
+        query = query.where(StocksTable.stock_symbol > decode_cursor(after))
+    elif offset:
+        query = query.offset(offset)
+    return query.limit(limit)
+
+def search_page(keywords: str, owned_tickers: set, offset: int, limit: int) -> list[dict]:
+    # typeahead is served from the in-memory index, ranked exact > prefix > substring
+    results = stock_search_index.get_index().search(keywords, exclude=owned_tickers, offset=offset, limit=limit)
+    return [{"symbol": symbol, "name": name} for symbol, name in results]
+
+def browse_page(response: Response, results, limit: int) -> list[dict]:
+    # A full page means there may be more; an empty one never gets a cursor
+    if results and len(results) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(results[-1].stock_symbol)
+    return [{"symbol": symbol, "name": name} for symbol, name in results]
+
 @router.get("")
 def get_stocks(
+    response: Response,
     keywords: str = Query(None, min_length=1),
     offset: int = Query(0, ge=0),
-    limit: int = Query(50, le=100),
+    limit: int = Query(50, ge=1, le=100),
+    after: str = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
     db: Session = Depends(get_db),
-    current_user_email: str = Depends(get_current_user_email)
+    user: CurrentUser = Depends(get_current_user)
 ):
-    # get user id by email
-    user = db.query(UsersTable).filter(UsersTable.email == current_user_email).first()
-    if not user:
-        return []  # or raise HTTPException(status_code=404, detail="User not found")
-
-    # get symbols user already owns
-    owned = (db.query(StocksTable.stock_symbol).join(PortfoliosTable, PortfoliosTable.stock_symbol == StocksTable.stock_symbol)
-             .filter(PortfoliosTable.user_id == user.id).all())
-    owned_tickers = [t[0] for t in owned]
-
-    # base stock query
-    query = db.query(StocksTable)
-
-    # filter by search keywords if present
     if keywords:
-        keyword_pattern = f"%{keywords.lower()}%"
-        query = query.filter(
-            or_(
-                func.lower(StocksTable.stock_symbol).like(keyword_pattern),
-                func.lower(StocksTable.stock_company_name).like(keyword_pattern)
-            )
-        )
-
-    # exclude owned stocks
-    if owned_tickers:
-        query = query.filter(~StocksTable.stock_symbol.in_(owned_tickers))
-
-    # pagination
-    results = query.offset(offset).limit(limit).all()
-
-    return [{"symbol": stock.stock_symbol, "name": stock.stock_company_name} for stock in results]
+        # get symbols user already owns
+        owned_tickers = set(db.scalars(owned_symbols_query(user.id)))
+        return search_page(keywords, owned_tickers, offset, limit)
+
+    return browse_page(response, db.execute(browse_query(user.id, after, offset, limit)).all(), limit)
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from dependencies import get_current_user_email
+from dependencies import get_current_user
+from utils import user_cache
+from utils.user_cache import CurrentUser
 from database import get_db
 from models import UsersTable
-from schemas import EmailSchema
-from utils.email import send_email
 from utils.jwt import create_verification_token
 from pydantic import BaseModel
 from datetime import datetime
 from utils.jwt import create_verification_token
-from utils.email import send_account_deletion_email
+from utils.email import build_account_deletion_email
+from cruds import outbox as outbox_crud
+import outbox
+from utils import rate_limiter
 from datetime import timedelta
 
 
@@ -19,47 +22,40 @@ class UpdateApiKeyRequest(BaseModel):
     new_api_key: str
 
 @router.get("/profile")
-def get_profile(db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email)):
-    user = db.query(UsersTable).filter(UsersTable.email == current_user_email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+def get_profile(db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
     return {
         "email": user.email,
         "alpha_vantage_api_key": user.alpha_vantage_api_key,
         "email_reminder_time": user.email_reminder_time,
-        "email_reminder_enabled": user.email_reminder_enabled
+        "email_reminder_enabled": user.email_reminder_enabled,
+        "api_budget": rate_limiter.get_budget(db, user.alpha_vantage_api_key)
     }
 
 @router.put("/update-api-key")
-def update_api_key(request: UpdateApiKeyRequest, db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email)):
-    user = db.query(UsersTable).filter(UsersTable.email == current_user_email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+def update_api_key(request: UpdateApiKeyRequest, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
     # Check for rate limiting (once per week)
     if user.last_api_key_update:
         from datetime import timedelta
         if (datetime.utcnow() - user.last_api_key_update) < timedelta(days=7):
             raise HTTPException(status_code=429, detail="API key can only be updated once per week")
     
-    user.alpha_vantage_api_key = request.new_api_key
-    user.last_api_key_update = datetime.utcnow()
+    db_user = db.get(UsersTable, user.id)
+    db_user.alpha_vantage_api_key = request.new_api_key
+    db_user.last_api_key_update = datetime.utcnow()
     db.commit()
+    user_cache.invalidate(user.email)
     
     return {"message": "API key updated successfully"}
 
 @router.delete("/delete-account")
-def initiate_account_deletion(db: Session = Depends(get_db), current_user_email: str = Depends(get_current_user_email)):
-    user = db.query(UsersTable).filter(UsersTable.email == current_user_email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+def initiate_account_deletion(db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
     from utils.jwt import create_account_deletion_token
     token = create_account_deletion_token(user.email)
     
-    # Send deletion confirmation email
-    send_account_deletion_email(user.email, token)
+    # Queue the deletion confirmation email
+    outbox_crud.enqueue(db, user.email, *build_account_deletion_email(user.email, token))
+    db.commit()
+    outbox.wake()
     
     return {"message": "Account deletion verification email sent. You have 30 minutes to confirm."}
 
@@ -83,6 +79,7 @@ def confirm_account_deletion(token: str, db: Session = Depends(get_db)):
         # Delete user and all related data (portfolios, cache, etc.)
         db.delete(user)
         db.commit()
+        user_cache.invalidate(email)
         
         return {"message": "Account deleted successfully"}
         
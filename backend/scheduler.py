@@ -2,109 +2,109 @@
 import schedule
 import time
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 from database import SessionLocal
-from models import UsersTable, PortfoliosTable, StocksTable, StockDataCache
-from utils.email import send_daily_summary_email
+from cruds import portfolios as portfolio_crud
+from cruds import reminders as reminder_crud
+from utils import mailer, metrics
+from utils.query_counter import track_job
+from utils.email import DAILY_SUMMARY_SUBJECT, DigestRenderer
+from config import get_settings
 import pytz
 
+settings = get_settings()
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything we store is UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+@track_job("scheduler")
 def send_scheduled_emails():
-    """Send daily summary emails to users based on their scheduled reminder times in their timezone"""
+    """Send daily summary emails to the users whose next reminder time (kept in email_reminder_schedule) has come"""
     db: Session = SessionLocal()
+    started = time.perf_counter()
     try:
-        # Get all users with email reminders enabled
-        users = db.query(UsersTable).filter(
-            UsersTable.email_reminder_enabled == True,
-            UsersTable.email_reminder_time.isnot(None)
-        ).all()
+        now = datetime.now(timezone.utc)
+        grace = timedelta(minutes=settings.REMINDER_GRACE_MINUTES)
+
+        # Only users who are due - found through the index on next_send_at, no per-user timezone math
+        due = reminder_crud.get_due(db, now)
 
-        print(f"🕐 Checking scheduled emails - Found {len(users)} users with reminders enabled")
+        print(f"🕐 Checking scheduled emails - {len(due)} users due")
+        metrics.scheduler_users.inc(len(due))
 
-        for user in users:
+        to_send = []
+        for reminder, user in due:
+            due_at = _as_utc(reminder.next_send_at)
             try:
-                # Get user's timezone
-                user_tz = pytz.timezone(user.timezone or "UTC")
-                
-                # Get current time in user's timezone
-                user_current_time = datetime.now(user_tz).strftime("%H:%M")
-                
-                # Check if it's time to send email for this user
-                if user_current_time == user.email_reminder_time:
-                    print(f"⏰ Time to send email to {user.email} (their time: {user_current_time}, timezone: {user.timezone})")
-                    
-                    # Get user's portfolio stocks
-                    portfolio = db.query(PortfoliosTable).filter(
-                        PortfoliosTable.user_id == user.id
-                    ).all()
-
-                    if not portfolio:
-                        print(f"⚠️ User {user.email} has empty portfolio - skipping email")
-                        continue
-
-                    # Prepare portfolio summary with cached stock data
-                    portfolio_summary = []
-                    for entry in portfolio:
-                        stock = db.query(StocksTable).filter(
-                            StocksTable.stock_symbol == entry.stock_symbol
-                        ).first()
-
-                        if stock:
-                            # Get cached stock data for this user and stock
-                            cached_data = db.query(StockDataCache).filter(
-                                StockDataCache.user_id == user.id,
-                                StockDataCache.stock_symbol == stock.stock_symbol
-                            ).first()
-
-                            if cached_data:
-                                portfolio_summary.append({
-                                    "ticker": stock.stock_symbol,
-                                    "name": stock.stock_company_name,
-                                    "price": f"${cached_data.current_price:.2f}",
-                                    "change_percent": cached_data.change_percent,
-                                    "change": f"${cached_data.change:.2f}",
-                                    "open": f"${cached_data.open_price:.2f}",
-                                    "high": f"${cached_data.high_price:.2f}",
-                                    "low": f"${cached_data.low_price:.2f}",
-                                    "volume": f"{cached_data.volume:,}",
-                                    "latest_trading_day": cached_data.latest_trading_day,
-                                    "previous_close": f"${cached_data.previous_close:.2f}"
-                                })
-                            else:
-                                # Include stock but mark data as unavailable
-                                portfolio_summary.append({
-                                    "ticker": stock.stock_symbol,
-                                    "name": stock.stock_company_name,
-                                    "price": "N/A",
-                                    "change_percent": "N/A",
-                                    "change": "N/A",
-                                    "open": "N/A",
-                                    "high": "N/A",
-                                    "low": "N/A",
-                                    "volume": "N/A",
-                                    "latest_trading_day": "N/A",
-                                    "previous_close": "N/A"
-                                })
-
-                    # Send email if we have portfolio data
-                    if portfolio_summary:
-                        send_daily_summary_email(user.email, portfolio_summary)
-                        print(f"📧 Sent scheduled email to {user.email} at {user_current_time} {user.timezone} ({len(portfolio_summary)} stocks)")
-                    else:
-                        print(f"⚠️ No portfolio data available for {user.email} - skipping email")
-
-            except pytz.exceptions.UnknownTimeZoneError:
-                print(f"❌ Invalid timezone '{user.timezone}' for user {user.email}")
+                # Move each user to their next local send time before sending, so a crash can't resend
+                reminder.next_send_at = reminder_crud.next_send_time(user.email_reminder_time, user.timezone, now)
+            except (pytz.exceptions.UnknownTimeZoneError, ValueError):
+                print(f"❌ Invalid reminder settings for user {user.email} ('{user.email_reminder_time}', '{user.timezone}')")
+                db.delete(reminder)
+                continue
+
+            if now - due_at > grace:
+                print(f"⚠️ Missed reminder for {user.email} due at {due_at:%Y-%m-%d %H:%M} UTC - skipping until next time")
+                continue
+            # Plain values: the commit below expires the ORM objects
+            to_send.append((user.id, user.email, user.email_reminder_time, user.timezone))
+        db.commit()
+
+        # Portfolio, company name and cached quote for every due user in one query
+        holdings_by_user = portfolio_crud.get_holdings_with_quotes(db, [user_id for user_id, *_ in to_send])
+
+        # Rows are rendered once per (symbol, quote) and shared by every recipient this tick
+        renderer = DigestRenderer()
+        messages = []
+        sent_to = []
+        for user_id, email, reminder_time, user_timezone in to_send:
+            try:
+                print(f"⏰ Time to send email to {email} (their time: {reminder_time}, timezone: {user_timezone})")
+
+                holdings = holdings_by_user.get(user_id)
+                if not holdings:
+                    print(f"⚠️ User {email} has empty portfolio - skipping email")
+                    continue
+
+                messages.append((DAILY_SUMMARY_SUBJECT, email, renderer.render(holdings)))
+                sent_to.append((email, reminder_time, user_timezone, len(holdings)))
+
             except Exception as e:
-                print(f"❌ Failed to send scheduled email to {user.email}: {str(e)}")
+                print(f"❌ Failed to send scheduled email to {email}: {str(e)}")
+
+        # Deliver the whole batch in parallel over pooled SMTP connections
+        results = mailer.send_all(messages)
+        for (email, reminder_time, user_timezone, stock_count), error in zip(sent_to, results):
+            if error is None:
+                print(f"📧 Sent scheduled email to {email} at {reminder_time} {user_timezone} ({stock_count} stocks)")
+            else:
+                print(f"❌ Failed to send scheduled email to {email}: {str(error)}")
+            metrics.emails_sent.labels("daily_summary", "sent" if error is None else "failed").inc()
 
     except Exception as e:
         print(f"❌ Scheduler error: {str(e)}")
     finally:
         db.close()
+        metrics.scheduler_tick_duration.observe(time.perf_counter() - started)
+
+def backfill_reminder_schedule():
+    """Index users whose reminders were enabled before email_reminder_schedule existed"""
+    db: Session = SessionLocal()
+    try:
+        added = reminder_crud.backfill_schedules(db)
+        if added:
+            print(f"📅 Scheduled reminders for {added} users")
+    except Exception as e:
+        print(f"❌ Failed to backfill reminder schedule: {str(e)}")
+    finally:
+        db.close()
 
 def run_scheduler():
     """Run the scheduler in a background thread"""
+    backfill_reminder_schedule()
+
     # Schedule to check every minute for users who need emails
     schedule.every().minute.do(send_scheduled_emails)
 
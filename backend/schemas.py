@@ -92,6 +92,14 @@ class WeeklyStockData(BaseModel):
     metadata: dict
     weekly_data: list[WeeklyDataPoint]
 
+class IndicatorSeries(BaseModel):
+    symbol: str
+    interval: str
+    window: int
+    last_bar_date: str
+    dates: list[str]
+    indicators: dict[str, list[Optional[float]]]
+
 class EmailReminderRequest(BaseModel):
     reminder_time: Optional[str] = None
     enabled: bool
@@ -0,0 +1,81 @@
+"""Shared fixtures: a migrated throwaway SQLite database (or TEST_DATABASE_URL),
+a client for the API routers, verified users to call them with and a local
+SMTP stand-in that receives all mail.
+
+Run from backend/:
+
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.Settings needs these; nothing is sent anywhere
+for name in ("EMAIL_ADDRESS", "EMAIL_PASSWORD", "ALPHA_VANTAGE_API_KEY"):
+    os.environ.setdefault(name, "test@example.com" if name == "EMAIL_ADDRESS" else "test")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+
+# Mail goes to a local stand-in, never to a real server
+from benchmarks.smtp_standin import SMTPStandin
+_smtp_standin = SMTPStandin().start()
+os.environ.update(SMTP_HOST="127.0.0.1", SMTP_PORT=str(_smtp_standin.port), SMTP_USE_SSL="false")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import migrations
+from database import SessionLocal, engine
+from models import UsersTable
+from utils import passwords
+from utils.jwt import create_access_token
+from utils.query_counter import QueryCounterMiddleware
+
+@pytest.fixture(scope="session")
+def migrated_engine():
+    migrations.upgrade(engine)
+    return engine
+
+@pytest.fixture
+def db(migrated_engine):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture(scope="session")
+def smtp_server() -> SMTPStandin:
+    return _smtp_standin
+
+@pytest.fixture(scope="session")
+def client(migrated_engine):
+    """The routers and query counter of main.app, without its lifespan, scheduler and outbox dispatcher"""
+    from routers import auth, email, portfolio, stock_search, user
+
+    app = FastAPI()
+    app.add_middleware(QueryCounterMiddleware)
+    for module in (auth, email, portfolio, stock_search, user):
+        app.include_router(module.router)
+    return TestClient(app)
+
+@pytest.fixture
+def make_user(db):
+    """make_user(**columns) -> (user, Authorization header for it); verified unless is_verified=False"""
+    def make(password: str = "Secret1!x", **columns):
+        email = f"user-{uuid.uuid4().hex[:12]}@example.com"
+        columns = {
+            "hashed_password": passwords.hash_password(password, 4),
+            "is_verified": True,
+            "alpha_vantage_api_key": f"key-{uuid.uuid4().hex[:12]}",
+            **columns,
+        }
+        user = UsersTable(email=email, **columns)
+        db.add(user)
+        db.commit()
+        return user, {"Authorization": f"Bearer {create_access_token(email)}"}
+    return make
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from utils.db_pool import PoolStats, TimedQueuePool, pool_stats
+
+@pytest.fixture
+def small_engine(tmp_path):
+    """A one-connection pool of its own, so the counts below start from zero"""
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    stats = PoolStats()
+    stats.attach(engine)
+    yield engine, stats
+    engine.dispose()
+
+def test_checkouts_and_checkins_are_counted(small_engine):
+    engine, stats = small_engine
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            assert stats.snapshot(engine.pool)["in_use"] == 1
+
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["checkouts"] == snapshot["checkins"] == 3
+    assert snapshot["in_use"] == 0
+    assert snapshot["idle"] == 1
+    assert snapshot["pool_size"] == 1 and snapshot["max_overflow"] == 0
+    assert snapshot["max_held_ms"] >= snapshot["avg_held_ms"] >= 0
+
+def test_a_checkout_that_times_out_is_counted(small_engine):
+    engine, _ = small_engine
+    timeouts = pool_stats.timeouts
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    assert pool_stats.timeouts == timeouts + 1
+    assert pool_stats.snapshot(engine.pool)["max_wait_ms"] >= 50
+
+def test_a_pool_without_a_queue_reports_its_status():
+    engine = create_engine("sqlite://")
+    snapshot = PoolStats().snapshot(engine.pool)
+    assert snapshot["checkouts"] == 0 and snapshot["avg_wait_ms"] == 0.0
+    assert "pool" in snapshot and "in_use" not in snapshot
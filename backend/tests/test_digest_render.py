@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+from utils.email import DigestRenderer, build_summary_row, render_daily_summary_email
+
+def _quote(price: float, updated: datetime) -> dict:
+    return {
+        "open": price, "high": price, "low": price, "price": price, "volume": 1000, "latest_trading_day": "2026-10-16",
+        "previous_close": price - 1, "change": 1.0, "change_percent": "1.0%", "last_updated": updated,
+    }
+
+MORNING = datetime(2026, 10, 16, 9, tzinfo=timezone.utc)
+NOON = datetime(2026, 10, 16, 12, tzinfo=timezone.utc)
+
+def test_digest_matches_the_per_user_rendering():
+    holdings = [("AAPL", "Apple Inc", _quote(10, MORNING)), ("MSFT", "Microsoft", None)]
+    expected = render_daily_summary_email([build_summary_row(*holding) for holding in holdings])
+
+    assert DigestRenderer().render(holdings) == expected
+
+def test_rows_are_rendered_once_per_symbol_and_quote():
+    renderer = DigestRenderer()
+    apple = ("AAPL", "Apple Inc", _quote(10, MORNING))
+    first = renderer.render([apple, ("MSFT", "Microsoft", _quote(20, MORNING))])
+    second = renderer.render([apple])
+
+    assert len(renderer) == 2
+    assert renderer.row(*apple) in first and renderer.row(*apple) in second
+
+def test_a_newer_quote_gets_its_own_row():
+    renderer = DigestRenderer()
+    before = renderer.row("AAPL", "Apple Inc", _quote(10, MORNING))
+    after = renderer.row("AAPL", "Apple Inc", _quote(11, NOON))
+
+    assert len(renderer) == 2
+    assert "$10.00" in before and "$11.00" in after
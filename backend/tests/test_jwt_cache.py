@@ -0,0 +1,67 @@
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from utils import jwt as jwt_utils
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    jwt_utils.clear_verified_tokens()
+    yield
+    jwt_utils.clear_verified_tokens()
+
+def _token(email: str, seconds: float) -> str:
+    return jwt_utils.create_token({"sub": email, "type": "access"}, timedelta(seconds=seconds))
+
+def test_a_seen_token_skips_verification(monkeypatch):
+    token = _token("cached@example.com", 60)
+    assert jwt_utils.decode_token_cached(token)["sub"] == "cached@example.com"
+
+    def must_not_verify(token):
+        raise AssertionError("verified again")
+    monkeypatch.setattr(jwt_utils, "decode_token", must_not_verify)
+
+    assert jwt_utils.decode_token_cached(token)["sub"] == "cached@example.com"
+
+def test_an_expired_token_is_not_served_from_the_cache(monkeypatch):
+    token = _token("expiring@example.com", 60)
+    jwt_utils.decode_token_cached(token)
+
+    # Two minutes later the cached entry has expired, and full verification gets the final say
+    later = time.time() + 120
+    monkeypatch.setattr(jwt_utils, "time", SimpleNamespace(time=lambda: later))
+    def expired(token):
+        raise HTTPException(status_code=401, detail="Token expired")
+    monkeypatch.setattr(jwt_utils, "decode_token", expired)
+
+    with pytest.raises(HTTPException) as raised:
+        jwt_utils.decode_token_cached(token)
+    assert raised.value.status_code == 401
+    assert len(jwt_utils._verified) == 0
+
+def test_an_expired_token_is_never_cached():
+    token = _token("expired@example.com", -60)
+
+    with pytest.raises(HTTPException) as raised:
+        jwt_utils.decode_token_cached(token)
+    assert raised.value.status_code == 401
+    assert len(jwt_utils._verified) == 0
+
+def test_a_tampered_token_is_rejected():
+    token = _token("tampered@example.com", 60)
+    jwt_utils.decode_token_cached(token)
+
+    with pytest.raises(HTTPException):
+        jwt_utils.decode_token_cached(token[:-2] + ("AA" if token[-2:] != "AA" else "BB"))
+
+def test_the_cache_keeps_the_most_recently_used_tokens(monkeypatch):
+    monkeypatch.setattr(jwt_utils.settings, "JWT_CACHE_MAX_ENTRIES", 2)
+    tokens = [_token(f"lru{i}@example.com", 60) for i in range(3)]
+    jwt_utils.decode_token_cached(tokens[0])
+    jwt_utils.decode_token_cached(tokens[1])
+    jwt_utils.decode_token_cached(tokens[0])  # most recently used again
+    jwt_utils.decode_token_cached(tokens[2])
+
+    cached = {payload["sub"] for _, payload in jwt_utils._verified.values()}
+    assert cached == {"lru0@example.com", "lru2@example.com"}
@@ -0,0 +1,75 @@
+import smtplib
+import pytest
+from benchmarks.smtp_standin import SMTPStandin
+from utils import mailer
+
+MESSAGE = "Subject: test\r\n\r\nhello"
+
+@pytest.fixture
+def server():
+    standin = SMTPStandin().start()
+    yield standin
+    standin.stop()
+
+def _pool(server: SMTPStandin, size: int = 2) -> mailer.SMTPConnectionPool:
+    return mailer.SMTPConnectionPool("127.0.0.1", server.port, False, "user", "secret", size=size, timeout=5)
+
+def test_connections_are_reused(server):
+    pool = _pool(server)
+    for _ in range(5):
+        pool.send("from@example.com", "to@example.com", MESSAGE)
+
+    assert server.messages_received == 5
+    assert pool.connections_opened == 1
+
+def test_send_all_stays_within_the_pool_size(server):
+    pool = _pool(server, size=3)
+    results = mailer.send_all([("Digest", f"user{i}@example.com", "<p>hi</p>") for i in range(20)], pool)
+
+    assert results == [None] * 20
+    assert server.messages_received == 20
+    assert pool.connections_opened <= 3
+
+@pytest.mark.parametrize("reply", ["421 4.7.0 Try again later", "451 4.3.0 Local error"])
+def test_transient_reply_is_retried_on_a_new_connection(server, reply):
+    pool = _pool(server)
+    pool.send("from@example.com", "to@example.com", MESSAGE)
+    server.fail_next("DATA", reply)
+
+    pool.send("from@example.com", "to@example.com", MESSAGE)
+
+    assert server.messages_received == 2
+    assert pool.connections_opened == 2
+
+def test_transient_reply_twice_fails_without_dead_lettering(server):
+    pool = _pool(server)
+    server.fail_next("DATA", "452 4.3.1 Insufficient storage", "452 4.3.1 Insufficient storage")
+
+    with pytest.raises(smtplib.SMTPDataError) as raised:
+        pool.send("from@example.com", "to@example.com", MESSAGE)
+
+    assert not mailer.is_permanent(raised.value)
+    assert server.messages_received == 0
+
+def test_permanent_refusal_is_not_retried_and_keeps_the_connection(server):
+    pool = _pool(server)
+    server.fail_next("DATA", "554 5.7.1 Message rejected")
+
+    with pytest.raises(smtplib.SMTPDataError) as raised:
+        pool.send("from@example.com", "to@example.com", MESSAGE)
+    pool.send("from@example.com", "to@example.com", MESSAGE)
+
+    assert mailer.is_permanent(raised.value)
+    assert server.messages_received == 1
+    assert pool.connections_opened == 1
+
+def test_refused_recipient_is_final(server):
+    pool = _pool(server)
+    server.fail_next("RCPT", "550 5.1.1 No such user")
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused) as raised:
+        pool.send("from@example.com", "nobody@example.com", MESSAGE)
+
+    assert mailer.is_permanent(raised.value)
+    assert server.messages_received == 0
+    assert pool.connections_opened == 1
@@ -0,0 +1,30 @@
+from sqlalchemy import create_engine, inspect, text
+import migrations
+from database import Base
+import models  # noqa: F401 - registers the tables on Base.metadata
+
+def test_reading_versions_does_not_create_schema_migrations(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/empty.db")
+
+    assert migrations.applied_versions(engine) == set()
+    assert len(migrations.pending(engine)) == len(migrations.available())
+    assert inspect(engine).get_table_names() == []
+
+def test_migrated_schema_matches_the_models(migrated_engine):
+    inspector = inspect(migrated_engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"]: column["nullable"] for column in inspector.get_columns(table.name)}
+        assert columns == {column.name: column.nullable for column in table.columns}, table.name
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+def test_the_old_per_user_quote_cache_is_dropped(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        # What create_all left behind before quotes were cached per symbol
+        conn.execute(text("CREATE TABLE stock_data_cache (id INTEGER NOT NULL, user_id INTEGER NOT NULL, stock_symbol VARCHAR(20) NOT NULL, PRIMARY KEY (id))"))
+
+    migrations.upgrade(engine)
+    tables = inspect(engine).get_table_names()
+    assert "stock_data_cache" not in tables
+    assert "stock_quote_cache" in tables
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+from cruds import outbox as outbox_crud
+from models import EmailOutbox
+
+def _queue(db, recipient: str, status: str, age: timedelta) -> EmailOutbox:
+    entry = outbox_crud.enqueue(db, recipient, "Verify your email", "<a href='/verify?token=secret'>Verify</a>")
+    entry.status = status
+    entry.created_at = datetime.now(timezone.utc) - age
+    db.commit()
+    return entry
+
+def test_mark_sent_drops_the_body(db):
+    entry = _queue(db, "sent-body@example.com", "pending", timedelta(0))
+    outbox_crud.mark_sent(entry, datetime.now(timezone.utc))
+    db.commit()
+
+    db.refresh(entry)
+    assert entry.status == "sent"
+    assert entry.html_body is None
+
+def test_prune_deletes_only_old_sent_and_dead_rows(db):
+    keep = [
+        _queue(db, "prune-pending@example.com", "pending", timedelta(days=60)),
+        _queue(db, "prune-recent@example.com", "sent", timedelta(days=1)),
+    ]
+    old = [
+        _queue(db, "prune-sent@example.com", "sent", timedelta(days=60)),
+        _queue(db, "prune-dead@example.com", "dead", timedelta(days=60)),
+    ]
+    keep_ids = [entry.id for entry in keep]
+    old_ids = [entry.id for entry in old]
+
+    outbox_crud.prune(db, datetime.now(timezone.utc) - timedelta(days=30))
+
+    remaining = {entry_id for (entry_id,) in db.query(EmailOutbox.id).filter(EmailOutbox.id.in_(keep_ids + old_ids))}
+    assert remaining == set(keep_ids)
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from models import UsersTable
+from utils import passwords
+
+def test_the_executor_hashes_and_verifies(monkeypatch):
+    monkeypatch.setattr(passwords.settings, "BCRYPT_ROUNDS", 4)
+
+    async def scenario():
+        hashed = await passwords.hash_password_async("Secret1!x")
+        return hashed, await passwords.verify_password_async("Secret1!x", hashed), await passwords.verify_password_async("wrong", hashed)
+
+    hashed, right, wrong = asyncio.run(scenario())
+    assert hashed.startswith("$2b$04$")
+    assert right and not wrong
+
+def test_a_full_queue_answers_503_with_retry_after(monkeypatch):
+    full = threading.BoundedSemaphore(1)
+    full.acquire()
+    monkeypatch.setattr(passwords, "_pending", full)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(passwords.verify_password_async("Secret1!x", passwords.hash_password("Secret1!x", 4)))
+    assert raised.value.status_code == 503
+    assert raised.value.headers == {"Retry-After": "1"}
+
+def test_the_queue_slot_is_released_after_each_hash(monkeypatch):
+    monkeypatch.setattr(passwords, "_pending", threading.BoundedSemaphore(1))
+    hashed = passwords.hash_password("Secret1!x", 4)
+
+    async def scenario():
+        return [await passwords.verify_password_async("Secret1!x", hashed) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [True, True, True]
+
+def test_needs_rehash_compares_the_cost(monkeypatch):
+    monkeypatch.setattr(passwords.settings, "BCRYPT_ROUNDS", 5)
+    assert passwords.needs_rehash(passwords.hash_password("Secret1!x", 4))
+    assert not passwords.needs_rehash(passwords.hash_password("Secret1!x", 5))
+    assert passwords.needs_rehash("not a bcrypt hash")
+
+def test_login_upgrades_an_outdated_hash(client, db, make_user, monkeypatch):
+    monkeypatch.setattr(passwords.settings, "BCRYPT_ROUNDS", 5)
+    user, _ = make_user()
+    assert user.hashed_password.startswith("$2b$04$")
+
+    response = client.post("/auth/login", json={"email": user.email, "password": "Secret1!x"})
+    assert response.status_code == 200
+
+    db.expire_all()
+    upgraded = db.query(UsersTable).filter(UsersTable.email == user.email).one().hashed_password
+    assert upgraded.startswith("$2b$05$")
+    assert passwords.verify_password("Secret1!x", upgraded)
+
+def test_login_keeps_a_current_hash(client, db, make_user, monkeypatch):
+    monkeypatch.setattr(passwords.settings, "BCRYPT_ROUNDS", 4)
+    user, _ = make_user()
+    original = user.hashed_password
+
+    assert client.post("/auth/login", json={"email": user.email, "password": "Secret1!x"}).status_code == 200
+    db.expire_all()
+    assert db.query(UsersTable).filter(UsersTable.email == user.email).one().hashed_password == original
+
+def test_login_rejects_a_wrong_password_without_rehashing(client, db, make_user, monkeypatch):
+    monkeypatch.setattr(passwords.settings, "BCRYPT_ROUNDS", 5)
+    user, _ = make_user()
+    original = user.hashed_password
+
+    assert client.post("/auth/login", json={"email": user.email, "password": "Wrong1!x"}).status_code == 401
+    db.expire_all()
+    assert db.query(UsersTable).filter(UsersTable.email == user.email).one().hashed_password == original
+
+def test_login_answers_503_when_the_hash_queue_is_full(client, make_user, monkeypatch):
+    user, _ = make_user()
+    full = threading.BoundedSemaphore(1)
+    full.acquire()
+    monkeypatch.setattr(passwords, "_pending", full)
+
+    response = client.post("/auth/login", json={"email": user.email, "password": "Secret1!x"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
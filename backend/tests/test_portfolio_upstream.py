@@ -0,0 +1,59 @@
+import asyncio
+import uuid
+import httpx
+import pytest
+from fastapi import HTTPException
+from routers import portfolio
+from utils import alpha_vantage
+
+QUOTE = {
+    "Global Quote": {
+        "01. symbol": "AAA", "02. open": "1.0", "03. high": "2.0", "04. low": "0.5", "05. price": "1.5",
+        "06. volume": "10", "07. latest trading day": "2026-10-16", "08. previous close": "1.0",
+        "09. change": "0.5", "10. change percent": "50%",
+    }
+}
+
+@pytest.fixture
+def upstream(migrated_engine, monkeypatch):
+    """upstream(response) makes every Alpha Vantage call answer with it"""
+    def answer_with(response: httpx.Response):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: response))
+        monkeypatch.setattr(alpha_vantage, "_client", client)
+    return answer_with
+
+def _fetch_quote():
+    # A new key per call, so the per-minute budget never runs out
+    return asyncio.run(portfolio._fetch_quote("AAA", f"key-{uuid.uuid4().hex}"))
+
+@pytest.mark.parametrize("response", [
+    httpx.Response(503, text="<html>Service Unavailable</html>"),
+    httpx.Response(500),
+    httpx.Response(200, text="<html>maintenance</html>"),
+    httpx.Response(200, json=["not", "an", "object"]),
+])
+def test_quote_error_pages_are_bad_gateway(upstream, response):
+    upstream(response)
+
+    with pytest.raises(HTTPException) as raised:
+        _fetch_quote()
+    assert raised.value.status_code == 502
+
+def test_quote_throttling_is_too_many_requests(upstream):
+    upstream(httpx.Response(200, json={"Information": "rate limit"}))
+
+    with pytest.raises(HTTPException) as raised:
+        _fetch_quote()
+    assert raised.value.status_code == 429
+
+def test_quote_is_parsed(upstream):
+    upstream(httpx.Response(200, json=QUOTE))
+
+    assert _fetch_quote()["price"] == 1.5
+
+def test_time_series_error_page_is_bad_gateway(upstream):
+    upstream(httpx.Response(502, text="<html>Bad Gateway</html>"))
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(portfolio._fetch_time_series(*portfolio.TIME_SERIES["weekly"], "weekly", "AAA", f"key-{uuid.uuid4().hex}"))
+    assert raised.value.status_code == 502
@@ -0,0 +1,38 @@
+from datetime import date
+from cruds import price_history as history_crud
+
+def _row(day: str, close: float) -> dict:
+    return {
+        "date": day, "open": close, "high": close, "low": close, "close": close,
+        "adjusted_close": close, "volume": 100, "dividend_amount": 0.0,
+    }
+
+def _stored(db, symbol: str, interval: str) -> list[tuple[str, float]]:
+    return [(bar.bar_date.isoformat(), bar.close_price) for bar in history_crud.get_bars(db, symbol, interval)]
+
+def test_merge_appends_new_bars_and_keeps_older_history(db):
+    history_crud.merge_bars(db, "MRGA", "weekly", [_row("2026-10-09", 9), _row("2026-10-02", 8)], {}, None)
+    history_crud.merge_bars(db, "MRGA", "weekly", [_row("2026-10-16", 11), _row("2026-10-09", 9.5)], {}, date(2026, 10, 9))
+
+    # 2026-10-02 is not in the second download but is older than the refreshed period
+    assert _stored(db, "MRGA", "weekly") == [("2026-10-16", 11), ("2026-10-09", 9.5), ("2026-10-02", 8)]
+
+def test_partial_week_is_replaced_when_its_date_advances(db):
+    # Fetched on Wednesday: the week in progress is dated by its latest trading day
+    history_crud.merge_bars(db, "MRGB", "weekly", [_row("2026-10-14", 10), _row("2026-10-09", 9)], {}, None)
+    # A week later: that week is complete (dated Friday) and the next one is in progress
+    rows = [_row("2026-10-21", 12), _row("2026-10-16", 11), _row("2026-10-09", 9)]
+    history_crud.merge_bars(db, "MRGB", "weekly", rows, {}, history_crud.get_newest_bar_date(db, "MRGB", "weekly"))
+
+    assert _stored(db, "MRGB", "weekly") == [("2026-10-21", 12), ("2026-10-16", 11), ("2026-10-09", 9)]
+
+def test_partial_month_is_replaced_when_its_date_advances(db):
+    history_crud.merge_bars(db, "MRGC", "monthly", [_row("2026-10-14", 10), _row("2026-09-30", 9)], {}, None)
+    rows = [_row("2026-10-30", 11), _row("2026-09-30", 9)]
+    history_crud.merge_bars(db, "MRGC", "monthly", rows, {}, history_crud.get_newest_bar_date(db, "MRGC", "monthly"))
+
+    assert _stored(db, "MRGC", "monthly") == [("2026-10-30", 11), ("2026-09-30", 9)]
+
+def test_empty_download_does_not_mark_the_series_checked(db):
+    assert history_crud.merge_bars(db, "MRGD", "weekly", [], {}, None) == 0
+    assert history_crud.get_sync(db, "MRGD", "weekly") is None
@@ -0,0 +1,51 @@
+"""The hot read paths run a fixed number of statements, however many holdings a user has"""
+import uuid
+from datetime import datetime, timezone
+from cruds import portfolios as portfolio_crud
+from cruds import quotes as quote_crud
+from models import StocksTable
+from utils.query_counter import assert_query_budget
+
+# user (cache miss), holdings, quotes
+SUMMARY_BUDGET = 3
+# user (cache miss), holdings joined with their quotes
+SEND_SUMMARY_BUDGET = 2
+
+def _user_with_holdings(db, make_user, count: int) -> dict:
+    user, headers = make_user()
+    prefix = uuid.uuid4().hex[:6].upper()
+    symbols = [f"Q{prefix}{i}" for i in range(count)]
+    db.add_all(StocksTable(stock_symbol=symbol, stock_company_name=f"{symbol} Inc", is_listed=True) for symbol in symbols)
+    db.commit()
+    now = datetime.now(timezone.utc)
+    # Written straight to the table, so the request reads them instead of the in-memory quote cache
+    quote_crud.upsert_quotes(db, {
+        symbol: {
+            "open": 1.0, "high": 2.0, "low": 0.5, "price": 1.5, "volume": 100, "latest_trading_day": "2026-10-16",
+            "previous_close": 1.0, "change": 0.5, "change_percent": "50%", "last_updated": now,
+        }
+        for symbol in symbols
+    })
+    for symbol in symbols:
+        portfolio_crud.insert_holding(db, user.id, symbol)
+    return headers
+
+def _count(client, method: str, path: str, headers: dict, budget: int) -> int:
+    with assert_query_budget(budget) as stats:
+        response = client.request(method, path, headers=headers)
+    assert response.status_code == 200, response.text
+    return stats.count
+
+def test_portfolio_summary_does_not_grow_with_holdings(client, db, make_user):
+    one = _count(client, "GET", "/portfolio/summary", _user_with_holdings(db, make_user, 1), SUMMARY_BUDGET)
+    many = _count(client, "GET", "/portfolio/summary", _user_with_holdings(db, make_user, 12), SUMMARY_BUDGET)
+
+    assert many == one
+
+def test_send_summary_does_not_grow_with_holdings(client, db, make_user, smtp_server):
+    sent_before = smtp_server.messages_received
+    one = _count(client, "GET", "/email/send-summary", _user_with_holdings(db, make_user, 1), SEND_SUMMARY_BUDGET)
+    many = _count(client, "GET", "/email/send-summary", _user_with_holdings(db, make_user, 12), SEND_SUMMARY_BUDGET)
+
+    assert many == one
+    assert smtp_server.messages_received == sent_before + 2
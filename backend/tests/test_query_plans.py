@@ -0,0 +1,104 @@
+"""Query plans for the hot lookups.
+
+Each entry is a query the app runs on every request or scheduler tick and
+the index (any of several names) that must serve it. SQLite's EXPLAIN QUERY
+PLAN has to name the index. On PostgreSQL (TEST_DATABASE_URL), sequential
+scans are disabled for the check: with tiny tables the planner prefers them
+anyway, and the question here is whether an index can serve the query at all.
+"""
+import json
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+from models import (
+    EmailOutbox, EmailReminderSchedule, PortfoliosTable, PriceHistory, StockQuoteCache, StocksTable, UsersTable
+)
+
+PORTFOLIO_HOLDING_INDEX = "uq_portfolios_table_user_id_stock_symbol"
+
+def _primary_key(table: str, integer: bool = False) -> tuple[str, ...]:
+    # PostgreSQL names it <table>_pkey; SQLite uses the rowid for an INTEGER key and an autoindex otherwise
+    return (f"{table}_pkey", "INTEGER PRIMARY KEY" if integer else f"sqlite_autoindex_{table}_1")
+
+HOT_QUERIES = [
+    (
+        "portfolio holding",
+        select(PortfoliosTable.id).where(PortfoliosTable.user_id == 1, PortfoliosTable.stock_symbol == "AAPL"),
+        (PORTFOLIO_HOLDING_INDEX,),
+    ),
+    (
+        "owned symbols",
+        select(PortfoliosTable.stock_symbol).where(PortfoliosTable.user_id == 1),
+        (PORTFOLIO_HOLDING_INDEX,),
+    ),
+    (
+        "cached quotes",
+        select(StockQuoteCache).where(StockQuoteCache.stock_symbol.in_(["AAPL", "MSFT"])),
+        _primary_key("stock_quote_cache") + ("ix_stock_quote_cache_stock_symbol",),
+    ),
+    (
+        "price history bars",
+        select(PriceHistory)
+        .where(PriceHistory.stock_symbol == "AAPL", PriceHistory.interval == "weekly")
+        .order_by(PriceHistory.bar_date.desc())
+        .limit(52),
+        _primary_key("price_history"),
+    ),
+    (
+        "stocks browse page",
+        select(StocksTable.stock_symbol, StocksTable.stock_company_name)
+        .where(StocksTable.stock_symbol > "M")
+        .order_by(StocksTable.stock_symbol)
+        .limit(50),
+        _primary_key("stocks_table") + ("ix_stocks_table_stock_symbol",),
+    ),
+    (
+        "user by email",
+        select(UsersTable).where(UsersTable.email == "someone@example.com"),
+        ("ix_users_table_email",),
+    ),
+    (
+        "due outbox emails",
+        select(EmailOutbox.id)
+        .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= func.current_timestamp())
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(50),
+        ("ix_email_outbox_status_next_attempt_at",),
+    ),
+    (
+        "due reminders",
+        select(EmailReminderSchedule.user_id).where(EmailReminderSchedule.next_send_at <= func.current_timestamp()),
+        ("ix_email_reminder_schedule_next_send_at",),
+    ),
+]
+
+def _postgresql_plan(conn: Connection, sql: str) -> tuple[str, set[str]]:
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes, indexes, stack = [], set(), [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        nodes.append(node["Node Type"] + (f" on {node['Index Name']}" if "Index Name" in node else ""))
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        stack.extend(node.get("Plans", []))
+    return " | ".join(nodes), indexes
+
+def _sqlite_plan(conn: Connection, sql: str) -> str:
+    return " | ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+@pytest.mark.parametrize("statement, expected", [entry[1:] for entry in HOT_QUERIES], ids=[entry[0] for entry in HOT_QUERIES])
+def test_hot_query_uses_its_index(migrated_engine, statement, expected):
+    with migrated_engine.connect() as conn:
+        sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+        with conn.begin():
+            if conn.dialect.name == "postgresql":
+                plan, indexes = _postgresql_plan(conn, sql)
+                used = bool(indexes & set(expected))
+            else:
+                plan = _sqlite_plan(conn, sql)
+                used = any(index in plan for index in expected)
+            conn.rollback()
+    assert used, f"expected {' or '.join(expected)}, plan: {plan}"
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from utils.singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "quote"
+
+        results = await asyncio.gather(*(flight.do(("GLOBAL_QUOTE", "AAA"), fetch) for _ in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["quote"] * 5
+    assert len(calls) == 1
+    assert (stats["originated"], stats["coalesced"], stats["in_flight"]) == (1, 4, 0)
+
+def test_cancelled_originator_does_not_fail_its_followers():
+    async def scenario():
+        flight, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "quote"
+
+        originator = asyncio.create_task(flight.do(("GLOBAL_QUOTE", "AAA"), fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do(("GLOBAL_QUOTE", "AAA"), fetch))
+        await asyncio.sleep(0.01)
+        originator.cancel()  # its client disconnected
+        with pytest.raises(asyncio.CancelledError):
+            await originator
+        return await follower, calls
+
+    result, calls = asyncio.run(scenario())
+    assert result == "quote"
+    assert len(calls) == 1
+
+def test_failure_reaches_every_caller_and_frees_the_key():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def working():
+            return "quote"
+
+        results = await asyncio.gather(*(flight.do(("GLOBAL_QUOTE", "AAA"), failing) for _ in range(3)), return_exceptions=True)
+        return results, await flight.do(("GLOBAL_QUOTE", "AAA"), working)
+
+    results, retried = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == "quote"
+
+def test_do_own_follower_retries_with_its_own_call():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def throttled_key():
+            await asyncio.sleep(0.01)
+            raise LookupError("429 for this key")
+
+        async def good_key():
+            return "quote"
+
+        originator = flight.do_own(("GLOBAL_QUOTE", "AAA"), throttled_key, retry_on=(LookupError,))
+        follower = flight.do_own(("GLOBAL_QUOTE", "AAA"), good_key, retry_on=(LookupError,))
+        return await asyncio.gather(originator, follower, return_exceptions=True)
+
+    originator, follower = asyncio.run(scenario())
+    assert isinstance(originator, LookupError)
+    assert follower == "quote"
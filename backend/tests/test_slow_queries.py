@@ -0,0 +1,25 @@
+from sqlalchemy.dialects import postgresql
+from models import EmailOutbox
+from sqlalchemy import select
+from utils.slow_queries import can_analyze, redact
+
+def _postgresql_sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+def test_plain_select_is_analyzed():
+    assert can_analyze(_postgresql_sql(select(EmailOutbox.id).where(EmailOutbox.status == "pending")))
+
+def test_locking_select_is_not_analyzed():
+    claim = select(EmailOutbox.id).where(EmailOutbox.status == "pending").with_for_update(skip_locked=True)
+    assert not can_analyze(_postgresql_sql(claim))
+    assert not can_analyze("SELECT id FROM email_reminder_schedule FOR NO KEY UPDATE OF email_reminder_schedule")
+    assert not can_analyze("select id from users_table for share")
+
+def test_writes_are_not_analyzed():
+    assert not can_analyze("UPDATE email_outbox SET status = 'sent' WHERE id = 1")
+    assert not can_analyze("  INSERT INTO stock_quote_cache (stock_symbol) VALUES ('AAPL')")
+
+def test_strings_are_redacted_and_numbers_kept():
+    assert redact({"email": "a@b.c", "limit": 50, "symbols": ["AAPL"]}) == {
+        "email": "<redacted 5 chars>", "limit": 50, "symbols": ["<redacted 4 chars>"]
+    }
@@ -0,0 +1,43 @@
+import pytest
+from cruds import portfolios as portfolio_crud
+from database import SessionLocal
+from models import StocksTable
+from routers.stock_search import encode_cursor
+
+SYMBOLS = ["BRWA", "BRWB", "BRWC", "BRWD", "BRWE"]
+
+@pytest.fixture(scope="module", autouse=True)
+def listed_stocks(migrated_engine):
+    with SessionLocal() as session:
+        session.add_all(StocksTable(stock_symbol=symbol, stock_company_name=f"{symbol} Corp", is_listed=True) for symbol in SYMBOLS)
+        session.commit()
+
+def _page(client, headers, **params):
+    response = client.get("/stocks", headers=headers, params=params)
+    assert response.status_code == 200
+    return [stock["symbol"] for stock in response.json()], response.headers.get("X-Next-Cursor")
+
+def test_browse_follows_the_cursor_and_skips_owned_stocks(client, db, make_user):
+    user, headers = make_user()
+    portfolio_crud.insert_holding(db, user.id, "BRWC")
+
+    first, cursor = _page(client, headers, after=encode_cursor("BRW"), limit=2)
+    assert first == ["BRWA", "BRWB"]
+    second, cursor = _page(client, headers, after=cursor, limit=2)
+    assert second == ["BRWD", "BRWE"]
+    assert cursor == encode_cursor("BRWE")
+
+def test_empty_page_has_no_cursor(client, make_user):
+    _, headers = make_user()
+
+    assert _page(client, headers, after=encode_cursor("~"), limit=2) == ([], None)
+
+def test_zero_limit_is_rejected(client, make_user):
+    _, headers = make_user()
+
+    assert client.get("/stocks", headers=headers, params={"limit": 0}).status_code == 422
+
+def test_invalid_cursor_is_rejected(client, make_user):
+    _, headers = make_user()
+
+    assert client.get("/stocks", headers=headers, params={"after": "not base64!"}).status_code == 400
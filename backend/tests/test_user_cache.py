@@ -0,0 +1,53 @@
+from models import UsersTable
+from utils import user_cache
+from utils.jwt import create_verification_token
+
+def _profile(client, headers) -> dict:
+    response = client.get("/user/profile", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_api_key_update_is_seen_on_the_next_request(client, make_user):
+    user, headers = make_user()
+    assert _profile(client, headers)["alpha_vantage_api_key"] == user.alpha_vantage_api_key  # now cached
+
+    assert client.put("/user/update-api-key", headers=headers, json={"new_api_key": "fresh-key"}).status_code == 200
+
+    assert _profile(client, headers)["alpha_vantage_api_key"] == "fresh-key"
+
+def test_reminder_settings_are_seen_on_the_next_request(client, make_user):
+    _, headers = make_user()
+    assert client.get("/email/settings", headers=headers).json()["email_reminder_enabled"] is False
+
+    body = {"enabled": True, "reminder_time": "07:30", "timezone": "Europe/Paris"}
+    assert client.post("/email/reminder-settings", headers=headers, json=body).status_code == 200
+
+    assert client.get("/email/settings", headers=headers).json() == {
+        "email_reminder_enabled": True, "email_reminder_time": "07:30", "timezone": "Europe/Paris"
+    }
+
+def test_email_verification_drops_the_cached_user(client, make_user):
+    user, headers = make_user(is_verified=False)
+    _profile(client, headers)
+    assert user_cache.get(user.email).is_verified is False
+
+    assert client.get("/auth/verify-email", params={"token": create_verification_token(user.email)}).status_code == 200
+
+    assert user_cache.get(user.email) is None
+    _profile(client, headers)
+    assert user_cache.get(user.email).is_verified is True
+
+def test_entries_expire_after_the_ttl(client, db, make_user, monkeypatch):
+    user, headers = make_user()
+    original_key = user.alpha_vantage_api_key
+    _profile(client, headers)
+    # Changed behind this worker's back, e.g. through another worker
+    db.get(UsersTable, user.id).alpha_vantage_api_key = "changed-elsewhere"
+    db.commit()
+    assert _profile(client, headers)["alpha_vantage_api_key"] == original_key
+
+    monkeypatch.setattr(user_cache.settings, "USER_CACHE_TTL_SECONDS", 0)
+    user_cache.invalidate(user.email)
+    _profile(client, headers)
+
+    assert _profile(client, headers)["alpha_vantage_api_key"] == "changed-elsewhere"
@@ -0,0 +1,76 @@
+"""Shared async HTTP client for Alpha Vantage.
+
+One httpx.AsyncClient per worker keeps TLS connections alive between calls
+instead of handshaking on every request. It is opened on app startup and
+closed on shutdown (see main.lifespan). Every call is metered against the
+key's budgets by utils.rate_limiter before it is sent.
+"""
+import time
+import httpx
+from utils import metrics, rate_limiter
+from config import get_settings
+
+settings = get_settings()
+
+BASE_URL = "https://www.alphavantage.co/query"
+
+_client: httpx.AsyncClient | None = None
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(15),
+        limits=httpx.Limits(
+            max_connections=settings.ALPHA_VANTAGE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.ALPHA_VANTAGE_MAX_KEEPALIVE,
+            keepalive_expiry=settings.ALPHA_VANTAGE_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+async def start_client():
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_client() -> httpx.AsyncClient:
+    # Scripts that never ran the app lifespan still get a working client
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+async def query(function: str, api_key: str, timeout: float = 15, max_wait: float | None = None, **params) -> httpx.Response:
+    """GET /query?function=...&apikey=... with any extra query parameters (symbol, ...)
+
+    Waits up to max_wait seconds for the key's rate budget (see rate_limiter.acquire).
+    """
+    await rate_limiter.acquire(api_key, max_wait)
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await get_client().get(
+            BASE_URL,
+            params={"function": function, **params, "apikey": api_key},
+            timeout=timeout,
+        )
+        outcome = _outcome(response)
+        return response
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        raise
+    finally:
+        metrics.record_upstream(function, outcome, time.perf_counter() - started)
+
+def _outcome(response: httpx.Response) -> str:
+    if response.status_code != 200:
+        return "http_error"
+    # A throttled key gets a tiny {"Note": ...} / {"Information": ...} body with status 200
+    head = response.content[:64]
+    if b'"Note"' in head or b'"Information"' in head:
+        return "throttled"
+    return "ok"
@@ -0,0 +1,104 @@
+"""SQLAlchemy connection pool telemetry.
+
+Every uvicorn worker has its own pool, so workers x (DB_POOL_SIZE +
+DB_MAX_OVERFLOW) has to stay under Postgres' max_connections. These numbers
+show whether a worker's pool is actually the bottleneck: how long checkouts
+wait for a free connection, how often they time out, and how long requests
+hold a connection once they have it.
+
+TimedQueuePool times every checkout from the pool queue. PoolStats.attach()
+adds checkout/checkin listeners that count connections and measure how long
+each one was held. Both are per worker; GET /admin/db-pool reports the
+worker that answers.
+"""
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# A checkout slower than this had to wait for a connection (or open a new one)
+SLOW_CHECKOUT_SECONDS = 0.01
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.held_seconds = 0.0
+        self.max_held_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+            elif seconds >= SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+
+    def attach(self, engine: Engine):
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            connection_record.info["checked_out_at"] = time.perf_counter()
+            with self._lock:
+                self.checkouts += 1
+
+        @event.listens_for(engine, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            started = connection_record.info.pop("checked_out_at", None)
+            with self._lock:
+                self.checkins += 1
+                if started is not None:
+                    held = time.perf_counter() - started
+                    self.held_seconds += held
+                    self.max_held_seconds = max(self.max_held_seconds, held)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            checkouts = self.checkouts
+            stats = {
+                "worker_pid": os.getpid(),
+                "checkouts": checkouts,
+                "checkins": self.checkins,
+                "slow_checkouts": self.slow_checkouts,
+                "timeouts": self.timeouts,
+                "total_wait_ms": round(self.wait_seconds * 1000, 1),
+                "avg_wait_ms": round(self.wait_seconds * 1000 / checkouts, 3) if checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+                "avg_held_ms": round(self.held_seconds * 1000 / self.checkins, 3) if self.checkins else 0.0,
+                "max_held_ms": round(self.max_held_seconds * 1000, 1),
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                # Negative while the pool has not opened pool_size connections yet
+                "overflow": pool.overflow(),
+            })
+        else:
+            stats["pool"] = pool.status()
+        return stats
+
+pool_stats = PoolStats()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited to pool_stats"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - started)
+        return connection
@@ -0,0 +1,83 @@
+"""Vectorized technical indicators over a stored price series.
+
+Inputs are NumPy arrays ordered oldest bar first; every output has the same
+length as its input, with NaN where the window is not yet full. Results are
+memoized per (symbol, interval, last bar date, ...) - once the series gains a
+bar the key changes and stale entries simply age out of the LRU.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+AVAILABLE = ("sma", "rsi", "volatility", "drawdown")
+PERIODS_PER_YEAR = {"weekly": 52, "monthly": 12}
+
+_MAX_ENTRIES = 1024
+_memo: "OrderedDict[tuple, dict]" = OrderedDict()
+_lock = threading.Lock()
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.insert(values, 0, 0.0))
+        out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+def rsi(values: np.ndarray, window: int) -> np.ndarray:
+    """Relative strength index using simple rolling averages of gains and losses (Cutler's RSI)"""
+    out = np.full(values.shape, np.nan)
+    if len(values) <= window:
+        return out
+    deltas = np.diff(values)
+    avg_gain = sma(np.clip(deltas, 0, None), window)
+    avg_loss = sma(np.clip(-deltas, 0, None), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[1:] = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    out[1:][np.isnan(avg_gain)] = np.nan
+    return out
+
+def volatility(values: np.ndarray, window: int, periods_per_year: int) -> np.ndarray:
+    """Annualized rolling standard deviation of log returns"""
+    out = np.full(values.shape, np.nan)
+    if len(values) <= window:
+        return out
+    returns = np.diff(np.log(values))
+    out[window:] = sliding_window_view(returns, window).std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+    return out
+
+def drawdown(values: np.ndarray) -> np.ndarray:
+    """Fractional distance below the running peak (0 at a new high, -0.25 = 25% below)"""
+    return values / np.maximum.accumulate(values) - 1.0
+
+def compute(closes: np.ndarray, interval: str, names: tuple, window: int) -> dict:
+    results = {}
+    for name in names:
+        if name == "sma":
+            results[name] = sma(closes, window)
+        elif name == "rsi":
+            results[name] = rsi(closes, window)
+        elif name == "volatility":
+            results[name] = volatility(closes, window, PERIODS_PER_YEAR[interval])
+        elif name == "drawdown":
+            results[name] = drawdown(closes)
+    return results
+
+def get_memoized(key: tuple):
+    with _lock:
+        value = _memo.get(key)
+        if value is not None:
+            _memo.move_to_end(key)
+        return value
+
+def memoize(key: tuple, value: dict):
+    with _lock:
+        _memo[key] = value
+        _memo.move_to_end(key)
+        while len(_memo) > _MAX_ENTRIES:
+            _memo.popitem(last=False)
+
+def to_json_list(values: np.ndarray) -> list:
+    """Round for the wire and turn NaN into null"""
+    rounded = np.round(values, 6)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
@@ -1,8 +1,13 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from jose import jwt, JWTError, ExpiredSignatureError
 from fastapi import HTTPException
+import hashlib
 import os
+import threading
+import time
 from config import get_settings
+from utils import metrics
 
 settings = get_settings()
 
@@ -25,6 +30,55 @@ def decode_token(token: str):
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# Tokens whose signature was already checked, by sha256 of the token: (exp, payload).
+# Bearer tokens are sent on every dashboard request, so most lookups hit.
+_verified: "OrderedDict[bytes, tuple[float, dict]]" = OrderedDict()
+_verified_lock = threading.Lock()
+_SWEEP_INTERVAL = 60
+_next_sweep = 0.0
+
+def _evict_expired(now: float):
+    # A full scan, so at most once a minute; expired entries met on lookup are dropped right away
+    global _next_sweep
+    if now < _next_sweep:
+        return
+    _next_sweep = now + _SWEEP_INTERVAL
+    for key in [key for key, (expires_at, _) in _verified.items() if expires_at <= now]:
+        del _verified[key]
+
+def decode_token_cached(token: str):
+    """decode_token, skipping signature verification for tokens seen before until they expire"""
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    with _verified_lock:
+        entry = _verified.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if now < expires_at:
+                _verified.move_to_end(key)
+                metrics.record_cache("jwt", "hit")
+                return dict(payload)
+            del _verified[key]
+
+    metrics.record_cache("jwt", "miss")
+    # Unknown or expired - full verification, which raises the usual 401s
+    payload = decode_token(token)
+    expires_at = payload.get("exp")
+    if not isinstance(expires_at, (int, float)):
+        return payload
+
+    with _verified_lock:
+        _verified[key] = (expires_at, dict(payload))
+        _verified.move_to_end(key)
+        _evict_expired(now)
+        while len(_verified) > settings.JWT_CACHE_MAX_ENTRIES:
+            _verified.popitem(last=False)
+    return payload
+
+def clear_verified_tokens():
+    with _verified_lock:
+        _verified.clear()
+
 # Email verification token
 def create_verification_token(email: str):
     return create_token(
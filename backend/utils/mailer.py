@@ -0,0 +1,167 @@
+"""Pooled SMTP delivery.
+
+Opening an SMTP_SSL connection costs a TCP + TLS handshake and a login, which
+dwarfs sending one message. SMTPConnectionPool keeps up to `size` logged-in
+connections and hands them out one caller at a time. A connection that fails,
+or gets a 4xx reply (421: the server is closing it; 451/452: try again), is
+thrown away and the send is retried once on a newly opened one. A message the
+server refuses for good (5xx, or its recipients are refused) fails on its own:
+the connection goes back to the pool and the send is not retried. send_all() drains
+a batch of messages through a bounded thread pool of the same size, so the
+scheduler can deliver a minute's worth of digests in parallel.
+"""
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from config import get_settings
+
+settings = get_settings()
+
+# The server answered with an error code. After a 5xx the session is still usable (sendmail() has sent RSET).
+# Both are OSError subclasses, so they are caught before the connection errors below.
+SERVER_REFUSALS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+def is_transient(error: Exception) -> bool:
+    """A 4xx reply (421 closing, 451/452 try later) - worth one more attempt on a new connection"""
+    return isinstance(error, smtplib.SMTPResponseException) and 400 <= error.smtp_code < 500
+
+def is_permanent(error: Exception) -> bool:
+    """A 5xx refusal of this message (sender, recipients or body) - sending it again later won't help"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)) and error.smtp_code >= 500
+
+class SMTPConnectionPool:
+    def __init__(self, host: str, port: int, use_ssl: bool, username: str | None, password: str | None,
+                 size: int = 4, timeout: float = 30, max_idle_seconds: float = 60):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.max_idle_seconds = max_idle_seconds
+        self._idle: "queue.LifoQueue[tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.username:
+            server.login(self.username, self.password)
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            # Servers drop idle sessions (Gmail after a few minutes) - don't hand out one that is likely dead
+            if time.monotonic() - last_used < self.max_idle_seconds:
+                return server
+            self._discard(server)
+
+    @contextmanager
+    def connection(self, fresh: bool = False):
+        """A pooled connection, or a newly opened one with fresh=True"""
+        with self._slots:
+            server = self._connect() if fresh else self._checkout()
+            try:
+                yield server
+            except SERVER_REFUSALS as error:
+                # smtplib may already have closed the session (sock is None); after a 4xx the server may be dropping it
+                if server.sock is None or is_transient(error):
+                    self._discard(server)
+                else:
+                    self._idle.put((server, time.monotonic()))
+                raise
+            except Exception:
+                self._discard(server)
+                raise
+            self._idle.put((server, time.monotonic()))
+
+    def send(self, sender: str, recipient: str, message: str):
+        try:
+            with self.connection() as server:
+                server.sendmail(sender, recipient, message)
+            return
+        except SERVER_REFUSALS as error:
+            # A final refusal of this message - another connection would get the same answer
+            if not is_transient(error):
+                raise
+        except OSError:
+            # SMTPServerDisconnected or a socket error: the pooled connection went stale
+            pass
+        with self.connection(fresh=True) as server:
+            server.sendmail(sender, recipient, message)
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
+
+_pool: SMTPConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> SMTPConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPConnectionPool(
+                settings.SMTP_HOST,
+                settings.SMTP_PORT,
+                settings.SMTP_USE_SSL,
+                settings.EMAIL_ADDRESS,
+                settings.EMAIL_PASSWORD,
+                size=settings.SMTP_POOL_SIZE,
+                timeout=settings.SMTP_TIMEOUT,
+            )
+        return _pool
+
+def build_message(subject: str, recipient: str, html_content: str) -> str:
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = settings.EMAIL_ADDRESS
+    message["To"] = recipient
+    message.attach(MIMEText(html_content, "html"))
+    return message.as_string()
+
+def send_all(messages: list[tuple[str, str, str]], pool: SMTPConnectionPool | None = None) -> list:
+    """Deliver (subject, recipient, html) messages in parallel; returns None or the exception for each"""
+    pool = pool or get_pool()
+
+    def deliver(item):
+        subject, recipient, html_content = item
+        try:
+            pool.send(settings.EMAIL_ADDRESS, recipient, build_message(subject, recipient, html_content))
+            return None
+        except Exception as e:
+            return e
+
+    if not messages:
+        return []
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(messages)), thread_name_prefix="mailer") as executor:
+        return list(executor.map(deliver, messages))
@@ -0,0 +1,85 @@
+"""Prometheus metrics, served at GET /metrics.
+
+Recording costs a dict lookup and a few float adds. Nothing is formatted
+until Prometheus scrapes. With several uvicorn workers, set
+PROMETHEUS_MULTIPROC_DIR to an empty directory shared by all of them (and by
+import_stocks.py, if its LISTING_STATUS download should be counted); every
+process then writes its samples there and /metrics adds them up, whichever
+worker answers the scrape. Empty the directory when the workers are restarted.
+
+Routes are labelled by their template (/portfolio/summary/{symbol}), never by
+the raw path, so the number of series stays fixed.
+"""
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Upstream calls take far longer than requests served from cache; both get their own buckets
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UPSTREAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 15, 30, 60)
+TICK_BUCKETS = (0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS,
+)
+upstream_request_duration = Histogram(
+    "alpha_vantage_request_duration_seconds", "Alpha Vantage call latency by function and outcome",
+    ["function", "outcome"], buckets=UPSTREAM_BUCKETS,
+)
+cache_lookups = Counter("cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+scheduler_tick_duration = Histogram(
+    "scheduler_tick_duration_seconds", "Duration of one daily-summary scheduler tick", buckets=TICK_BUCKETS,
+)
+scheduler_users = Counter("scheduler_users_processed_total", "Due users handled by the scheduler")
+emails_sent = Counter("emails_sent_total", "Emails handed to SMTP, by source and result", ["source", "result"])
+
+def record_request(method: str, route: str, status: int, seconds: float):
+    http_request_duration.labels(method, route, str(status)).observe(seconds)
+
+def record_upstream(function: str, outcome: str, seconds: float):
+    """outcome: ok, throttled (a "Note"/"Information" body), http_error, timeout or error"""
+    upstream_request_duration.labels(function, outcome).observe(seconds)
+
+def record_cache(cache: str, result: str, count: int = 1):
+    if count:
+        cache_lookups.labels(cache, result).inc(count)
+
+def render() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no per-request task or body buffering, unlike BaseHTTPMiddleware)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            record_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                time.perf_counter() - started,
+            )
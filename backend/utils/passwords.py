@@ -0,0 +1,66 @@
+"""Password hashing on a dedicated, bounded executor.
+
+bcrypt is deliberately slow (~250 ms at cost 12). Run inline in a sync
+handler, a burst of logins occupies every slot of the threadpool FastAPI uses
+for sync endpoints and unrelated requests queue behind them. Here hashing runs
+on its own small pool (threads, or processes with PASSWORD_HASH_EXECUTOR=process)
+of PASSWORD_HASH_WORKERS, and at most PASSWORD_HASH_MAX_PENDING hashes may be
+queued or running per worker before callers get a 503.
+"""
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import bcrypt
+from fastapi import HTTPException
+from config import get_settings
+
+settings = get_settings()
+
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+def hash_password(password: str, rounds: int | None = None) -> str:
+    salt = bcrypt.gensalt(rounds or settings.BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when the hash was made with a different cost than BCRYPT_ROUNDS ("$2b$12$...")"""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+def _get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if settings.PASSWORD_HASH_EXECUTOR == "process":
+                _executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+        return _executor
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+async def _run(fn, *args):
+    if not _pending.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many login attempts in progress, please retry", headers={"Retry-After": "1"})
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending.release()
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password, settings.BCRYPT_ROUNDS)
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, password, hashed_password)
@@ -0,0 +1,158 @@
+"""Per-request SQL statement counting and N+1 detection.
+
+SQLAlchemy cursor events add every statement, with its duration, to the
+QueryStats of the request being served, which is tracked in a context
+variable. Sync endpoints run in the threadpool with a copy of the request's
+context, so they count towards it too. QueryCounterMiddleware:
+
+- logs a warning when one normalized statement (literals and IN lists
+  collapsed) runs more than N_PLUS_ONE_THRESHOLD times in a request, the
+  usual sign of a query in a loop;
+- with QUERY_COUNT_HEADERS on, adds X-DB-Queries and X-DB-Time-ms to each
+  response.
+
+The same counter works outside requests, for tests and scripts. A block
+also collects the statements of every request served while it runs, even
+when the app runs on another thread, as it does under TestClient:
+
+    with assert_query_budget(3):
+        client.get("/portfolio/summary", headers=auth)
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import get_settings
+
+settings = get_settings()
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETER_LISTS = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+|\$\d+)\s*,?)+\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize(statement: str) -> str:
+    """Statement text with literals and IN (...) parameter lists collapsed, so repeats of one query compare equal"""
+    statement = _LITERALS.sub("?", statement)
+    statement = _PARAMETER_LISTS.sub("(?)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+class QueryStats:
+    def __init__(self, name: str = "", scope: dict | None = None):
+        self.name = name
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    @property
+    def source(self) -> str:
+        """The route template (once routing has run) or job the statements belong to"""
+        if self.scope is None:
+            return self.name
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {route.path if route is not None else self.scope['path']}"
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def merge(self, other: "QueryStats"):
+        self.count += other.count
+        self.seconds += other.seconds
+        self.statements.update(other.statements)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Normalized statements that ran more than `threshold` times, most frequent first"""
+        counts = Counter()
+        for statement, count in self.statements.items():
+            counts[normalize(statement)] += count
+        return [(statement, count) for statement, count in counts.most_common() if count > threshold]
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+# Open count_queries() blocks; each finished request is added to all of them
+_watchers: list[QueryStats] = []
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("query_started_at")
+    if stats is not None and started:
+        stats.add(statement, time.perf_counter() - started.pop())
+
+def current_source() -> str | None:
+    stats = _current.get()
+    return stats.source if stats is not None else None
+
+def warn_repeated(stats: QueryStats):
+    for statement, count in stats.repeated(settings.N_PLUS_ONE_THRESHOLD):
+        print(f"⚠️ Possible N+1 in {stats.source}: ran {count}x {statement[:200]}")
+
+@contextmanager
+def track_job(name: str):
+    """Attribute the statements of a background job (scheduler tick, outbox pass) to it, with N+1 warnings"""
+    stats = QueryStats(name=f"job:{name}")
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        warn_repeated(stats)
+
+@contextmanager
+def count_queries():
+    """Count the statements run inside the block (on this thread / task and its threadpool calls)"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    _watchers.append(stats)
+    try:
+        yield stats
+    finally:
+        _watchers.remove(stats)
+        _current.reset(token)
+
+@contextmanager
+def assert_query_budget(max_queries: int):
+    """Fail (AssertionError, so pytest reports it) if the block runs more than max_queries statements"""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        listing = "\n".join(f"  {count}x {statement}" for statement, count in stats.repeated(0))
+        raise AssertionError(f"{stats.count} queries, budget {max_queries}:\n{listing}")
+
+class QueryCounterMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope=scope)
+        token = _current.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and settings.QUERY_COUNT_HEADERS:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-db-queries", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.seconds * 1000:.1f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            for watcher in list(_watchers):
+                watcher.merge(stats)
+            warn_repeated(stats)
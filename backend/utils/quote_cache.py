@@ -0,0 +1,134 @@
+"""Symbol-keyed quote cache.
+
+Quotes are shared by every user holding a symbol. Lookups go through a small
+in-process LRU first and fall back to the stock_quote_cache table; callers use
+is_fresh() to decide whether a quote is recent enough or must be refetched.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from cruds import quotes as quote_crud
+from utils import metrics
+from config import get_settings
+
+settings = get_settings()
+
+_lru: "OrderedDict[str, dict]" = OrderedDict()
+_lock = threading.Lock()
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything we store is UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _remember(symbol: str, quote: dict):
+    with _lock:
+        _lru[symbol] = quote
+        _lru.move_to_end(symbol)
+        while len(_lru) > settings.QUOTE_CACHE_MAX_ENTRIES:
+            _lru.popitem(last=False)
+
+def _from_memory(symbol: str):
+    with _lock:
+        quote = _lru.get(symbol)
+        if quote is not None:
+            _lru.move_to_end(symbol)
+        return quote
+
+def quote_from_row(row) -> dict:
+    return {
+        "open": row.open_price,
+        "high": row.high_price,
+        "low": row.low_price,
+        "price": row.current_price,
+        "volume": row.volume,
+        "latest_trading_day": row.latest_trading_day,
+        "previous_close": row.previous_close,
+        "change": row.change,
+        "change_percent": row.change_percent,
+        "last_updated": _as_utc(row.last_updated),
+    }
+
+def parse_global_quote(data: dict) -> dict:
+    """Turn an Alpha Vantage "Global Quote" object into a cache entry"""
+    return {
+        "open": float(data["02. open"]),
+        "high": float(data["03. high"]),
+        "low": float(data["04. low"]),
+        "price": float(data["05. price"]),
+        "volume": int(data["06. volume"]),
+        "latest_trading_day": data["07. latest trading day"],
+        "previous_close": float(data["08. previous close"]),
+        "change": float(data["09. change"]),
+        "change_percent": data["10. change percent"],
+        "last_updated": datetime.now(timezone.utc),
+    }
+
+def is_fresh(quote: dict) -> bool:
+    age = datetime.now(timezone.utc) - quote["last_updated"]
+    return age.total_seconds() < settings.QUOTE_CACHE_TTL_SECONDS
+
+def get_quote(db: Session, symbol: str):
+    """Return the cached quote for a symbol (fresh or not), or None if we never fetched it"""
+    symbol = symbol.upper()
+    quote = _from_memory(symbol)
+    if quote is not None and is_fresh(quote):
+        metrics.record_cache("quote", "hit")
+        return quote
+
+    # Stale or missing in memory - another worker may have refreshed it already
+    row = quote_crud.get_quote_row(db, symbol)
+    metrics.record_cache("quote", "database" if row else "miss")
+    if not row:
+        return quote
+    quote = quote_from_row(row)
+    _remember(symbol, quote)
+    return quote
+
+def _from_memory_bulk(symbols: list[str]) -> tuple[dict, list[str]]:
+    """Quotes held in memory (fresh or not), and the symbols that need a database lookup"""
+    found = {}
+    missing = []
+    for symbol in {s.upper() for s in symbols}:
+        quote = _from_memory(symbol)
+        if quote is not None and is_fresh(quote):
+            found[symbol] = quote
+        else:
+            missing.append(symbol)
+            if quote is not None:
+                found[symbol] = quote
+    metrics.record_cache("quote", "hit", len(found) - sum(1 for symbol in missing if symbol in found))
+    return found, missing
+
+def _remember_rows(found: dict, rows, missing: list[str]) -> dict:
+    for row in rows:
+        quote = quote_from_row(row)
+        _remember(row.stock_symbol, quote)
+        found[row.stock_symbol] = quote
+    metrics.record_cache("quote", "database", len(rows))
+    metrics.record_cache("quote", "miss", len(missing) - len(rows))
+    return found
+
+def get_quotes(db: Session, symbols: list[str]) -> dict:
+    """Bulk variant of get_quote: one query for every symbol not fresh in memory"""
+    found, missing = _from_memory_bulk(symbols)
+    return _remember_rows(found, quote_crud.get_quote_rows(db, missing), missing)
+
+async def get_quotes_async(db: AsyncSession, symbols: list[str]) -> dict:
+    found, missing = _from_memory_bulk(symbols)
+    return _remember_rows(found, await quote_crud.get_quote_rows_async(db, missing), missing)
+
+def store_quote(db: Session, symbol: str, quote: dict):
+    symbol = symbol.upper()
+    quote_crud.upsert_quote(db, symbol, quote)
+    _remember(symbol, quote)
+
+def store_quotes(db: Session, quotes: dict):
+    """Bulk variant of store_quote: one transaction for every {symbol: quote}"""
+    quotes = {symbol.upper(): quote for symbol, quote in quotes.items()}
+    quote_crud.upsert_quotes(db, quotes)
+    for symbol, quote in quotes.items():
+        _remember(symbol, quote)
@@ -0,0 +1,167 @@
+"""Per-API-key Alpha Vantage budgets.
+
+Every upstream call first takes a token from the key's per-minute bucket (kept
+in this worker) and then, once the token is ours, counts one call against the
+key's daily budget (a counter row in api_key_usage, shared by all workers and
+kept across restarts). A call that would exceed the minute budget waits for the
+next token instead of failing, as long as that wait is short; only an exhausted
+daily budget, or a queue longer than ALPHA_VANTAGE_MAX_QUEUE_SECONDS, is refused
+with a 429. Callers should not hold a database connection while they wait here.
+"""
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import ApiKeyUsage
+from config import get_settings
+
+settings = get_settings()
+
+class TokenBucket:
+    def __init__(self, capacity: int, per_seconds: float):
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until the next token is ours (queued callers push this further out)"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        # May go negative: that is how callers already waiting keep their place in line
+        self.tokens -= 1
+
+    def give_back(self):
+        """Return a token taken by a call that was not made after all"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def drain(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+    def available(self) -> int:
+        self._refill()
+        return max(0, int(self.tokens))
+
+_buckets: dict[str, TokenBucket] = {}
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+def _bucket(key_hash: str) -> TokenBucket:
+    bucket = _buckets.get(key_hash)
+    if bucket is None:
+        bucket = _buckets[key_hash] = TokenBucket(settings.ALPHA_VANTAGE_CALLS_PER_MINUTE, 60)
+    return bucket
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+def _seconds_until_tomorrow() -> int:
+    now = datetime.now(timezone.utc)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return int((tomorrow - now).total_seconds()) + 1
+
+def _reserve_daily(key_hash: str) -> bool:
+    """Atomically count one call against today's budget; False if it is used up"""
+    today = _today()
+    db: Session = SessionLocal()
+    try:
+        for _ in range(2):
+            result = db.execute(
+                update(ApiKeyUsage)
+                .where(
+                    ApiKeyUsage.api_key_hash == key_hash,
+                    ApiKeyUsage.usage_date == today,
+                    ApiKeyUsage.calls < settings.ALPHA_VANTAGE_CALLS_PER_DAY
+                )
+                .values(calls=ApiKeyUsage.calls + 1)
+            )
+            if result.rowcount:
+                db.commit()
+                return True
+
+            if db.get(ApiKeyUsage, (key_hash, today)) is not None:
+                db.rollback()
+                return False
+
+            db.add(ApiKeyUsage(api_key_hash=key_hash, usage_date=today, calls=1))
+            try:
+                db.commit()
+                return True
+            except IntegrityError:
+                # Another worker created today's row first - go back to the update
+                db.rollback()
+        return False
+    finally:
+        db.close()
+
+async def acquire(api_key: str, max_wait: float | None = None):
+    """Wait until api_key may make one more call, or raise 429 if it can't within max_wait seconds"""
+    if max_wait is None:
+        max_wait = settings.ALPHA_VANTAGE_MAX_QUEUE_SECONDS
+    key_hash = hash_api_key(api_key)
+
+    bucket = _bucket(key_hash)
+    wait = bucket.wait_time()
+    if wait > max_wait:
+        raise HTTPException(
+            status_code=429,
+            detail="API call frequency limit reached",
+            headers={"Retry-After": str(int(wait) + 1)}
+        )
+
+    bucket.take()
+    try:
+        if wait > 0:
+            await asyncio.sleep(wait)
+        # Only a call that is actually about to be sent counts against the daily budget
+        reserved = await asyncio.to_thread(_reserve_daily, key_hash)
+    except BaseException:
+        # Abandoned while queued (client went away) - the token goes to the next caller
+        bucket.give_back()
+        raise
+
+    if not reserved:
+        bucket.give_back()
+        raise HTTPException(
+            status_code=429,
+            detail="Daily Alpha Vantage API budget used up",
+            headers={"Retry-After": str(_seconds_until_tomorrow())}
+        )
+
+def penalize(api_key: str):
+    """Alpha Vantage throttled us anyway (key used elsewhere?) - treat this minute as spent"""
+    _bucket(hash_api_key(api_key)).drain()
+
+def get_budget(db: Session, api_key: str) -> dict:
+    key_hash = hash_api_key(api_key)
+    return _budget(key_hash, db.get(ApiKeyUsage, (key_hash, _today())))
+
+async def get_budget_async(db: AsyncSession, api_key: str) -> dict:
+    key_hash = hash_api_key(api_key)
+    return _budget(key_hash, await db.get(ApiKeyUsage, (key_hash, _today())))
+
+def _budget(key_hash: str, usage: ApiKeyUsage | None) -> dict:
+    used_today = usage.calls if usage else 0
+    bucket = _buckets.get(key_hash)
+    return {
+        "calls_per_minute": settings.ALPHA_VANTAGE_CALLS_PER_MINUTE,
+        "minute_remaining": bucket.available() if bucket else settings.ALPHA_VANTAGE_CALLS_PER_MINUTE,
+        "calls_per_day": settings.ALPHA_VANTAGE_CALLS_PER_DAY,
+        "daily_remaining": max(0, settings.ALPHA_VANTAGE_CALLS_PER_DAY - used_today),
+        "daily_resets_in_seconds": _seconds_until_tomorrow(),
+    }
@@ -0,0 +1,73 @@
+"""Single-flight call coalescing.
+
+Concurrent callers asking for the same key share one in-flight call: the first
+caller (the originator) starts the coroutine as its own task, everyone who
+arrives while it is running awaits the same result or exception. Every caller,
+the originator included, waits through asyncio.shield, so a caller that goes
+away (a client disconnect cancels its request) stops waiting without
+cancelling the call the others still need. The call must therefore not use
+anything owned by the originator's request, such as its DB session.
+"""
+import asyncio
+from collections import defaultdict
+
+class SingleFlight:
+    def __init__(self):
+        self._in_flight: dict = {}
+        self._originated = defaultdict(int)
+        self._coalesced = defaultdict(int)
+
+    async def do(self, key: tuple, fn):
+        """Await fn() once per key at a time; key[0] is used as the counter label"""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._coalesced[key[0]] += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            self._originated[key[0]] += 1
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: tuple, task: asyncio.Future):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved, so a failure nobody waited for isn't logged as never retrieved
+
+    async def do_own(self, key: tuple, fn, retry_on: tuple = (Exception,), attempts: int = 3):
+        """do(), for calls made with the caller's own credentials (an API key)
+
+        A follower gets the originator's result, but not its failure: the originator's key may be throttled
+        or out of budget while ours isn't. A follower that gets one of retry_on runs the call again - joining a
+        newer call if one has started, otherwise originating it with its own fn.
+        """
+        for attempt in range(attempts):
+            ran = False
+
+            async def run():
+                nonlocal ran
+                ran = True
+                return await fn()
+
+            try:
+                return await self.do(key, run)
+            except retry_on:
+                if ran or attempt == attempts - 1:
+                    raise
+
+    def stats(self) -> dict:
+        labels = set(self._originated) | set(self._coalesced)
+        per_label = {
+            label: {"originated": self._originated[label], "coalesced": self._coalesced[label]}
+            for label in sorted(labels)
+        }
+        return {
+            "originated": sum(self._originated.values()),
+            "coalesced": sum(self._coalesced.values()),
+            "in_flight": len(self._in_flight),
+            "by_function": per_label,
+        }
+
+# Shared by every Alpha Vantage call site, keyed by (function, symbol)
+alpha_vantage_flight = SingleFlight()
@@ -0,0 +1,223 @@
+"""Slow-query log.
+
+Any statement that takes longer than SLOW_QUERY_THRESHOLD_MS is recorded
+with its duration, its parameters (strings redacted, since they hold emails,
+password hashes and API keys) and the route or job that ran it (see
+utils.query_counter). The hot path only times the statement and, when it is
+slow, puts it on a small queue. A background thread does the rest:
+
+- runs EXPLAIN on its own connection, at most once per normalized statement
+  every EXPLAIN_INTERVAL_SECONDS. On PostgreSQL a read-only SELECT gets
+  EXPLAIN (ANALYZE, BUFFERS), which executes it again, inside a transaction
+  that is rolled back. Writes and locking reads (SELECT ... FOR UPDATE, such
+  as the outbox and reminder claims) get a plain EXPLAIN: analyzing them
+  would take the row locks the workers are competing for. SQLite gets
+  EXPLAIN QUERY PLAN. Statements from the DB_ASYNC engine are logged without
+  a plan.
+- appends the record as a JSON line to SLOW_QUERY_LOG_FILE, rotated at
+  SLOW_QUERY_LOG_MAX_BYTES.
+- updates the per-statement totals behind GET /admin/slow-queries.
+
+If the queue is full (the database is slow everywhere), further records are
+dropped and counted instead of slowing requests down. Each worker keeps its
+own totals; all workers append to the same file.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.query_counter import current_source, normalize
+from config import get_settings
+
+settings = get_settings()
+
+EXPLAIN_INTERVAL_SECONDS = 600
+QUEUE_SIZE = 100
+EXPLAIN_TIMEOUT_MS = 30000
+
+_pending: "queue.Queue[dict]" = queue.Queue(maxsize=QUEUE_SIZE)
+_explained_at: dict[str, float] = {}
+_totals: dict[str, dict] = {}
+_totals_lock = threading.Lock()
+_dropped = 0
+_worker: threading.Thread | None = None
+_worker_lock = threading.Lock()
+_explaining = threading.local()
+_LOCKING_CLAUSE = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b", re.IGNORECASE)
+
+def can_analyze(statement: str) -> bool:
+    """True for a SELECT that neither writes nor locks rows, so running it again for EXPLAIN ANALYZE is harmless"""
+    return statement.lstrip()[:6].upper() == "SELECT" and not _LOCKING_CLAUSE.search(statement)
+
+def redact(value):
+    """Keep numbers, dates and flags (ids, limits, timestamps); hide every string"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (Decimal, date)):
+        return str(value)
+    if isinstance(value, (str, bytes)):
+        return f"<redacted {len(value)} chars>"
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return f"<{type(value).__name__}>"
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_started_at", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("slow_query_started_at")
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    if settings.SLOW_QUERY_THRESHOLD_MS <= 0 or elapsed_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+    if getattr(_explaining, "active", False):
+        return
+    _record(conn.engine, statement, parameters, executemany, elapsed_ms)
+
+def _record(engine: Engine, statement: str, parameters, executemany: bool, elapsed_ms: float):
+    global _dropped
+    _ensure_worker()
+    try:
+        _pending.put_nowait({
+            "engine": engine,
+            "statement": statement,
+            # Kept in memory only for EXPLAIN; the log gets the redacted copy
+            "parameters": None if executemany else parameters,
+            "executemany": executemany,
+            "duration_ms": elapsed_ms,
+            "source": current_source() or "unknown",
+            "at": datetime.now(timezone.utc),
+        })
+    except queue.Full:
+        _dropped += 1
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="slow-query-log", daemon=True)
+            _worker.start()
+
+def _build_logger() -> logging.Logger:
+    logger = logging.getLogger("stock_app.slow_queries")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = RotatingFileHandler(
+            settings.SLOW_QUERY_LOG_FILE,
+            maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+def _explain(engine: Engine, statement: str, parameters) -> str | None:
+    if engine.dialect.is_async:
+        # The async engine's connections belong to the event loop; its statements are logged without a plan
+        return None
+    _explaining.active = True
+    try:
+        with engine.connect() as conn:
+            dialect = engine.dialect.name
+            if dialect == "postgresql":
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                prefix = "EXPLAIN (ANALYZE, BUFFERS) " if can_analyze(statement) else "EXPLAIN "
+                rows = conn.exec_driver_sql(prefix + statement, parameters or ())
+                plan = "\n".join(row[0] for row in rows)
+            elif dialect == "sqlite":
+                rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters or ())
+                plan = "\n".join(str(row[-1]) for row in rows)
+            else:
+                plan = ""
+            conn.rollback()
+            return plan
+    finally:
+        _explaining.active = False
+
+def _process(item: dict, logger: logging.Logger):
+    normalized = normalize(item["statement"])
+    plan = None
+    now = time.monotonic()
+    explain_due = now - _explained_at.get(normalized, float("-inf")) >= EXPLAIN_INTERVAL_SECONDS
+    if settings.SLOW_QUERY_EXPLAIN and not item["executemany"] and explain_due:
+        _explained_at[normalized] = now
+        try:
+            plan = _explain(item["engine"], item["statement"], item["parameters"])
+        except Exception as e:
+            plan = f"EXPLAIN failed: {e}"
+
+    duration_ms = round(item["duration_ms"], 1)
+    record = {
+        "at": item["at"].isoformat(),
+        "pid": os.getpid(),
+        "duration_ms": duration_ms,
+        "source": item["source"],
+        "statement": normalized,
+        "parameters": redact(item["parameters"]),
+        "plan": plan,
+    }
+    logger.info(json.dumps(record, default=str))
+
+    with _totals_lock:
+        totals = _totals.get(normalized)
+        if totals is None:
+            totals = _totals[normalized] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "sources": set(), "plan": None}
+        totals["count"] += 1
+        totals["total_ms"] += duration_ms
+        totals["max_ms"] = max(totals["max_ms"], duration_ms)
+        totals["sources"].add(item["source"])
+        totals["last_at"] = record["at"]
+        if plan is not None:
+            totals["plan"] = plan
+
+def _run():
+    logger = _build_logger()
+    while True:
+        item = _pending.get()
+        try:
+            _process(item, logger)
+        except Exception as e:
+            print(f"❌ Failed to record slow query: {str(e)}")
+
+def top(limit: int = 20, order: str = "total") -> dict:
+    """This worker's slowest normalized statements, by total, max or mean duration"""
+    key = {"total": "total_ms", "max": "max_ms", "mean": "mean_ms"}[order]
+    with _totals_lock:
+        rows = [
+            {
+                "statement": statement,
+                "count": totals["count"],
+                "total_ms": round(totals["total_ms"], 1),
+                "max_ms": totals["max_ms"],
+                "mean_ms": round(totals["total_ms"] / totals["count"], 1),
+                "sources": sorted(totals["sources"]),
+                "last_at": totals["last_at"],
+                "plan": totals["plan"],
+            }
+            for statement, totals in _totals.items()
+        ]
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return {
+        "worker_pid": os.getpid(),
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "pending": _pending.qsize(),
+        "dropped": _dropped,
+        "statements": rows[:limit],
+    }
@@ -0,0 +1,188 @@
+"""In-process typeahead index over stocks_table.
+
+Symbols go into a prefix trie (each node keeps the ids below it, already in
+rank order); every 1-, 2- and 3-character gram of the symbols and company
+names goes into a posting list for substring matches, and the first 1-3
+characters of every word into a second one for word-start matches. Ids are
+assigned in rank order, so every list is already sorted by rank: a search
+walks the postings of the needle's rarest gram in order, checks each
+candidate, and stops as soon as it has a page of results - nothing is sorted
+or intersected per query. Results are ranked exact ticker, then ticker prefix, then
+substring of ticker or company name (word starts first). The index is built
+from the database at startup; searches never touch the database. Each index
+remembers the stock universe version it was built from - watch() polls that
+version and, when an import has published a new one, rebuilds from the
+current index plus just the changed symbols.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from models import StocksTable
+from cruds import universe as universe_crud
+from database import SessionLocal
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: dict[str, "_TrieNode"] = {}
+        self.ids: list[int] = []
+
+# Needles up to this long are looked up directly; longer ones by their rarest gram of this length
+GRAM_SIZE = 3
+
+def _grams(text: str, size: int) -> set[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def _all_grams(text: str) -> set[str]:
+    return {text[i:i + size] for size in range(1, GRAM_SIZE + 1) for i in range(len(text) - size + 1)}
+
+class StockSearchIndex:
+    def __init__(self, stocks: list[tuple[str, str]], version: int = 0):
+        self.version = version
+        # Shorter, then alphabetical symbols rank first within a tier
+        stocks = sorted(stocks, key=lambda stock: (len(stock[0]), stock[0]))
+        self.symbols = [symbol for symbol, _ in stocks]
+        self.names = [name for _, name in stocks]
+        self._haystacks = [f"{symbol.lower()}\x00{name.lower()}" for symbol, name in stocks]
+        self._names_padded = [f" {symbol.lower()} {name.lower()}" for symbol, name in stocks]
+        self._by_symbol = {symbol.upper(): i for i, symbol in enumerate(self.symbols)}
+
+        self._trie = _TrieNode()
+        for i, symbol in enumerate(self.symbols):
+            node = self._trie
+            for char in symbol.upper():
+                node = node.children.setdefault(char, _TrieNode())
+                node.ids.append(i)
+
+        postings = defaultdict(list)
+        word_starts = defaultdict(list)
+        for i, (haystack, padded) in enumerate(zip(self._haystacks, self._names_padded)):
+            for gram in _all_grams(haystack):
+                postings[gram].append(i)
+            # The first 1-3 characters of every word in the symbol and name
+            starts = {word[:size] for word in padded.split(" ") if word for size in range(1, GRAM_SIZE + 1)}
+            for gram in starts:
+                word_starts[gram].append(i)
+        self._postings = dict(postings)
+        self._word_starts = dict(word_starts)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _prefix_ids(self, prefix: str) -> list[int]:
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.ids
+
+    def _candidates(self, needle: str) -> list[int]:
+        """Ids that may contain needle, in rank order: exactly those for a short needle, else a superset"""
+        if len(needle) <= GRAM_SIZE:
+            return self._postings.get(needle, [])
+        return min((self._postings.get(gram, []) for gram in _grams(needle, GRAM_SIZE)), key=len)
+
+    def _substring_ids(self, needle: str):
+        # Matches at the start of a word ("apple" in "Apple Inc") before ones inside a word ("Pineapple")
+        word_start = f" {needle}"
+        for i in self._word_starts.get(needle[:GRAM_SIZE], []):
+            if needle in self._haystacks[i] and word_start in self._names_padded[i]:
+                yield i
+        for i in self._candidates(needle):
+            if needle in self._haystacks[i] and word_start not in self._names_padded[i]:
+                yield i
+
+    def _ranked_ids(self, keywords: str):
+        upper = keywords.upper()
+        exact = self._by_symbol.get(upper)
+        if exact is not None:
+            yield exact
+
+        for i in self._prefix_ids(upper):
+            if i != exact:
+                yield i
+
+        for i in self._substring_ids(keywords.lower()):
+            # Ticker prefixes (and the exact ticker) were yielded above
+            if not self.symbols[i].upper().startswith(upper):
+                yield i
+
+    def search(self, keywords: str, exclude=frozenset(), offset: int = 0, limit: int = 50) -> list[tuple[str, str]]:
+        results = []
+        skipped = 0
+        for i in self._ranked_ids(keywords.strip()):
+            if self.symbols[i] in exclude:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            results.append((self.symbols[i], self.names[i]))
+            if len(results) >= limit:
+                break
+        return results
+
+_index = StockSearchIndex([])
+_build_lock = threading.Lock()
+
+def get_index() -> StockSearchIndex:
+    return _index
+
+def rebuild(db: Session) -> StockSearchIndex:
+    """Build a fresh index from stocks_table and swap it in; readers keep the old one until then"""
+    global _index
+    with _build_lock:
+        # Version first: if an import lands in between, the next refresh re-applies its changes harmlessly
+        version = universe_crud.get_version(db)
+        rows = (
+            db.query(StocksTable.stock_symbol, StocksTable.stock_company_name)
+            .filter(StocksTable.is_listed == True)
+            .all()
+        )
+        _index = StockSearchIndex([(symbol, name) for symbol, name in rows], version)
+        print(f"🔎 Stock search index built ({len(_index)} symbols, universe version {version})")
+        return _index
+
+def refresh(db: Session) -> bool:
+    """Catch up with the published universe version; returns True if the index changed"""
+    global _index
+    version = universe_crud.get_version(db)
+    if version == _index.version:
+        return False
+
+    oldest = universe_crud.get_oldest_logged_version(db)
+    if version < _index.version or oldest is None or oldest > _index.version + 1:
+        # Change log no longer covers our version (or the database was reset) - start over
+        rebuild(db)
+        return True
+
+    with _build_lock:
+        current = _index
+        changed = universe_crud.get_changed_stocks(db, current.version)
+        stocks = dict(zip(current.symbols, current.names))
+        for symbol, name, is_listed in changed:
+            if is_listed:
+                stocks[symbol] = name
+            else:
+                stocks.pop(symbol, None)
+        _index = StockSearchIndex(list(stocks.items()), version)
+    print(f"🔎 Stock search index updated to universe version {version} ({len(changed)} symbols changed)")
+    return True
+
+def _refresh_with_own_session():
+    db = SessionLocal()
+    try:
+        refresh(db)
+    finally:
+        db.close()
+
+async def watch(poll_seconds: float):
+    """Keep this worker's index on the latest universe version (runs for the app's lifetime)"""
+    while True:
+        await asyncio.sleep(poll_seconds)
+        try:
+            await asyncio.to_thread(_refresh_with_own_session)
+        except Exception as e:
+            print(f"❌ Failed to refresh stock search index: {str(e)}")
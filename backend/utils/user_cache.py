@@ -0,0 +1,70 @@
+"""Short-lived cache of authenticated users, keyed by email.
+
+get_current_user (dependencies.py) resolves the user once per request; this
+cache lets consecutive requests from the same user skip the lookup entirely.
+Entries are immutable snapshots, not ORM rows - handlers that change the user
+load the row by primary key and call invalidate() after committing. Each
+worker has its own cache, so a change made through another worker is seen
+here within USER_CACHE_TTL_SECONDS.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from models import UsersTable
+from utils import metrics
+from config import get_settings
+
+settings = get_settings()
+
+@dataclass(frozen=True, slots=True)
+class CurrentUser:
+    id: int
+    email: str
+    is_verified: bool
+    alpha_vantage_api_key: str
+    email_reminder_time: str | None
+    email_reminder_enabled: bool
+    timezone: str | None
+    last_api_key_update: datetime | None
+
+    @classmethod
+    def from_row(cls, user: UsersTable) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_verified=user.is_verified,
+            alpha_vantage_api_key=user.alpha_vantage_api_key,
+            email_reminder_time=user.email_reminder_time,
+            email_reminder_enabled=user.email_reminder_enabled,
+            timezone=user.timezone,
+            last_api_key_update=user.last_api_key_update
+        )
+
+_users: "OrderedDict[str, tuple[float, CurrentUser]]" = OrderedDict()
+_lock = threading.Lock()
+
+def get(email: str) -> CurrentUser | None:
+    with _lock:
+        entry = _users.get(email)
+        if entry is not None and time.monotonic() >= entry[0]:
+            del _users[email]
+            entry = None
+        if entry is not None:
+            _users.move_to_end(email)
+    metrics.record_cache("user", "miss" if entry is None else "hit")
+    return None if entry is None else entry[1]
+
+def remember(user: UsersTable) -> CurrentUser:
+    snapshot = CurrentUser.from_row(user)
+    with _lock:
+        _users[snapshot.email] = (time.monotonic() + settings.USER_CACHE_TTL_SECONDS, snapshot)
+        _users.move_to_end(snapshot.email)
+        while len(_users) > settings.USER_CACHE_MAX_ENTRIES:
+            _users.popitem(last=False)
+    return snapshot
+
+def invalidate(email: str):
+    with _lock:
+        _users.pop(email, None)